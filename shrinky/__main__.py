@@ -3,6 +3,7 @@
 
 import argparse
 import copy
+import itertools
 import os
 import re
 import shutil
@@ -13,8 +14,16 @@ import sys
 from shrinky.assembler import Assembler
 from shrinky.assembler_file import AssemblerFile
 from shrinky.assembler_segment import AssemblerSegment
+from shrinky.build_cache import BuildCache
+from shrinky.build_cache import file_contents
+from shrinky.build_cache import get_build_cache
+from shrinky.build_cache import get_default_cache_dir
+from shrinky.build_cache import get_source_digest
+from shrinky.build_cache import run_command_cached
+from shrinky.build_cache import set_build_cache
 from shrinky.common import executable_find
 from shrinky.common import executable_search
+from shrinky.common import file_copy_prefix
 from shrinky.common import get_indent
 from shrinky.common import is_listing
 from shrinky.common import is_verbose
@@ -23,9 +32,15 @@ from shrinky.common import locate
 from shrinky.common import run_command
 from shrinky.common import set_verbose
 from shrinky.compiler import Compiler
+from shrinky.compression import compress_data
+from shrinky.compression import get_default_compression_parameters
+from shrinky.compression import search_compression_parameters
 from shrinky.custom_help_formatter import CustomHelpFormatter
+from shrinky.directory_index import set_directory_index_cache
+from shrinky.elf_linker import link_direct
+from shrinky.elf_reader import ElfReader
 from shrinky.glsl import Glsl
-from shrinky.library_definition import g_library_definitions
+from shrinky.glsl_block_source import glsl_read_sources
 from shrinky.linker import Linker
 from shrinky.platform_var import g_osarch
 from shrinky.platform_var import g_osname
@@ -44,8 +59,18 @@ from shrinky.symbol import generate_loader_vanilla
 from shrinky.symbol import generate_symbol_definitions_direct
 from shrinky.symbol import generate_symbol_definitions_table
 from shrinky.symbol import generate_symbol_table
+from shrinky.symbol import set_symbol_hash
+from shrinky.symbol_hash import analyze_symbol_hashes
+from shrinky.symbol_hash import generate_symbol_hash_report
+from shrinky.symbol_hash import read_library_symbol_names
+from shrinky.symbol_hash import select_symbol_hash
+from shrinky.symbol_index import g_symbol_index
 from shrinky.symbol_source_database import g_symbol_sources
 from shrinky.template import Template
+from shrinky.trace import profile_start
+from shrinky.trace import trace_begin
+from shrinky.trace import trace_end
+from shrinky.trace import trace_start
 
 ########################################
 # Globals ##############################
@@ -513,7 +538,7 @@ def collect_libraries_rename(op):
     return op
 
 
-def compress_file(compression, pretty, src, dst):
+def compress_file(compression, pretty, src, dst, search=False):
     """Compress a file to be a self-extracting file-dumping executable."""
     str_tail = "sed 1,2d"
     # Many compos require that the temporary file is removed after running
@@ -522,21 +547,49 @@ def compress_file(compression, pretty, src, dst):
         str_tail = "tail -n+3"
     # #!bin/sh is needed when running zsh
     if "lzma" == compression:
-        command = ["xz", "--format=lzma", "--lzma1=preset=9,lc=1,lp=0,nice=273,pb=0", "--stdout"]
         header = "#!/bin/sh\nHOME=/tmp/i;%s $0|lzcat>~;chmod +x ~;~%s" % (str_tail, str_cleanup)
     elif "raw" == compression:
-        command = ["xz", "-9", "--extreme", "--format=raw", "--stdout"]
         header = "#!/bin/sh\nHOME=/tmp/i;%s $0|xzcat -F raw>~;chmod +x ~;~%s" % (str_tail, str_cleanup)
     elif "xz" == compression:
-        command = ["xz", "--format=xz", "--lzma2=preset=9,lc=1,nice=273,pb=0", "--stdout"]
         header = "#!/bin/sh\nHOME=/tmp/i;%s $0|xzcat>~;chmod +x ~;~%s" % (str_tail, str_cleanup)
     else:
         raise RuntimeError("unknown compression format '%s'" % compression)
-    (compressed, se) = run_command(command + [src], False)
-    wfd = open(dst, "wb")
-    wfd.write((header + "\n").encode())
-    wfd.write(compressed)
-    wfd.close()
+    rfd = open(src, "rb")
+    data = rfd.read()
+    rfd.close()
+    parameters = get_default_compression_parameters(compression)
+    # Parameters found by earlier searches for the same output are stored in build cache.
+    cache = get_build_cache()
+    if cache:
+        parameters_key = cache.digest(["compression_parameters", get_source_digest(), compression,
+                                       os.path.abspath(dst)])
+        stored_parameters = cache.get_value(parameters_key)
+    else:
+        stored_parameters = None
+    if search:
+        parameters = search_compression_parameters(compression, data, listify(parameters, stored_parameters))
+        if cache:
+            cache.set_value(parameters_key, parameters)
+    # Stored parameters are only used if they beat the defaults, choice is made after a cache miss.
+    candidates = [parameters]
+    if stored_parameters and (not search):
+        candidates += [stored_parameters]
+    if cache:
+        key = cache.digest(["compress", get_source_digest(), header, candidates, data])
+    if (not cache) or (not cache.fetch("compress", key, dst)):
+        compressed = [compress_data(compression, data, x) for x in candidates]
+        best = 0
+        for ii in range(1, len(compressed)):
+            if len(compressed[ii]) < len(compressed[best]):
+                best = ii
+        if (not search) and stored_parameters and is_verbose():
+            print("Using compression parameters from build cache: %s" % (str(candidates[best])))
+        wfd = open(dst, "wb")
+        wfd.write((header + "\n").encode())
+        wfd.write(compressed[best])
+        wfd.close()
+        if cache:
+            cache.store("compress", key, dst)
     make_executable(dst)
     print("Wrote '%s': %i bytes" % (dst, os.path.getsize(dst)))
 
@@ -555,18 +608,14 @@ def extract_symbol_names(source, prefix):
 
 def find_library_definition(op):
     """Find library definition with name."""
-    for ii in g_library_definitions:
-        if ii.get_name() == op:
-            return ii
-    return None
+    return g_symbol_index.find_library(op)
 
 
 def find_symbol(op):
     """Find single symbol with name."""
-    for ii in g_library_definitions:
-        ret = ii.find_symbol(op)
-        if ret:
-            return ret
+    ret = g_symbol_index.find_symbol(op)
+    if ret:
+        return ret
     raise RuntimeError("symbol '%s' not known, please add it to the script" % (op))
 
 
@@ -582,7 +631,9 @@ def generate_binary_minimal(source_file, compiler, assembler, linker, objcopy, e
                             additional_sources=[]):
     """Generate a binary using all possible tricks. Return whether or not reprocess is necessary."""
     if source_file:
+        trace_begin("compile")
         compiler.compile_asm(source_file, output_file + ".S", True)
+        trace_end()
     segment_ehdr = AssemblerSegment(g_assembler_ehdr)
     if osarch_is_32_bit():
         segment_phdr_dynamic = AssemblerSegment(g_assembler_phdr32_dynamic)
@@ -628,9 +679,13 @@ def generate_binary_minimal(source_file, compiler, assembler, linker, objcopy, e
             asm.incorporate(additional_asm)
     # Assemble content without headers to check for missing symbols.
     if asm.write(output_file + ".S", assembler):
+        trace_begin("assemble")
         assembler.assemble(output_file + ".S", output_file + ".o")
+        trace_end()
         extra_symbols = readelf_list_und_symbols(output_file + ".o")
+        trace_begin("compile", args={"file": output_file + ".extra"})
         additional_file = g_symbol_sources.compile_asm(compiler, assembler, extra_symbols, output_file + ".extra")
+        trace_end()
         # If additional code was needed, add it to our asm source.
         if additional_file:
             additional_asm = AssemblerFile(additional_file)
@@ -667,6 +722,8 @@ def generate_binary_minimal(source_file, compiler, assembler, linker, objcopy, e
     if is_listing(und_symbols):
         segments_tail += [segment_symtab]
     segments_tail += [segment_interp, segment_strtab]
+    # Segments after the program headers are only referred to by address, their order is free.
+    segments_tail = order_segments(segments_tail[:1], segments_tail[1:])
     segments = merge_segments(segments_head) + load_segments + merge_segments(segments_tail)
     # Create content of earlier sections and write source when done.
     if asm.hasSectionAlignment():
@@ -687,17 +744,42 @@ def generate_binary_minimal(source_file, compiler, assembler, linker, objcopy, e
     if is_verbose():
         print("Wrote assembler source: '%s'" % (fname + ".S"))
     # Assemble headers
+    trace_begin("assemble")
     assembler.assemble(fname + ".S", fname + ".o")
+    trace_end()
     link_files = [fname + ".o"]
+    # Everything is in one section, placing it at entry address in-process replaces linker and objcopy.
+    linked = False
+    if linker.is_direct():
+        trace_begin("link", args={"direct": True})
+        linked = link_direct(fname + ".o", output_file + ".unprocessed", int(PlatformVar("entry")))
+        trace_end()
     # Link all generated files.
-    linker.generate_linker_script(output_file + ".ld", True)
-    linker.set_linker_script(output_file + ".ld")
-    linker.link_binary(link_files, output_file + ".bin")
-    run_command([objcopy, "--output-target=binary", output_file + ".bin", output_file + ".unprocessed"])
+    if not linked:
+        trace_begin("link")
+        linker.generate_linker_script(output_file + ".ld", True)
+        linker.set_linker_script(output_file + ".ld")
+        linker.link_binary(link_files, output_file + ".bin")
+        trace_end()
+        trace_begin("objcopy")
+        run_command_cached("objcopy", [objcopy, "--output-target=binary", output_file + ".bin",
+                                       output_file + ".unprocessed"], output_file + ".bin", output_file + ".unprocessed")
+        trace_end()
+    trace_begin("strip")
+    cache = get_build_cache()
+    if cache:
+        key = cache.digest(["strip", get_source_digest(), file_contents(output_file + ".unprocessed"),
+                            bss_section.get_alignment()])
+        if cache.fetch("strip", key, output_file + ".stripped"):
+            trace_end({"cached": True})
+            return
     if bss_section.get_alignment():
         readelf_zero(output_file + ".unprocessed", output_file + ".stripped")
     else:
         readelf_truncate(output_file + ".unprocessed", output_file + ".stripped")
+    if cache:
+        cache.store("strip", key, output_file + ".stripped")
+    trace_end()
 
 
 def generate_elfling(output_file, compiler, elfling, definition_ld):
@@ -721,52 +803,70 @@ def generate_elfling(output_file, compiler, elfling, definition_ld):
 
 def generate_glsl(filenames, preprocessor, definition_ld, mode, inlines, renames, simplifys):
     """Generate GLSL, processing given GLSL source files."""
-    glsl_db = Glsl()
-    for ii in filenames:
-        # If there's a listing, the order is filename, varname, output name.
-        if is_listing(ii):
-            if 3 == len(ii):
-                glsl_db.read(preprocessor, definition_ld, ii[0], ii[1], ii[2])
-            elif 2 == len(ii):
-                varname = re.sub(r'\.', r'_', os.path.basename(ii[0]))
-                glsl_db.read(preprocessor, definition_ld, ii[0], varname, ii[1])
-            else:
-                raise RuntimeError("invalid glsl file listing input: '%s'" % (str(ii)))
-        # Otherwise only filename exists.
-        else:
-            varname = re.sub(r'\.', r'_', os.path.basename(ii))
-            glsl_db.read(preprocessor, definition_ld, ii, varname)
-    glsl_db.parse()
-    glsl_db.crunch(mode, inlines, renames, simplifys)
-    return glsl_db
+    return generate_glsl_batch([filenames], preprocessor, definition_ld, mode, inlines, renames, simplifys)[0]
 
 
-def generate_glsl_extract(fname, preprocessor, definition_ld, mode, inlines, renames, simplifys):
-    """Generate GLSL, extracting from source file."""
-    src_path, src_basename = os.path.split(fname)
-    if src_path:
-        src_path += "/"
-    fd = open(fname, "r")
-    lines = fd.readlines()
-    fd.close()
-    filenames = []
-    glslre = re.compile(r'#\s*include [\<\"](.*\.glsl)\.(h|hh|hpp|hxx)[\>\"]\s*(\/\*|\/\/)\s*([^\*\/\s]+)', re.I)
-    for ii in lines:
-        match = glslre.match(ii)
-        if match:
-            glsl_path, glsl_base_filename = os.path.split(match.group(1))
-            # Try with base path of source file first to limit location.
-            glsl_filename = locate(src_path + glsl_path, glsl_base_filename)
-            if not glsl_filename and src_base_path:
-                glsl_filename = locate(glsl_path, glsl_base_filename)
-            if not glsl_filename:
-                raise RuntimeError("could not locate GLSL source '%s'" % (glsl_base_filename))
-            glsl_varname = match.group(4)
-            glsl_output_name = glsl_filename + "." + match.group(2)
-            filenames += [[glsl_filename, glsl_varname, glsl_output_name]]
-    if filenames:
-        glsl_db = generate_glsl(filenames, preprocessor, definition_ld, mode, inlines, renames, simplifys)
-        glsl_db.write()
+def generate_glsl_batch(batches, preprocessor, definition_ld, mode, inlines, renames, simplifys):
+    """Generate GLSL for listings of GLSL source files, one source database per listing."""
+    source_batches = generate_glsl_sources(batches, preprocessor, definition_ld)
+    return generate_glsl_crunch(source_batches, mode, inlines, renames, simplifys)
+
+
+def generate_glsl_crunch(source_batches, mode, inlines, renames, simplifys):
+    """Crunch listings of read GLSL sources, one source database per listing."""
+    # Renaming and inlining span all files of a database, crunch each database separately.
+    ret = []
+    for ii in source_batches:
+        glsl_db = Glsl()
+        glsl_db.addSources(ii)
+        glsl_db.parse()
+        glsl_db.crunch(mode, inlines, renames, simplifys)
+        ret += [glsl_db]
+    return ret
+
+
+def generate_glsl_extract(fnames, preprocessor, definition_ld, mode, inlines, renames, simplifys):
+    """Generate GLSL, extracting from given source files."""
+    batches = [x for x in [get_glsl_extract_listing(x) for x in fnames] if x]
+    source_batches = generate_glsl_sources(batches, preprocessor, definition_ld)
+    # Shaders included from one source file are crunched together, cache their headers as a set.
+    cache = get_build_cache()
+    keys = []
+    if cache:
+        pending_batches = []
+        pending_source_batches = []
+        for (ii, jj) in zip(batches, source_batches):
+            # Preprocessor output covers included files, the source itself covers directives taken out before it.
+            shaders = []
+            for (listing, source) in zip(ii, jj):
+                shaders += [[os.path.basename(listing[0]), listing[1], os.path.splitext(listing[2])[1],
+                             file_contents(listing[0]), source.getPreprocessed()]]
+            key = cache.digest(["glsl", get_source_digest(), shaders, definition_ld, mode, inlines, renames, simplifys])
+            if not cache.fetch("glsl", key, [x[2] for x in ii], True):
+                pending_batches += [ii]
+                pending_source_batches += [jj]
+                keys += [key]
+        batches = pending_batches
+        source_batches = pending_source_batches
+    glsl_dbs = generate_glsl_crunch(source_batches, mode, inlines, renames, simplifys)
+    for ii in range(len(glsl_dbs)):
+        glsl_dbs[ii].write()
+        if cache:
+            cache.store("glsl", keys[ii], [x[2] for x in batches[ii]])
+
+
+def generate_glsl_sources(batches, preprocessor, definition_ld):
+    """Read listings of GLSL source files, return listings of read sources."""
+    # Files are independent until crunching, read and parse all of them at once.
+    listings = []
+    for ii in batches:
+        listings += [get_glsl_listing(x) for x in ii]
+    sources = glsl_read_sources(preprocessor, definition_ld, listings)
+    ret = []
+    for ii in batches:
+        ret += [sources[:len(ii)]]
+        sources = sources[len(ii):]
+    return ret
 
 
 def generate_include_rand(implementation_rand, target_search_path, definition_ld):
@@ -790,6 +890,47 @@ def generate_include_rand(implementation_rand, target_search_path, definition_ld
                                            "HEADER_RAND": header_rand, "SOURCE_RAND": source_rand})
 
 
+def get_glsl_extract_listing(fname):
+    """Get listing of GLSL source files included from given source file."""
+    src_path, src_basename = os.path.split(fname)
+    if src_path:
+        src_path += "/"
+    fd = open(fname, "r")
+    lines = fd.readlines()
+    fd.close()
+    ret = []
+    glslre = re.compile(r'#\s*include [\<\"](.*\.glsl)\.(h|hh|hpp|hxx)[\>\"]\s*(\/\*|\/\/)\s*([^\*\/\s]+)', re.I)
+    for ii in lines:
+        match = glslre.match(ii)
+        if match:
+            glsl_path, glsl_base_filename = os.path.split(match.group(1))
+            # Try with base path of source file first to limit location.
+            glsl_filename = locate(src_path + glsl_path, glsl_base_filename)
+            if not glsl_filename and src_base_path:
+                glsl_filename = locate(glsl_path, glsl_base_filename)
+            if not glsl_filename:
+                raise RuntimeError("could not locate GLSL source '%s'" % (glsl_base_filename))
+            glsl_varname = match.group(4)
+            glsl_output_name = glsl_filename + "." + match.group(2)
+            ret += [[glsl_filename, glsl_varname, glsl_output_name]]
+    return ret
+
+
+def get_glsl_listing(op):
+    """Get (filename, varname, output name) tuple from a GLSL source file listing or filename."""
+    # If there's a listing, the order is filename, varname, output name.
+    if is_listing(op):
+        if 3 == len(op):
+            return (op[0], op[1], op[2])
+        elif 2 == len(op):
+            varname = re.sub(r'\.', r'_', os.path.basename(op[0]))
+            return (op[0], varname, op[1])
+        raise RuntimeError("invalid glsl file listing input: '%s'" % (str(op)))
+    # Otherwise only filename exists.
+    varname = re.sub(r'\.', r'_', os.path.basename(op))
+    return (op, varname, None)
+
+
 def get_platform_und_symbols():
     """Get the UND symbols required for this platform."""
     ret = None
@@ -825,6 +966,24 @@ def merge_segments(lst):
     return lst
 
 
+def order_segments(fixed, lst):
+    """Order segments following fixed segments so that merging them saves the most bytes."""
+    # Every order is merged on copies, ties keep the earliest order tried which is the original one.
+    verbose = is_verbose()
+    set_verbose(False)
+    sizes = []
+    try:
+        for ii in itertools.permutations(lst):
+            merged = merge_segments(copy.deepcopy(fixed + list(ii)))
+            sizes += [(sum([x.size() for x in merged]), len(sizes), fixed + list(ii))]
+    finally:
+        set_verbose(verbose)
+    ret = min(sizes, key=lambda x: x[:2])
+    if is_verbose() and (sizes[0][0] > ret[0]):
+        print("Reordered headers to save %i bytes." % (sizes[0][0] - ret[0]))
+    return ret[2]
+
+
 def osname_is_freebsd():
     """Check if the operating system name maps to FreeBSD."""
     return ("FreeBSD" == g_osname)
@@ -841,30 +1000,20 @@ def raise_unknown_address_size():
 
 
 def readelf_get_info(op):
-    """Read information from an ELF file using readelf. Return as dictionary."""
-    ret = {}
-    (so, se) = run_command(["readelf", "-l", op])
-    match = re.search(r'LOAD\s+\S+\s+(\S+)\s+\S+\s+(\S+)\s+\S+\s+RWE', so, re.MULTILINE)
-    if match:
-        ret["base"] = int(match.group(1), 16)
-        ret["size"] = int(match.group(2), 16)
-    else:
-        raise RuntimeError("could not read first PT_LOAD from executable '%s'" % (op))
-    # Entry point is locale-dependant so attempt to read it from the second line.
-    match = re.match(r'\s*\n.*EXEC.*\n*.*\s+(0x\S+)\n', so, re.MULTILINE)
-    if match:
-        ret["entry"] = int(match.group(1), 16) - ret["base"]
-    else:
-        raise RuntimeError("could not read entry point from executable '%s'" % (op))
+    """Read information from an ELF file. Return as dictionary."""
+    reader = ElfReader(op)
+    ret = reader.get_load_info()
+    reader.close()
     return ret
 
 
 def readelf_list_und_symbols(op):
     """List UND symbols found from a file."""
-    (so, se) = run_command(["readelf", "--symbols", op])
-    match = re.findall(r'GLOBAL\s+DEFAULT\s+UND\s+(\S+)\s+', so, re.MULTILINE)
-    if match:
-        return match
+    reader = ElfReader(op)
+    ret = reader.get_und_symbols()
+    reader.close()
+    if ret:
+        return ret
     return None
 
 
@@ -888,11 +1037,7 @@ def readelf_truncate(src, dst):
         return
     if is_verbose():
         print("Truncating file size to PT_LOAD size: %u bytes" % (truncate_size))
-    rfd = open(src, "rb")
-    wfd = open(dst, "wb")
-    wfd.write(rfd.read(truncate_size))
-    rfd.close()
-    wfd.close()
+    file_copy_prefix(src, dst, truncate_size)
 
 
 def readelf_zero(src, dst):
@@ -903,14 +1048,9 @@ def readelf_zero(src, dst):
         return
     if is_verbose():
         print("Filling file with 0 after PT_LOAD size: %u bytes" % (truncate_size))
-    rfd = open(src, "rb")
-    wfd = open(dst, "wb")
-    wfd.write(rfd.read(truncate_size))
-    rfd.close()
-    while truncate_size < size - 1:
-        wfd.write("\0")
-        truncate_size += 1
-    wfd.close()
+    file_copy_prefix(src, dst, truncate_size)
+    # Extending the file fills with zeroes without writing them, file system may keep the area sparse.
+    os.truncate(dst, size)
 
 
 def replace_conflicting_library(symbols, src_name, dst_name):
@@ -930,7 +1070,7 @@ def replace_conflicting_library(symbols, src_name, dst_name):
                 ret += [replacement]
             else:
                 new_symbol = ii.create_replacement(dst)
-                dst.add_symbol(new_symbol)
+                g_symbol_index.add_symbol(new_symbol)
                 ret += [new_symbol]
         else:
             ret += [ii]
@@ -944,7 +1084,8 @@ def set_program_start(op):
 
 def symbols_has_library(symbols, op):
     """Tell if symbol collection wants to link against any of the given libraries."""
-    name_list = listify(op)
+    # Collection is the set of symbols in use, not the symbol index, a single pass over it is all that is needed.
+    name_list = set(listify(op))
     for ii in symbols:
         if ii.get_library().get_name() in name_list:
             return True
@@ -953,7 +1094,7 @@ def symbols_has_library(symbols, op):
 
 def symbols_has_symbol(symbols, op):
     """Tell if symbol collection has any of the given symbols."""
-    name_list = listify(op)
+    name_list = set(listify(op))
     for ii in symbols:
         if ii.get_name() in name_list:
             return True
@@ -1010,8 +1151,16 @@ def main():
                         help="Try to use given assembler executable as opposed to autodetect.")
     parser.add_argument("-B", "--objcopy", default=None,
                         help="Try to use given objcopy executable as opposed to autodetect.")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse build artifacts from a content-addressed cache when inputs are unchanged.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory for build cache, implies --cache.\n(default: %s)" % (get_default_cache_dir()))
     parser.add_argument("-C", "--compiler", default=None,
                         help="Try to use given compiler executable as opposed to autodetect.")
+    parser.add_argument("--compression-search", action="store_true",
+                        help="Search for LZMA parameters yielding smallest output using all available cores.")
+    parser.add_argument("--direct-link", action="store_true",
+                        help="Link final binary in-process instead of using linker and objcopy when possible.")
     parser.add_argument("-d", "--definition-ld", default="USE_LD",
                         help="Definition to use for checking whether to use 'safe' mechanism instead of dynamic loading.\n(default: %(default)s)")
     parser.add_argument("-D", "--define", default=[], action="append", help="Additional preprocessor definition.")
@@ -1019,6 +1168,12 @@ def main():
     parser.add_argument("-E", "--preprocess-only", action="store_true",
                         help="Preprocess only, do not generate compiled output.")
     parser.add_argument("-h", "--help", action="store_true", help="Print this help string and exit.")
+    parser.add_argument("--hash-bits", default=None, type=int,
+                        help="Truncate symbol hashes to given number of bits, checking for collisions.\n(default: 32, minimal collision-free width with 'auto' hash function)")
+    parser.add_argument("--hash-function", default="sdbm", choices=("auto", "djb2", "fnv1a", "sdbm"),
+                        help="Hash function to use for import by hash. 'auto' selects the smallest collision-free hash for the libraries linked against.\n(default: %(default)s)")
+    parser.add_argument("--hash-report", action="store_true",
+                        help="Report symbol hash collisions and minimal collision-free hash widths.")
     parser.add_argument("-I", "--include-directory", default=[], action="append",
                         help="Add an include directory to be searched for header files.")
     parser.add_argument("--interp", default=None, type=str,
@@ -1039,6 +1194,8 @@ def main():
                         help="Do not probe for OpenGL ES 2.0, always assume regular GL.")
     parser.add_argument("--glsl-mode", default="full", choices=("none", "nosquash", "full"),
                         help="GLSL crunching mode.\n(default: %(default)s)")
+    parser.add_argument("--glsl-builtin-preprocessor", action="store_true",
+                        help="Preprocess GLSL with a built-in preprocessor when possible, falls back to external\npreprocessor on unsupported input.")
     parser.add_argument("--glsl-inlines", default=-1, type=int,
                         help="Maximum number of inline operations to do for GLSL.\n(default: unlimited)")
     parser.add_argument("--glsl-renames", default=-1, type=int,
@@ -1055,6 +1212,8 @@ def main():
                         help="Call prefix to identify desired calls.\n(default: %(default)s)")
     parser.add_argument("--preprocessor", default=None,
                         help="Try to use given preprocessor executable as opposed to autodetect.")
+    parser.add_argument("--profile", default=None,
+                        help="Profile Python code with cProfile, write statistics into given file.")
     parser.add_argument("--rand", default="bsd", choices=("bsd", "gnu"),
                         help="rand() implementation to use.\n(default: %(default)s)")
     parser.add_argument("--rpath", default=[], action="append", help="Extra rpath locations for linking.")
@@ -1063,8 +1222,12 @@ def main():
                         help="Directory to search for the header file to generate. May be specified multiple times. If not given, searches paths of source files to compile. If not given and no source files to compile, current path will be used.")
     parser.add_argument("-S", "--strip-binary", default=None,
                         help="Try to use given strip executable as opposed to autodetect.")
+    parser.add_argument("--symbol-table", default=[], action="append",
+                        help="Load additional symbol definitions from a JSON or TSV file.")
     parser.add_argument("-t", "--target", default="shrinky.h",
                         help="Target header file to look for.\n(default: %(default)s)")
+    parser.add_argument("--trace", default=None,
+                        help="Write Chrome trace of pipeline phases and external commands into given file, print\nsummary of time spent.")
     parser.add_argument("-u", "--unpack-header", choices=("lzma", "xz"), default=compression,
                         help="Unpack header to use.\n(default: %(default)s)")
     parser.add_argument("-v", "--verbose", action="store_true", help="Print more info about what is being done.")
@@ -1088,11 +1251,14 @@ def main():
     definitions += args.define
     compilation_mode = args.method
     compression = args.unpack_header
+    compression_search = args.compression_search
     elfling = args.elfling
     glsl_inlines = args.glsl_inlines
     glsl_renames = args.glsl_renames
     glsl_simplifys = args.glsl_simplifys
     glsl_mode = args.glsl_mode
+    hash_bits = args.hash_bits
+    hash_function = args.hash_function
     implementation_rand = args.rand
     include_directories += args.include_directory
     libraries = args.library
@@ -1113,6 +1279,22 @@ def main():
     if args.verbose:
         set_verbose(True)
 
+    # Tracing and profiling cover the rest of the run, results are written on exit.
+    if args.trace:
+        trace_start(args.trace)
+    if args.profile:
+        profile_start(args.profile)
+
+    # Build cache.
+    if args.cache or args.cache_dir:
+        cache_dir = args.cache_dir
+        if not cache_dir:
+            cache_dir = get_default_cache_dir()
+        build_cache = BuildCache(cache_dir)
+        set_build_cache(build_cache)
+        # Directory trees searched for libraries and headers are persisted as well.
+        set_directory_index_cache(build_cache)
+
     # Definitions.
     if args.nice_exit:
         definitions += ["SHRINKY_NO_DEBUGGER_TRAP"]
@@ -1149,6 +1331,7 @@ def main():
     preprocessor = Preprocessor(executable_find(preprocessor, preprocessor_list, "preprocessor"))
     preprocessor.set_definitions(definitions)
     preprocessor.set_include_dirs(include_directories)
+    preprocessor.set_builtin(args.glsl_builtin_preprocessor)
 
     # Process GLSL source if given.
     if source_files_glsl:
@@ -1161,8 +1344,10 @@ def main():
         if source_files or source_files_additional:
             raise RuntimeError("can not combine GLSL source %s with other source files %s" %
                                (str(source_files_glsl), str(source_files + source_files_additional)))
+        trace_begin("glsl")
         glsl_db = generate_glsl(source_files_glsl, preprocessor, definition_ld,
                                 glsl_mode, glsl_inlines, glsl_renames, glsl_simplifys)
+        trace_end()
         if output_file:
             glsl_db.write()
         else:
@@ -1252,28 +1437,56 @@ def main():
     if is_verbose():
         print("Analyzing source files: %s" % (str(source_files)))
     # Prepare GLSL headers before preprocessing.
-    for ii in source_files:
-        generate_glsl_extract(ii, preprocessor, definition_ld, glsl_mode, glsl_inlines, glsl_renames, glsl_simplifys)
+    trace_begin("glsl")
+    generate_glsl_extract(source_files, preprocessor, definition_ld, glsl_mode, glsl_inlines, glsl_renames,
+                          glsl_simplifys)
+    trace_end()
+    # Load external symbol tables before searching for symbols.
+    for ii in args.symbol_table:
+        g_symbol_index.load(ii)
     # Search symbols from source files.
+    trace_begin("symbols")
     symbols = set()
     for ii in source_files:
+        trace_begin("preprocess", args={"file": ii})
         source = preprocessor.preprocess(ii)
+        trace_end()
         source_symbols = extract_symbol_names(source, symbol_prefix)
         symbols = symbols.union(source_symbols)
     symbols = find_symbols(symbols)
     if "dlfcn" == compilation_mode:
         symbols = sorted(symbols)
-    elif "maximum" == compilation_mode:
+    # Some libraries cannot co-exist, but have some symbols with identical names.
+    symbols = replace_conflicting_library(symbols, "SDL", "SDL2")
+    # Filter real symbols (as separate from implicit).
+    real_symbols = list([x for x in symbols if not x.is_verbatim()])
+    # Select symbol hash, analyzing the libraries actually linked against if necessary.
+    if compilation_mode in ("hash", "maximum"):
+        if ("auto" == hash_function) or hash_bits or args.hash_report:
+            linker.set_library_directories(library_directories)
+            hash_libraries = collect_libraries(list(libraries), real_symbols, compilation_mode)
+            (hash_files, hash_symbol_names) = read_library_symbol_names(linker, hash_libraries)
+            if not hash_files:
+                print("WARNING: no libraries found for symbol hash analysis")
+            analysis = analyze_symbol_hashes([x.get_name() for x in real_symbols], hash_symbol_names)
+            if args.hash_report or is_verbose():
+                print(generate_symbol_hash_report(hash_files, hash_symbol_names, analysis))
+            if ("auto" != hash_function) and (not hash_bits):
+                hash_bits = 32
+            (hash_function, hash_bits) = select_symbol_hash(analysis, hash_function, hash_bits)
+            if is_verbose():
+                print("Using symbol hash '%s' truncated to %i bits." % (hash_function, hash_bits))
+        elif not hash_bits:
+            hash_bits = 32
+        set_symbol_hash(hash_function, hash_bits)
+    if "maximum" == compilation_mode:
         sortable_symbols = []
         for ii in symbols:
             sortable_symbols += [(ii.get_hash(), ii)]
         symbols = []
         for ii in sorted(sortable_symbols):
             symbols += [ii[1]]
-    # Some libraries cannot co-exist, but have some symbols with identical names.
-    symbols = replace_conflicting_library(symbols, "SDL", "SDL2")
-    # Filter real symbols (as separate from implicit).
-    real_symbols = list([x for x in symbols if not x.is_verbatim()])
+        real_symbols = list([x for x in symbols if not x.is_verbatim()])
     if is_verbose():
         symbol_strings = [str(x) for x in symbols]
         print("%i symbols found: %s" % (len(symbol_strings), str(symbol_strings)))
@@ -1283,7 +1496,9 @@ def main():
             for ii in verbatim_symbols:
                 verbatim_symbol_strings += [str(ii)]
             print("Not loading verbatim symbols: %s" % (str(verbatim_symbol_strings)))
+    trace_end({"symbols": len(symbols)})
     # Header includes.
+    trace_begin("header")
     subst = {}
     if symbols_has_library(symbols, "freetype"):
         subst["INCLUDE_FREETYPE"] = g_template_include_freetype.format()
@@ -1327,6 +1542,7 @@ def main():
     fd = open(target, "w")
     fd.write(file_contents)
     fd.close()
+    trace_end()
     if is_verbose():
         print("Wrote header file: '%s'" % (target))
     # Early exit if preprocess only.
@@ -1399,6 +1615,7 @@ def main():
     linker.set_libraries(libraries)
     linker.set_library_directories(library_directories)
     linker.set_rpath_directories(rpath)
+    linker.set_direct(args.direct_link)
     if "maximum" == compilation_mode:
         objcopy = executable_find(objcopy, default_objcopy_list, "objcopy")
         generate_binary_minimal(source_file, compiler, assembler, linker, objcopy, elfling, libraries, output_file,
@@ -1409,28 +1626,42 @@ def main():
             generate_binary_minimal(None, compiler, assembler, linker, objcopy, elfling, libraries, output_file,
                                     source_files_additional)
     elif "hash" == compilation_mode:
+        trace_begin("compile")
         compiler.compile_asm(source_file, output_file + ".S")
+        trace_end()
         asm = AssemblerFile(output_file + ".S")
         # asm.sort_sections()
         # asm.remove_rodata()
+        trace_begin("assemble")
         asm.write(output_file + ".final.S", assembler)
         assembler.assemble(output_file + ".final.S", output_file + ".o")
+        trace_end()
+        trace_begin("link")
         linker.generate_linker_script(output_file + ".ld")
         linker.set_linker_script(output_file + ".ld")
         linker.link(output_file + ".o", output_file + ".unprocessed")
+        trace_end()
     elif "dlfcn" == compilation_mode or "vanilla" == compilation_mode:
+        trace_begin("compile")
         compiler.compile_and_link(source_file, output_file + ".unprocessed")
+        trace_end()
     else:
         raise RuntimeError("unknown compilation mode: %s" % str(compilation_mode))
     if compilation_mode in ("vanilla", "dlfcn", "hash"):
         # strip and sstrip
+        trace_begin("strip")
         strip = executable_find(strip, default_strip_list, "strip")
         shutil.copy(output_file + ".unprocessed", output_file + ".stripped")
         run_command([strip, "-K", ".bss", "-K", ".text", "-K", ".data", "-R", ".comment", "-R", ".eh_frame", "-R", ".eh_frame_hdr", "-R", ".fini",
                      "-R", ".gnu.hash", "-R", ".gnu.version", "-R", ".jcr", "-R", ".note", "-R", ".note.ABI-tag", "-R", ".note.tag", output_file + ".stripped"])
         #sstrip = executable_find(sstrip, default_sstrip_list, "sstrip")
         #run_command([sstrip, output_file + ".stripped"])
-    compress_file(compression, nice_filedump, output_file + ".stripped", output_file)
+        trace_end()
+    trace_begin("compress")
+    compress_file(compression, nice_filedump, output_file + ".stripped", output_file, compression_search)
+    trace_end()
+    if get_build_cache():
+        print(get_build_cache().report())
 
     return 0
 
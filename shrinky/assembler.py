@@ -1,8 +1,9 @@
 import os
 
+from shrinky.build_cache import run_command_cached
 from shrinky.common import is_listing
+from shrinky.common import is_verbose
 from shrinky.common import listify
-from shrinky.common import run_command
 
 ########################################
 # Assembler ############################
@@ -42,7 +43,7 @@ class Assembler:
     def assemble(self, src, dst):
         """Assemble a file."""
         cmd = [self.__executable, src, "-o", dst] + self.__assembler_flags_extra
-        (so, se) = run_command(cmd)
+        (so, se) = run_command_cached("assemble", cmd, src, dst)
         if 0 < len(se) and is_verbose():
             print(se)
 
@@ -53,10 +53,7 @@ class AssemblerFile:
         """Remove local labels that would seem to generate .bss, make a fake .bss section."""
         bss = AssemblerSectionBss()
         for ii in self.__sections:
-            while True:
-                entry = ii.extract_bss(und_symbols)
-                if not entry:
-                    break
+            for entry in ii.extract_bss(und_symbols):
                 if not entry.is_und_symbol():
                     bss.add_element(entry)
         if elfling:
@@ -134,7 +131,6 @@ class AssemblerFile:
             raise RuntimeError("incorporating '%s': jump point not defined but entry point exists" % (str(other)))
         # Suffix all labels with given label to prevent generated code name clashes.
         if label_name:
-            labels.sort(key=len, reverse=True)
             for ii in other.__sections:
                 ii.replace_labels(labels, label_name)
         self.add_sections(other.__sections)
@@ -1,3 +1,4 @@
+import bisect
 import re
 
 from shrinky.assembler_bss_element import AssemblerBssElement
@@ -20,63 +21,30 @@ class AssemblerSection:
         self.__name = section_name
         self.__tag = section_tag
         self.__content = []
+        self.__index = None
 
     def add_content(self, line):
         """Add one or more lines of content."""
         for ii in line.strip("\n").split("\n"):
             self.__content += [ii + "\n"]
+        self.__index = None
 
     def clear_content(self):
         """Clear all content."""
         self.__content = []
+        self.__index = None
 
     def crunch(self):
         """Remove all offending content."""
-        while True:
-            #lst = self.want_line(r'\s*\.file\s+(.*)')
-            # if lst:
-            #  self.erase(lst[0])
-            #  continue
-            #lst = self.want_line(r'\s*\.globl\s+(.*)')
-            # if lst:
-            #  self.erase(lst[0])
-            #  continue
-            #lst = self.want_line(r'\s*\.ident\s+(.*)')
-            # if lst:
-            #  self.erase(lst[0])
-            #  continue
-            #lst = self.want_line(r'\s*\.type\s+(.*)')
-            # if lst:
-            #  self.erase(lst[0])
-            #  continue
-            #lst = self.want_line(r'\s*\.size\s+(.*)')
-            # if lst:
-            #  self.erase(lst[0])
-            #  continue
-            lst = self.want_line(r'\s*\.section\s+(.*)')
-            if lst:
-                self.erase(lst[0])
-                continue
-            lst = self.want_line(r'\s*\.(bss)\s+')
-            if lst:
-                self.erase(lst[0])
-                continue
-            lst = self.want_line(r'\s*\.(data)\s+')
-            if lst:
-                self.erase(lst[0])
-                continue
-            lst = self.want_line(r'\s*\.(text)\s+')
-            if lst:
-                self.erase(lst[0])
-                continue
-            break
+        self.__content = [x for x in self.__content if not g_crunch_re.match(x)]
+        self.__index = None
         if osarch_is_amd64():
-            self.crunch_amd64(lst)
+            self.crunch_amd64()
         elif osarch_is_ia32():
-            self.crunch_ia32(lst)
+            self.crunch_ia32()
         self.__tag = None
 
-    def crunch_amd64(self, lst):
+    def crunch_amd64(self):
         """Perform platform-dependent crunching."""
         self.crunch_entry_push("_start")
         self.crunch_entry_push(ELFLING_UNCOMPRESSED)
@@ -86,7 +54,7 @@ class AssemblerSection:
             ii = lst[0] + 1
             jj = ii
             while True:
-                if len(self.__content) <= jj or re.match(r'\s*\S+\:\s*', self.__content[jj]):
+                if len(self.__content) <= jj or g_label_line_re.match(self.__content[jj]):
                     if is_verbose():
                         print("Erasing function footer after '%s': %i lines" % (lst[1], jj - ii))
                     self.erase(ii, jj)
@@ -141,8 +109,9 @@ class AssemblerSection:
             print("Erasing function header from '%s': %i lines" % (op, jj - ii - len(reinstated_lines)))
         self.erase(ii, jj)
         self.__content[ii:ii] = reinstated_lines
+        self.__index = None
 
-    def crunch_ia32(self, lst):
+    def crunch_ia32(self):
         """Perform platform-dependent crunching."""
         self.crunch_entry_push("_start")
         self.crunch_entry_push(ELFLING_UNCOMPRESSED)
@@ -152,7 +121,7 @@ class AssemblerSection:
             ii = lst[0] + 1
             jj = ii
             while True:
-                if len(self.__content) <= jj or re.match(r'\s*\S+\:\s*', self.__content[jj]):
+                if len(self.__content) <= jj or g_label_line_re.match(self.__content[jj]):
                     if is_verbose():
                         print("Erasing function footer after interrupt '%s': %i lines" % (lst[1], jj - ii))
                     self.erase(ii, jj)
@@ -187,77 +156,89 @@ class AssemblerSection:
         if first > last:
             return
         self.__content[first:last] = []
+        self.__index = None
+
+    def erase_ranges(self, ranges):
+        """Erase multiple non-overlapping ranges of lines given in ascending order in one pass."""
+        if not ranges:
+            return
+        content = []
+        previous = 0
+        for (first, last) in ranges:
+            content += self.__content[previous:first]
+            previous = last
+        self.__content = content + self.__content[previous:]
+        self.__index = None
 
     def extract_bss(self, und_symbols):
-        """Extract a variable that should go to .bss section."""
-        # Test for relevant .bss element.
-        found = self.extract_bss_object()
-        if found:
-            return AssemblerBssElement(found[0], found[1], und_symbols)
-        found = self.extract_comm_object()
-        if found:
-            return AssemblerBssElement(found[0], found[1], und_symbols)
+        """Extract all variables that should go to .bss section, return them as a list."""
+        ret = []
+        for (name, size) in self.extract_bss_objects() + self.extract_comm_objects():
+            ret += [AssemblerBssElement(name, size, und_symbols)]
         self.minimal_align()
         self.crunch()
-        return None
+        return ret
 
-    def extract_comm_object(self):
-        """.comm extract."""
-        idx = 0
-        while True:
-            lst = self.want_line(r'\s*\.local\s+(\S+).*', idx)
-            if not lst:
-                break
-            attempt = lst[0]
-            name = lst[1]
-            idx = attempt + 1
-            lst = self.want_line(r'\s*\.comm\s+%s\s*,(.*)' % (name), idx)
-            if not lst:
+    def extract_comm_objects(self):
+        """Extract all .comm objects preceded by a matching .local declaration."""
+        index = self.get_index()
+        ret = []
+        ranges = []
+        erased_until = 0
+        for (attempt, name) in index["local"]:
+            if attempt < erased_until:
+                continue
+            comm_lines = index["comm"].get(name)
+            if not comm_lines:
+                continue
+            comm_idx = bisect.bisect_right(comm_lines, attempt)
+            if comm_idx >= len(comm_lines):
                 continue
-            size = lst[1]
-            match = re.match(r'\s*(\d+)\s*,\s*(\d+).*', size)
+            last_line = comm_lines[comm_idx]
+            size = index["lines"][last_line][2]
+            match = g_comm_size_re.match(size)
             if match:
                 size = int(match.group(1))
             else:
                 size = int(size)
-            self.erase(attempt, lst[0] + 1)
-            return (name, size)
-        return None
+            ranges += [(attempt, last_line + 1)]
+            erased_until = last_line + 1
+            ret += [(name, size)]
+        self.erase_ranges(ranges)
+        return ret
 
-    def extract_bss_object(self):
-        """Extract .bss objects signified with .object."""
-        idx = 0
-        while True:
-            lst = self.want_line(r'\s*.type\s+(\S+),\s+[@%]object', idx)
-            if not lst:
-                break
-            first_line = lst[0]
-            name = lst[1]
-            idx = first_line + 1
-            if not lst:
+    def extract_bss_objects(self):
+        """Extract all .bss objects signified with .object."""
+        index = self.get_index()
+        lines = index["lines"]
+        ret = []
+        ranges = []
+        for first_line in index["type_object"]:
+            if ranges and (first_line < ranges[-1][1]):
                 continue
-            lst = self.want_line(r'\s*(%s)\:' % (name), lst[0] + 1, 2)
-            if not lst:
+            name = lines[first_line][1]
+            label_line = find_line(lines, "label", name, first_line + 1, 2)
+            if label_line is None:
                 continue
-            lst = self.want_line(r'\s*\.(?:space|zero)\s+(\d+)', lst[0] + 1, 2)
-            if not lst:
+            space_line = find_line(lines, "space", None, label_line + 1, 2)
+            if space_line is None:
                 continue
-            last_line = lst[0] + 1
-            bss_size = int(lst[1])
+            last_line = space_line + 1
+            bss_size = int(lines[space_line][1])
             # Check if there's an additional label to remove.
-            lst = self.want_line(r'\s*\.(globl|local)\s+%s\s*' % name, first_line - 1, 1)
-            if lst:
-                first_line = lst[0]
-            # Erase and exit.
-            self.erase(first_line, last_line)
-            return (name, bss_size)
-        return None
+            if (0 < first_line) and (lines[first_line - 1][0] in ("globl", "local")) and \
+               (lines[first_line - 1][1] == name):
+                first_line -= 1
+            ranges += [(first_line, last_line)]
+            ret += [(name, bss_size)]
+        self.erase_ranges(ranges)
+        return ret
 
     def gather_globals(self):
         """Gathers a list of .globl definitions."""
         ret = set()
         for ii in self.__content:
-            match = re.match(r'\s*\.globl\s+([\.\w]+).*', ii)
+            match = g_globl_re.match(ii)
             if match:
                 ret = ret.union(set([match.group(1)]))
         return ret
@@ -266,12 +247,12 @@ class AssemblerSection:
         """Gathers all labels, if forbidden labels are specified, they are excluded."""
         ret = []
         for ii in self.__content:
-            match = re.match(r'((\.L|_ZL)[^:,\s\(]+)', ii)
+            match = g_local_label_re.match(ii)
             if match:
                 label = match.group(1)
                 if not (label in forbidden_labels):
                     ret += [label]
-            match = re.match(r'^([^\.:,\s\(]+):', ii)
+            match = g_label_re.match(ii)
             if match:
                 label = match.group(1)
                 if not (label in forbidden_labels):
@@ -287,6 +268,12 @@ class AssemblerSection:
             ret += ii
         return ret
 
+    def get_index(self):
+        """Get line index of this section, building it if necessary."""
+        if self.__index is None:
+            self.__index = build_line_index(self.__content)
+        return self.__index
+
     def get_name(self):
         """Accessor."""
         return self.__name
@@ -294,14 +281,15 @@ class AssemblerSection:
     def merge_content(self, other):
         """Merge content with another section."""
         self.__content += other.__content
+        self.__index = None
 
     def minimal_align(self):
         """Remove all .align declarations, replace with desired alignment."""
         desired = int(PlatformVar("align"))
         adjustments = []
-        for ii in range(len(self.__content)):
+        for ii in self.get_index()["align"]:
             line = self.__content[ii]
-            match = re.match(r'(\s*)\.align\s+(\d+).*', line)
+            match = g_align_re.match(line)
             if not match:
                 continue
             # Get actual align byte count.
@@ -313,28 +301,32 @@ class AssemblerSection:
                 continue
             self.__content[ii] = "%s.balign %i\n" % (match.group(1), desired)
             adjustments += ["%i -> %i" % (align, desired)]
+        if adjustments:
+            self.__index = None
         if is_verbose() and adjustments:
             print("Alignment adjustment(%s): %s" % (self.get_name(), ", ".join(adjustments)))
 
     def replace_content(self, op):
         """Replace content of this section with content of given section."""
         self.__content = op.__content
+        self.__index = None
 
     def replace_entry_point(self, op):
         """Replaces an entry point with given entry point name from this section, should it exist."""
         lst = self.want_entry_point()
         if lst:
             self.__content[lst[0]] = "%s:\n" % op
+            self.__index = None
 
     def replace_labels(self, labels, append):
-        """Replace all labels."""
+        """Replace all whole-identifier occurrences of given labels in one pass."""
+        if not labels:
+            return
+        label_set = set(labels)
         for ii in range(len(self.__content)):
-            src = self.__content[ii]
-            for jj in labels:
-                dst = src.replace(jj, jj + append)
-                if dst != src:
-                    self.__content[ii] = dst
-                    break
+            self.__content[ii] = g_identifier_re.sub(lambda x: rename_label(x.group(0), label_set, append),
+                                                     self.__content[ii])
+        self.__index = None
 
     def want_entry_point(self):
         """Want a line matching the entry point function."""
@@ -346,8 +338,9 @@ class AssemblerSection:
 
     def want_line(self, op, first=0, count=0x7FFFFFFF):
         """Want a line matching regex from object."""
+        regex = compile_pattern(op)
         for ii in range(first, min(len(self.__content), first + count)):
-            match = re.match(op, self.__content[ii], re.IGNORECASE)
+            match = regex.match(self.__content[ii])
             if match:
                 return (ii, match.group(1))
         return None
@@ -356,11 +349,74 @@ class AssemblerSection:
         """String representation."""
         return "AssemblerSection('%s', %i)" % (self.__name, len(self.__content))
 
+########################################
+# Globals ##############################
+########################################
+
+g_align_re = re.compile(r'(\s*)\.align\s+(\d+).*')
+
+g_comm_size_re = re.compile(r'\s*(\d+)\s*,\s*(\d+).*')
+
+g_compiled_patterns = {}
+
+g_crunch_re = re.compile(r'\s*\.(section|bss|data|text)\s+', re.IGNORECASE)
+
+g_identifier_re = re.compile(r'(?<![\w\.])[A-Za-z_\.][\w\.]*')
+
+g_globl_re = re.compile(r'\s*\.globl\s+([\.\w]+).*')
+
+g_label_line_re = re.compile(r'\s*\S+\:\s*')
+
+g_label_re = re.compile(r'^([^\.:,\s\(]+):')
+
+g_line_index_re = re.compile(r"""\s*(?:
+    \.align\s+(?P<align>\d+) |
+    \.comm\s+(?P<comm>[^\s,]+)\s*,(?P<comm_size>.*) |
+    \.(?P<scope>globl|local)\s+(?P<scope_name>\S+) |
+    \.(?:space|zero)\s+(?P<space>\d+) |
+    .type\s+(?P<type_object>\S+),\s+[@%]object |
+    (?P<label>[^\s:]+)\:
+    )""", re.IGNORECASE | re.VERBOSE)
+
+g_local_label_re = re.compile(r'((\.L|_ZL)[^:,\s\(]+)')
+
 ########################################
 # Functions ############################
 ########################################
 
 
+def build_line_index(lines):
+    """Classify lines of assembler source, return index of line numbers by class and symbol name."""
+    ret = {"align": [], "comm": {}, "lines": [], "local": [], "type_object": []}
+    for ii in range(len(lines)):
+        match = g_line_index_re.match(lines[ii])
+        if not match:
+            ret["lines"] += [(None, None)]
+        elif match.group("align"):
+            ret["lines"] += [("align", match.group("align"))]
+            ret["align"] += [ii]
+        elif match.group("comm"):
+            name = match.group("comm")
+            ret["lines"] += [("comm", name, match.group("comm_size"))]
+            if name in ret["comm"]:
+                ret["comm"][name] += [ii]
+            else:
+                ret["comm"][name] = [ii]
+        elif match.group("scope"):
+            scope = match.group("scope").lower()
+            ret["lines"] += [(scope, match.group("scope_name"))]
+            if "local" == scope:
+                ret["local"] += [(ii, match.group("scope_name"))]
+        elif match.group("space"):
+            ret["lines"] += [("space", match.group("space"))]
+        elif match.group("type_object"):
+            ret["lines"] += [("type_object", match.group("type_object"))]
+            ret["type_object"] += [ii]
+        else:
+            ret["lines"] += [("label", match.group("label"))]
+    return ret
+
+
 def can_minimize_align(op):
     """Check if alignment directive can be minimized."""
     # Memory area that is potential source or target of xmm register. Let's not.
@@ -369,6 +425,23 @@ def can_minimize_align(op):
     return True
 
 
+def compile_pattern(op):
+    """Get a compiled case-insensitive regex for given pattern, compiling only once."""
+    ret = g_compiled_patterns.get(op)
+    if not ret:
+        ret = re.compile(op, re.IGNORECASE)
+        g_compiled_patterns[op] = ret
+    return ret
+
+
+def find_line(lines, kind, name, first, count):
+    """Find first classified line of given kind (and name) within a range of an index, or None."""
+    for ii in range(first, min(len(lines), first + count)):
+        if (kind == lines[ii][0]) and ((name is None) or (name == lines[ii][1])):
+            return ii
+    return None
+
+
 def get_align_bytes(op):
     """Due to GNU AS compatibility modes, .align may mean different things."""
     if osarch_is_amd64() or osarch_is_ia32():
@@ -403,3 +476,10 @@ def is_reinstate_line(op):
 def is_stack_save_register(op):
     """Tell if given register is used for saving the stack."""
     return op.lower() in ('rbp', 'ebp')
+
+
+def rename_label(op, labels, append):
+    """Rename identifier by appending given string if it is one of the labels."""
+    if op in labels:
+        return op + append
+    return op
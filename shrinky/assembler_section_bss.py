@@ -1,3 +1,5 @@
+import bisect
+
 from shrinky.assembler_section import AssemblerSection
 from shrinky.platform_var import PlatformVar
 
@@ -13,16 +15,23 @@ class AssemblerSectionBss(AssemblerSection):
         """Constructor."""
         AssemblerSection.__init__(self, "bss")
         self.__elements = []
+        self.__element_keys = []
+        self.__element_set = set()
         self.__size = 0
         self.__und_size = 0
 
     def add_element(self, op):
         """Add one variable element."""
-        if op in self.__elements:
-            print("WARNING: trying to add .%s element twice: %s" % (sekf.__name, str(element)))
+        identity = (op.get_name(), op.get_size(), op.is_und_symbol())
+        if identity in self.__element_set:
+            print("WARNING: trying to add .%s element twice: %s" % (self.get_name(), str(op)))
             return
-        self.__elements += [op]
-        self.__elements.sort()
+        self.__element_set.add(identity)
+        # Keep elements ordered: UND symbols first, then by size, in order of addition within equal keys.
+        key = (not op.is_und_symbol(), op.get_size())
+        idx = bisect.bisect_right(self.__element_keys, key)
+        self.__element_keys.insert(idx, key)
+        self.__elements.insert(idx, op)
         self.__size += op.get_size()
         if op.is_und_symbol():
             self.__und_size += op.get_size()
@@ -149,17 +149,9 @@ class AssemblerSegment:
 
     def merge(self, op):
         """Attempt to merge with given segment."""
-        highest_mergable = 0
         (head_src, bytestream_src) = self.deconstruct_tail()
         (bytestream_dst, tail_dst) = op.deconstruct_head()
-        for ii in range(min(len(bytestream_src), len(bytestream_dst))):
-            mergable = True
-            for jj in range(ii + 1):
-                if not bytestream_src[-ii - 1 + jj].mergable(bytestream_dst[jj]):
-                    mergable = False
-                    break
-            if mergable:
-                highest_mergable = ii + 1
+        highest_mergable = find_overlap(bytestream_src, bytestream_dst)
         if 0 >= highest_mergable:
             return False
         if is_verbose():
@@ -209,3 +201,31 @@ class AssemblerSegment:
         if 0 >= len(self.__data):
             raise RuntimeError("segment '%s' is empty" % self.__name)
         fd.write(self.generate_source(assembler))
+
+########################################
+# Functions ############################
+########################################
+
+
+def find_overlap(src, dst):
+    """Find length of the longest suffix of source bytestream that is mergable with a prefix of destination."""
+    # Knuth-Morris-Pratt, prefixes of destination are matched against source with failure links of destination.
+    if not dst:
+        return 0
+    failure = [0] * len(dst)
+    kk = 0
+    for ii in range(1, len(dst)):
+        while (0 < kk) and (not dst[ii].mergable(dst[kk])):
+            kk = failure[kk - 1]
+        if dst[ii].mergable(dst[kk]):
+            kk += 1
+        failure[ii] = kk
+    ret = 0
+    for ii in src:
+        if len(dst) <= ret:
+            ret = failure[ret - 1]
+        while (0 < ret) and (not ii.mergable(dst[ret])):
+            ret = failure[ret - 1]
+        if (ret < len(dst)) and ii.mergable(dst[ret]):
+            ret += 1
+    return ret
@@ -0,0 +1,356 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from shrinky.assembler_file import AssemblerFile
+from shrinky.common import set_verbose
+from shrinky.compression import compress_data
+from shrinky.compression import get_default_compression_parameters
+from shrinky.custom_help_formatter import CustomHelpFormatter
+from shrinky.glsl import Glsl
+from shrinky.glsl_block import tokenize
+from shrinky.glsl_block import tokenize_split
+from shrinky.glsl_block_preprocessor import glsl_parse_preprocessor
+from shrinky.glsl_parse import glsl_parse_tokenized
+from shrinky.preprocessor import Preprocessor
+from shrinky.trace import get_trace
+from shrinky.trace import set_trace
+from shrinky.trace import trace_begin
+from shrinky.trace import trace_end
+from shrinky.trace import Trace
+
+########################################
+# Functions ############################
+########################################
+
+
+def bench_asm(scales, repeats):
+    """Benchmark incorporating generated assembler files into each other, i.e. label renaming."""
+    temp_dir = tempfile.mkdtemp(prefix="shrinky-bench-")
+    try:
+        for ii in scales:
+            fname_main = os.path.join(temp_dir, "main_%i.S" % (ii))
+            fname_other = os.path.join(temp_dir, "other_%i.S" % (ii))
+            write_file(fname_main, generate_asm_source("main", ii))
+            write_file(fname_other, generate_asm_source("other", ii))
+            elapsed = time_best(repeats, lambda: (AssemblerFile(fname_main), AssemblerFile(fname_other)),
+                                lambda x: x[0].incorporate(x[1], "_incorporated"))
+            print_result("asm", "incorporate %i functions" % (ii), elapsed)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_glsl(scales, repeats):
+    """Benchmark crunching the GLSL corpus phase by phase and report output sizes. Scales are not used."""
+    # Files sharing a name before the first period are crunched together so inouts connect them.
+    sets = {}
+    for ii in sorted(glob.glob(os.path.join(get_source_root(), "tests", "corpus", "*.glsl"))):
+        name = os.path.basename(ii).split(".")[0]
+        if name in sets:
+            sets[name] += [ii]
+        else:
+            sets[name] = [ii]
+    # Intermediate files are written next to sources, work on copies.
+    temp_dir = tempfile.mkdtemp(prefix="shrinky-bench-")
+    try:
+        preprocessor = Preprocessor("cpp")
+        for name in sorted(sets.keys()):
+            fnames = []
+            for ii in sets[name]:
+                fnames += [os.path.join(temp_dir, os.path.basename(ii))]
+                shutil.copyfile(ii, fnames[-1])
+            best = {}
+            for ii in range(repeats):
+                glsl = Glsl()
+                for jj in fnames:
+                    glsl.read(preprocessor, "USE_LD", jj, os.path.basename(jj).replace(".", "_"))
+                # Phases are timed by tracing only the work after reading.
+                set_trace(Trace())
+                glsl.parse()
+                glsl.crunch()
+                trace_begin("format", "glsl")
+                output = "".join(glsl.format())
+                trace_end()
+                timings = get_trace().get_totals("glsl")
+                set_trace(None)
+                for jj in timings:
+                    if (not jj in best) or (timings[jj] < best[jj]):
+                        best[jj] = timings[jj]
+            for ii in g_glsl_phases:
+                print_result("glsl", "%s, %s" % (name, ii), best.get(ii, 0.0))
+            output = output.encode()
+            print_size("glsl", "%s, raw" % (name), len(output))
+            print_size("glsl", "%s, lzma" % (name), len(compress_data("lzma", output,
+                                                                       get_default_compression_parameters("lzma"))))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_inline(scales, repeats):
+    """Benchmark crunching generated GLSL source with batched inlining, compare against inlining one at a time."""
+    temp_dir = tempfile.mkdtemp(prefix="shrinky-bench-")
+    try:
+        preprocessor = Preprocessor("cpp")
+        for ii in scales:
+            fname = os.path.join(temp_dir, "inline_%i.frag.glsl" % (ii))
+            write_file(fname, generate_glsl_source(ii))
+            outputs = []
+            for jj in (False, True):
+                elapsed = time_best(repeats, lambda: read_glsl(preprocessor, fname),
+                                    lambda x: x.crunch(batch_inlines=jj))
+                print_result("inline", "%i lines, %s" % (ii, jj and "batched" or "one at a time"), elapsed)
+                glsl = read_glsl(preprocessor, fname)
+                glsl.crunch(batch_inlines=jj)
+                outputs += ["".join(glsl.format())]
+            if outputs[0] != outputs[1]:
+                raise RuntimeError("batched inlining output differs from inlining one at a time for %i lines" % (ii))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_parse(scales, repeats):
+    """Benchmark parsing tokenized GLSL source."""
+    for ii in scales:
+        source = generate_glsl_source(ii)
+        elapsed = time_best(repeats, lambda: tokenize(source), glsl_parse_tokenized)
+        print_result("parse", "%i lines" % (source.count("\n")), elapsed)
+
+
+def bench_preprocess(scales, repeats):
+    """Benchmark built-in preprocessor against external one on example and generated GLSL, compare their output."""
+    sources = []
+    for ii in sorted(glob.glob(os.path.join(get_source_root(), "examples", "*.glsl"))):
+        fd = open(ii, "r")
+        sources += [(os.path.basename(ii), fd.read())]
+        fd.close()
+    for ii in scales:
+        sources += [("%i lines" % (ii), generate_glsl_source(ii))]
+    temp_dir = tempfile.mkdtemp(prefix="shrinky-bench-")
+    try:
+        preprocessor = Preprocessor("cpp")
+        builtin = preprocessor.get_builtin()
+        for (name, source) in sources:
+            # Known directives are removed before preprocessing, like when reading GLSL source.
+            source = "\n".join([x for x in source.splitlines() if not glsl_parse_preprocessor(x)]).strip()
+            fname = os.path.join(temp_dir, "preprocess.glsl.preprocessed")
+            write_file(fname, source)
+            elapsed = time_best(repeats, lambda: fname, preprocessor.preprocess)
+            print_result("preprocess", "%s, %s" % (name, preprocessor.get_command()), elapsed)
+            elapsed = time_best(repeats, lambda: source, lambda x: builtin.preprocess(x, fname))
+            print_result("preprocess", "%s, built-in" % (name), elapsed)
+            external = [x for x in preprocessor.preprocess(fname).splitlines() if not x.strip().startswith("#")]
+            output = builtin.preprocess(source, fname)
+            if output is None:
+                raise RuntimeError("built-in preprocessor can not handle %s" % (name))
+            if tokenize_split(output) != tokenize_split("\n".join(external)):
+                raise RuntimeError("built-in preprocessor output differs from '%s' for %s" %
+                                   (preprocessor.get_command(), name))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_tokenize(scales, repeats):
+    """Benchmark tokenizing generated GLSL source."""
+    for ii in scales:
+        source = generate_glsl_source(ii)
+        elapsed = time_best(repeats, lambda: source, tokenize)
+        print_result("tokenize", "%i lines" % (source.count("\n")), elapsed)
+
+
+def compare_results(results, baseline, tolerance):
+    """Compare results against baseline results. Return listing of regressions found."""
+    # Timings within a millisecond of the baseline are considered noise.
+    expected = {}
+    for ii in baseline:
+        expected[(ii["suite"], ii["name"])] = ii
+    ret = []
+    for ii in results:
+        reference = expected.get((ii["suite"], ii["name"]))
+        if not reference:
+            continue
+        if ("size" in ii) and ("size" in reference) and (ii["size"] > reference["size"]):
+            ret += ["%s: %s: %i bytes, baseline %i bytes" % (ii["suite"], ii["name"], ii["size"], reference["size"])]
+        if ("time" in ii) and ("time" in reference) and (ii["time"] > reference["time"] * (1.0 + tolerance) + 0.001):
+            ret += ["%s: %s: %.4f s, baseline %.4f s" % (ii["suite"], ii["name"], ii["time"], reference["time"])]
+    return ret
+
+
+def generate_asm_source(prefix, count):
+    """Generate assembler source with given number of functions, each with local labels and references."""
+    ret = ["\t.text\n"]
+    for ii in range(count):
+        name = "%s_function_%i" % (prefix, ii)
+        ret += ["\t.type\t%s, @function\n" % (name),
+                "%s:\n" % (name),
+                "\tmovl\t$.LC%i, %%eax\n" % (ii),
+                "\tcmpl\t$0, %eax\n",
+                "\tje\t.L%i\n" % (ii),
+                "\tcall\t%s_function_%i\n" % (prefix, (ii * 7) % count),
+                ".L%i:\n" % (ii),
+                "\tret\n",
+                "\t.size\t%s, .-%s\n" % (name, name)]
+    ret += ["\t.section\t.rodata\n"]
+    for ii in range(count):
+        ret += [".LC%i:\n" % (ii), "\t.string\t\"%s %i\"\n" % (prefix, ii)]
+    return "".join(ret)
+
+
+def generate_glsl_source(count):
+    """Generate GLSL fragment shader source with approximately given number of lines."""
+    ret = ["layout(location=0) uniform vec3 uniform_array[4];\n",
+           "in vec2 position;\n",
+           "out vec4 output_color;\n"]
+    function_count = max(count // 19, 1)
+    for ii in range(function_count):
+        ret += ["float function_%i(vec3 pos, float radius)\n" % (ii),
+                "{\n",
+                "  float i_scale = radius * 0.5;\n",
+                "  float i_bias = i_scale + 0.25;\n",
+                "  float i_step = 0.01;\n",
+                "  vec3 d = abs(pos) - vec3(%i.5, i_bias, .75) * i_scale;\n" % (ii % 10),
+                "  float result = min(max(d.x, max(d.y, d.z)), 0.0) + length(max(d, 0.0));\n",
+                "  int iter;\n",
+                "  for(iter = 0; iter < %i; ++iter)\n" % (ii % 7 + 1),
+                "  {\n",
+                "    result += sin(float(iter) * 1.5) * i_step;\n",
+                "    if((result <= 0.001) && (radius >= 1.0))\n",
+                "    {\n",
+                "      break;\n",
+                "    }\n",
+                "  }\n"]
+        if 0 < ii:
+            ret += ["  return result * function_%i(pos.zyx, radius - 0.5);\n" % (ii - 1)]
+        else:
+            ret += ["  return result;\n"]
+        ret += ["}\n"]
+    ret += ["void main()\n",
+            "{\n",
+            "  vec3 direction = normalize(vec3(position.x, position.y, 1.0));\n",
+            "  float dist = function_%i(uniform_array[0] + direction, uniform_array[3].x);\n" % (function_count - 1),
+            "  output_color = vec4(direction * dist, 1.0);\n",
+            "}\n"]
+    return "".join(ret)
+
+
+def get_source_root():
+    """Get root directory of shrinky source tree."""
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def print_result(suite, name, elapsed):
+    """Print a single benchmark result."""
+    print("%s: %s: %.4f s" % (suite, name, elapsed))
+    g_results.append({"suite": suite, "name": name, "time": elapsed})
+
+
+def print_size(suite, name, size):
+    """Print a single size result."""
+    print("%s: %s: %i bytes" % (suite, name, size))
+    g_results.append({"suite": suite, "name": name, "size": size})
+
+
+def read_glsl(preprocessor, fname):
+    """Read and parse a GLSL source file into a new source database."""
+    ret = Glsl()
+    ret.read(preprocessor, "USE_LD", fname, "bench")
+    ret.parse()
+    return ret
+
+
+def time_best(repeats, setup, op):
+    """Run setup and operation given number of times, return best time taken by the operation."""
+    ret = None
+    for ii in range(repeats):
+        data = setup()
+        start = time.perf_counter()
+        op(data)
+        elapsed = time.perf_counter() - start
+        if (ret is None) or (elapsed < ret):
+            ret = elapsed
+    return ret
+
+
+def write_file(fname, content):
+    """Write content into a file."""
+    fd = open(fname, "w")
+    fd.write(content)
+    fd.close()
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_bench_suites = {
+    "asm": bench_asm,
+    "glsl": bench_glsl,
+    "inline": bench_inline,
+    "parse": bench_parse,
+    "preprocess": bench_preprocess,
+    "tokenize": bench_tokenize,
+}
+
+g_glsl_phases = ("tokenize", "parse", "expandRecursive", "inline", "simplify", "rename", "collapse", "format")
+
+g_results = []
+
+########################################
+# Main #################################
+########################################
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(usage="python -m shrinky.bench [args] <suite(s)>",
+                                     description="Benchmarks for shrinky internals.",
+                                     formatter_class=CustomHelpFormatter)
+    parser.add_argument("-b", "--baseline", default=None,
+                        help="Compare results against a JSON file written with --output, fail on regressions.\n"
+                        "(e.g. tests/corpus/baseline.json for GLSL output sizes)")
+    parser.add_argument("-o", "--output", default=None, help="Write results into a JSON file.")
+    parser.add_argument("-r", "--repeats", default=3, type=int,
+                        help="Run each benchmark this many times and report the best.\n(default: %(default)s)")
+    parser.add_argument("-s", "--scale", default=[], type=int, action="append",
+                        help="Input size(s) to benchmark with.\n(default: 1000, 4000, 16000)")
+    parser.add_argument("-t", "--tolerance", default=0.25, type=float,
+                        help="Relative slowdown from baseline tolerated before timing is a regression.\n"
+                        "(default: %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print more info about what is being done.")
+    parser.add_argument("suite", nargs="+", choices=sorted(g_bench_suites.keys()), help="Benchmark suite(s) to run.")
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        set_verbose(True)
+    scales = args.scale
+    if not scales:
+        scales = [1000, 4000, 16000]
+    for ii in args.suite:
+        g_bench_suites[ii](scales, args.repeats)
+    if args.output:
+        fd = open(args.output, "w")
+        json.dump(g_results, fd, indent=2)
+        fd.close()
+    if args.baseline:
+        fd = open(args.baseline, "r")
+        baseline = json.load(fd)
+        fd.close()
+        regressions = compare_results(g_results, baseline, args.tolerance)
+        for ii in regressions:
+            print("REGRESSION: %s" % (ii))
+        if regressions:
+            return 1
+    return 0
+
+########################################
+# Entry point ##########################
+########################################
+
+
+if __name__ == "__main__":
+    sys.exit(main())
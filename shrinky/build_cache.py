@@ -0,0 +1,270 @@
+import filecmp
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from shrinky.common import executable_resolve
+from shrinky.common import is_listing
+from shrinky.common import is_verbose
+from shrinky.common import run_command
+from shrinky.platform_var import get_platform_state
+
+########################################
+# BuildCache ###########################
+########################################
+
+
+class BuildCache:
+    """Content-addressed on-disk cache of build artifacts."""
+
+    def __init__(self, op):
+        """Constructor."""
+        self.__path = os.path.normpath(op)
+        self.__stats = {}
+
+    def digest(self, op):
+        """Calculate a digest of given (possibly nested) data."""
+        hasher = hashlib.sha256()
+        digest_update(hasher, op)
+        return hasher.hexdigest()
+
+    def fetch(self, stage, key, dst, keep_unchanged=False):
+        """Copy cached artifacts to given destination file(s). Return True on a hit."""
+        # Optionally identical destination files are left alone to preserve their modification times.
+        entry = self.get_entry_path(key)
+        dst = listify_files(dst)
+        for ii in range(len(dst)):
+            if not os.path.isfile(os.path.join(entry, str(ii))):
+                self.record(stage, False)
+                return False
+        for ii in range(len(dst)):
+            src = os.path.join(entry, str(ii))
+            if keep_unchanged and os.path.isfile(dst[ii]) and filecmp.cmp(src, dst[ii], shallow=False):
+                continue
+            shutil.copyfile(src, dst[ii])
+        if is_verbose():
+            print("Build cache hit for stage '%s': %s" % (stage, str(dst)))
+        self.record(stage, True)
+        return True
+
+    def get_entry_path(self, key):
+        """Get directory an artifact with given key is stored in."""
+        return os.path.join(self.__path, key[:2], key[2:])
+
+    def get_value(self, key):
+        """Get a JSON value stored under given key, or None if not found."""
+        fname = self.get_entry_path(key) + ".json"
+        if not os.path.isfile(fname):
+            return None
+        fd = open(fname, "r")
+        try:
+            return json.load(fd)
+        except ValueError:
+            return None
+        finally:
+            fd.close()
+
+    def get_path(self):
+        """Accessor."""
+        return self.__path
+
+    def get_stats(self):
+        """Get hit and miss counts as a dictionary of stage names to (hits, misses) tuples."""
+        ret = {}
+        for ii in self.__stats:
+            ret[ii] = tuple(self.__stats[ii])
+        return ret
+
+    def record(self, stage, hit):
+        """Record a hit or a miss for given stage."""
+        if not stage in self.__stats:
+            self.__stats[stage] = [0, 0]
+        if hit:
+            self.__stats[stage][0] += 1
+        else:
+            self.__stats[stage][1] += 1
+
+    def report(self):
+        """Generate a report of cache hits and misses."""
+        hits = 0
+        misses = 0
+        lines = []
+        for ii in sorted(self.__stats.keys()):
+            (stage_hits, stage_misses) = self.__stats[ii]
+            hits += stage_hits
+            misses += stage_misses
+            lines += ["  %s: %i hits, %i misses" % (ii, stage_hits, stage_misses)]
+        ret = "Build cache '%s': %i hits, %i misses" % (self.__path, hits, misses)
+        if is_verbose():
+            ret += "\n" + "\n".join(lines)
+        return ret
+
+    def set_value(self, key, value):
+        """Store a JSON-serializable value under given key."""
+        fname = self.get_entry_path(key) + ".json"
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        (fd, temp_name) = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(fname))
+        fd = os.fdopen(fd, "w")
+        json.dump(value, fd, sort_keys=True)
+        fd.close()
+        os.replace(temp_name, fname)
+
+    def store(self, stage, key, src):
+        """Store given file(s) as artifacts under given key."""
+        entry = self.get_entry_path(key)
+        if os.path.isdir(entry):
+            return
+        parent = os.path.dirname(entry)
+        os.makedirs(parent, exist_ok=True)
+        # Populate a temporary directory first and move it in place so readers never see a partial entry.
+        temp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        src = listify_files(src)
+        for ii in range(len(src)):
+            shutil.copyfile(src[ii], os.path.join(temp_dir, str(ii)))
+        try:
+            os.rename(temp_dir, entry)
+        except OSError:
+            # Another process stored the same entry first.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_build_cache = None
+
+g_source_digest = None
+
+g_tool_versions = {}
+
+########################################
+# Functions ############################
+########################################
+
+
+def digest_update(hasher, op):
+    """Feed given data into a hasher in an unambiguous manner."""
+    if op is None:
+        hasher.update(b"N")
+    elif isinstance(op, bytes):
+        hasher.update(b"B%i:" % (len(op)))
+        hasher.update(op)
+    elif isinstance(op, str):
+        digest_update(hasher, op.encode())
+    elif isinstance(op, dict):
+        digest_update(hasher, sorted(op.items()))
+    elif is_listing(op):
+        hasher.update(b"L%i:" % (len(op)))
+        for ii in op:
+            digest_update(hasher, ii)
+    else:
+        digest_update(hasher, str(op))
+
+
+def file_contents(op):
+    """Read contents of given file(s) for digest calculation."""
+    ret = []
+    for ii in listify_files(op):
+        fd = open(ii, "rb")
+        ret += [fd.read()]
+        fd.close()
+    return ret
+
+
+def get_build_cache():
+    """Get the build cache in use, or None if caching is disabled."""
+    return g_build_cache
+
+
+def get_default_cache_dir():
+    """Get default location for the build cache."""
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "shrinky")
+
+
+def get_source_digest():
+    """Get digest of shrinky sources, only reading them once per process."""
+    # Artifacts produced in-process depend on shrinky itself, key them on its code to not outlive upgrades.
+    global g_source_digest
+    if g_source_digest is None:
+        source_dir = os.path.dirname(os.path.abspath(__file__))
+        fnames = sorted([x for x in os.listdir(source_dir) if x.endswith(".py")])
+        hasher = hashlib.sha256()
+        digest_update(hasher, [[x, file_contents(os.path.join(source_dir, x))] for x in fnames])
+        g_source_digest = hasher.hexdigest()
+    return g_source_digest
+
+
+def get_tool_version(op):
+    """Get version string of a tool, only executing it once per tool binary."""
+    path = executable_resolve(op)
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # Binary is identified by location, modification time and inode, versions are persisted in the build cache.
+    identity = (os.path.realpath(path), st.st_mtime_ns, st.st_ino)
+    if identity in g_tool_versions:
+        return g_tool_versions[identity]
+    cache = get_build_cache()
+    if cache:
+        key = cache.digest(["tool_version", list(identity)])
+        value = cache.get_value(key)
+        cache.record("tool_version", isinstance(value, dict))
+        if isinstance(value, dict):
+            g_tool_versions[identity] = value.get("version")
+            return g_tool_versions[identity]
+    try:
+        (so, se) = run_command([path, "--version"])
+        g_tool_versions[identity] = so
+    except (OSError, RuntimeError):
+        g_tool_versions[identity] = None
+    if cache:
+        cache.set_value(key, {"version": g_tool_versions[identity]})
+    return g_tool_versions[identity]
+
+
+def listify_files(op):
+    """Make a list out of a single file name or list of file names."""
+    if is_listing(op):
+        return list(op)
+    return [op]
+
+
+def run_command_cached(stage, lst, src, dst, extra=None, decode_output=True):
+    """Run a command, reusing its output file(s) from build cache on matching input."""
+    cache = get_build_cache()
+    if not cache:
+        return run_command(lst, decode_output)
+    src = listify_files(src)
+    dst = listify_files(dst)
+    # File names are replaced with their roles so only contents of files are significant.
+    command = []
+    for ii in lst:
+        if ii in src:
+            command += ["<src%i>" % (src.index(ii))]
+        elif ii in dst:
+            command += ["<dst%i>" % (dst.index(ii))]
+        else:
+            command += [ii]
+    key = cache.digest([stage, command, file_contents(src), get_tool_version(lst[0]), get_platform_state(), extra])
+    if cache.fetch(stage, key, dst):
+        if decode_output:
+            return ("", "")
+        return (b"", b"")
+    ret = run_command(lst, decode_output)
+    cache.store(stage, key, dst)
+    return ret
+
+
+def set_build_cache(op):
+    """Set the build cache to use, None disables caching."""
+    global g_build_cache
+    g_build_cache = op
@@ -1,11 +1,18 @@
 import os
 import re
+import shutil
 import subprocess
+import time
+
+from shrinky.directory_index import get_directory_index
+from shrinky.trace import trace_command
 
 ########################################
 # Globals ##############################
 ########################################
 
+g_executable_paths = {}
+
 g_verbose = False
 
 IGNORE_PATHS = ("/lib/modules",)
@@ -17,18 +24,7 @@ IGNORE_PATHS = ("/lib/modules",)
 
 def executable_check(op):
     """Check for existence of a single binary."""
-    try:
-        proc = subprocess.Popen([op], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except OSError:
-        return False
-    try:
-        if not proc.poll():
-            proc.kill()
-            proc.wait()
-    except OSError:
-        print("WARNING: subprocess '%s' did not terminate properly" % (op))
-        return True
-    return True
+    return executable_resolve(op) is not None
 
 
 def executable_find(proposition, default_list, name):
@@ -71,6 +67,39 @@ def executable_search(op, description=None):
     return ret
 
 
+def executable_resolve(op):
+    """Resolve full path of a binary through PATH without executing it, or None if not found."""
+    if not op in g_executable_paths:
+        g_executable_paths[op] = shutil.which(op)
+    return g_executable_paths[op]
+
+
+def file_copy_prefix(src, dst, size):
+    """Copy given number of bytes from start of source file into destination file, in-kernel if possible."""
+    # Unbuffered files keep Python and kernel file positions in sync when falling back after a partial copy.
+    rfd = open(src, "rb", buffering=0)
+    wfd = open(dst, "wb", buffering=0)
+    offset = 0
+    try:
+        while offset < size:
+            copied = os.sendfile(wfd.fileno(), rfd.fileno(), offset, size - offset)
+            if 0 >= copied:
+                break
+            offset += copied
+    except (AttributeError, OSError):
+        wfd.seek(offset)
+    rfd.seek(offset)
+    while offset < size:
+        data = rfd.read(min(size - offset, 1 << 20))
+        if not data:
+            break
+        wfd.write(data)
+        offset += len(data)
+    rfd.close()
+    wfd.close()
+    return offset
+
+
 def file_is_ascii_text(op):
     """Check if given file contains nothing but ASCII7 text."""
     if not os.path.isfile(op):
@@ -133,49 +162,32 @@ def listify(lhs, rhs=None):
     return [lhs, rhs]
 
 
-def locate(pth, fn, previous_paths=None):
+def locate(pth, fn):
     """Search for given file from given path downward."""
     if is_listing(pth):
         for ii in pth:
-            ret = locate(ii, fn, previous_paths)
+            ret = locate(ii, fn)
             if ret:
                 return ret
         return None
     # If path is not given or is empty, assume current path.
     if not pth:
         pth = "."
-    # Initialize previous paths on first execution.
-    if not previous_paths:
-        previous_paths = [os.path.realpath(pth)]
     # Some specific directory trees would take too much time to traverse.
     if pth in IGNORE_PATHS:
         return None
-    # Recurse, expect filesystem errors.
-    try:
-        for ii in os.listdir(pth):
-            ret = os.path.normpath(pth + "/" + ii)
-            if (isinstance(fn, str) and (ii == fn)) or ((not isinstance(fn, str)) and fn.match(ii)):
-                if os.path.isfile(ret):
-                    return ret
-            elif os.path.isdir(ret):
-                real_path = os.path.realpath(ret)
-                if not real_path in previous_paths:
-                    ret = locate(ret, fn, previous_paths + [real_path])
-                    if ret:
-                        return ret
-    except OSError as ee:  # Permission denied or the like.
-        if 13 == ee.errno:
-            return None
-        raise ee
-    return None
+    # Directory trees are indexed on first search, subsequent searches are answered from memory.
+    return get_directory_index(pth, IGNORE_PATHS).find(fn)
 
 
 def run_command(lst, decode_output=True):
     """Run program identified by list of command line parameters."""
     if is_verbose():
         print("Executing command: %s" % (" ".join(lst)))
+    start = time.perf_counter()
     proc = subprocess.Popen(lst, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     (proc_stdout, proc_stderr) = proc.communicate()
+    trace_command(lst, start, proc.returncode)
     if decode_output and not isinstance(proc_stdout, str):
         proc_stdout = proc_stdout.decode()
     if decode_output and not isinstance(proc_stderr, str):
@@ -1,5 +1,7 @@
 import os
 
+from shrinky.build_cache import get_build_cache
+from shrinky.build_cache import run_command_cached
 from shrinky.common import is_listing
 from shrinky.common import is_verbose
 from shrinky.common import run_command
@@ -36,11 +38,16 @@ class Compiler(Linker):
 
     def compile_asm(self, src, dst, whole_program=False):
         """Compile a file into assembler source."""
-        cmd = [self.get_command(), "-S", src, "-o", dst] + self.__standard + self.__compiler_flags + \
-            self._compiler_flags_extra + self._definitions + self._include_directories
+        flags = self.__standard + self.__compiler_flags + self._compiler_flags_extra + self._definitions + \
+            self._include_directories
         if whole_program:
-            cmd += self.__compiler_flags_whole_program
-        (so, se) = run_command(cmd)
+            flags += self.__compiler_flags_whole_program
+        # Preprocessed source covers all included headers when looking up the build cache.
+        preprocessed = None
+        if get_build_cache():
+            (preprocessed, se) = run_command([self.get_command(), "-E", src] + flags)
+        (so, se) = run_command_cached("compile", [self.get_command(), "-S", src, "-o", dst] + flags, src, dst,
+                                      preprocessed)
         if 0 < len(se) and is_verbose():
             print(se)
 
@@ -0,0 +1,133 @@
+import concurrent.futures
+import itertools
+import lzma
+
+from shrinky.common import is_verbose
+
+########################################
+# Globals ##############################
+########################################
+
+g_compression_formats = {
+    "lzma": (lzma.FORMAT_ALONE, lzma.FILTER_LZMA1),
+    "raw": (lzma.FORMAT_RAW, lzma.FILTER_LZMA2),
+    "xz": (lzma.FORMAT_XZ, lzma.FILTER_LZMA2),
+}
+
+g_compression_defaults = {
+    "lzma": {"preset": 9, "lc": 1, "lp": 0, "pb": 0, "nice_len": 273},
+    "raw": {"preset": 9 | lzma.PRESET_EXTREME},
+    "xz": {"preset": 9, "lc": 1, "pb": 0, "nice_len": 273},
+}
+
+g_compression_match_finders = {
+    "bt2": lzma.MF_BT2,
+    "bt3": lzma.MF_BT3,
+    "bt4": lzma.MF_BT4,
+    "hc3": lzma.MF_HC3,
+    "hc4": lzma.MF_HC4,
+}
+
+g_compression_search_space = (
+    ("lc", (0, 1, 2, 3, 4)),
+    ("lp", (0, 1, 2)),
+    ("pb", (0, 1, 2)),
+    ("nice_len", (16, 32, 64, 128, 192, 273)),
+    ("mf", ("bt4", "bt3", "bt2", "hc4", "hc3")),
+    ("depth", (0, 64, 512, 4096)),
+)
+
+g_search_compression = None
+
+g_search_data = None
+
+########################################
+# Functions ############################
+########################################
+
+
+def compress_data(compression, data, parameters):
+    """Compress data in-process using given format and LZMA parameters."""
+    if not compression in g_compression_formats:
+        raise RuntimeError("unknown compression format '%s'" % (compression))
+    (compression_format, compression_filter) = g_compression_formats[compression]
+    filter_options = {"id": compression_filter}
+    for ii in parameters:
+        if "mf" == ii:
+            filter_options[ii] = g_compression_match_finders[parameters[ii]]
+        else:
+            filter_options[ii] = parameters[ii]
+    return lzma.compress(data, format=compression_format, filters=[filter_options])
+
+
+def compress_search_candidate(op):
+    """Compress search data with given parameters and return resulting size."""
+    return len(compress_data(g_search_compression, g_search_data, op))
+
+
+def compress_search_initialize(compression, data):
+    """Set data to be compressed by subsequent search candidates."""
+    global g_search_compression
+    global g_search_data
+    g_search_compression = compression
+    g_search_data = data
+
+
+def generate_search_candidates(compression, data):
+    """Generate all parameter combinations to try when searching for best compression."""
+    # Dictionary does not need to be larger than the data, keeping it small saves memory in workers.
+    dict_size = 4096
+    while dict_size < len(data):
+        dict_size *= 2
+    ret = []
+    names = [x[0] for x in g_compression_search_space]
+    for values in itertools.product(*[x[1] for x in g_compression_search_space]):
+        parameters = dict(zip(names, values))
+        if 4 < parameters["lc"] + parameters["lp"]:
+            continue
+        parameters["preset"] = 9
+        parameters["dict_size"] = dict_size
+        ret += [parameters]
+    return ret
+
+
+def get_default_compression_parameters(compression):
+    """Get default LZMA parameters for given compression format."""
+    if not compression in g_compression_defaults:
+        raise RuntimeError("unknown compression format '%s'" % (compression))
+    return dict(g_compression_defaults[compression])
+
+
+def search_compression_parameters(compression, data, initial=None):
+    """Search for LZMA parameters producing the smallest output, try given initial parameters first."""
+    candidates = listify_parameters(initial) + generate_search_candidates(compression, data)
+    try:
+        executor = concurrent.futures.ProcessPoolExecutor(initializer=compress_search_initialize,
+                                                          initargs=(compression, data))
+    except (NotImplementedError, OSError):
+        # Process pools are not available on all platforms, fall back to searching serially.
+        executor = None
+    # Errors from workers are propagated as is.
+    if executor:
+        with executor:
+            sizes = list(executor.map(compress_search_candidate, candidates, chunksize=64))
+    else:
+        compress_search_initialize(compression, data)
+        sizes = [compress_search_candidate(x) for x in candidates]
+    best = 0
+    for ii in range(1, len(candidates)):
+        if sizes[ii] < sizes[best]:
+            best = ii
+    if is_verbose():
+        print("Compression search: %i candidates, best %i bytes: %s" %
+              (len(candidates), sizes[best], str(candidates[best])))
+    return candidates[best]
+
+
+def listify_parameters(op):
+    """Make a list of parameter dictionaries."""
+    if op is None:
+        return []
+    if isinstance(op, dict):
+        return [op]
+    return list(op)
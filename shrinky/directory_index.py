@@ -0,0 +1,188 @@
+import errno
+import os
+
+########################################
+# DirectoryIndex #######################
+########################################
+
+
+class DirectoryIndex:
+    """Index of a directory tree answering file searches from memory."""
+
+    def __init__(self, root, ignore_paths=()):
+        """Constructor."""
+        self.__root = root
+        self.__ignore_paths = ignore_paths
+        self.clear()
+
+    def add_entry(self, name, path, is_file, parent):
+        """Add a single entry into the index, return its index."""
+        ret = len(self.__names)
+        self.__names += [name]
+        self.__paths += [path]
+        self.__files += [is_file]
+        self.__parents += [parent]
+        if name in self.__lookup:
+            self.__lookup[name] += [ret]
+        else:
+            self.__lookup[name] = [ret]
+        return ret
+
+    def build(self):
+        """Walk the directory tree and build the index."""
+        self.clear()
+        self.build_directory("", os.path.realpath(self.__root), -1, [os.path.realpath(self.__root)])
+
+    def build_directory(self, path, real_path, parent, previous_paths):
+        """Add contents of a directory into the index, recursing into subdirectories."""
+        # Order of entries and traversal must match a depth-first search stopping at first match.
+        full_path = self.get_full_path(path)
+        try:
+            self.__directories += [(path, os.stat(full_path).st_mtime_ns)]
+            entries = list(os.scandir(full_path))
+        except OSError as ee:  # Permission denied or the like.
+            if errno.EACCES == ee.errno:
+                return
+            raise ee
+        for ii in entries:
+            entry_path = os.path.join(path, ii.name)
+            is_file = ii.is_file()
+            is_dir = (not is_file) and ii.is_dir()
+            if not (is_file or is_dir):
+                continue
+            index = self.add_entry(ii.name, entry_path, is_file, parent)
+            if not is_dir:
+                continue
+            if self.get_full_path(entry_path) in self.__ignore_paths:
+                continue
+            # Real path only needs to be resolved for symbolic links.
+            if ii.is_symlink():
+                entry_real_path = os.path.realpath(ii.path)
+            else:
+                entry_real_path = os.path.join(real_path, ii.name)
+            if not entry_real_path in previous_paths:
+                self.build_directory(entry_path, entry_real_path, index, previous_paths + [entry_real_path])
+
+    def clear(self):
+        """Clear the index."""
+        self.__directories = []
+        self.__names = []
+        self.__paths = []
+        self.__files = []
+        self.__parents = []
+        self.__lookup = {}
+
+    def find(self, fn):
+        """Find first file matching given name or compiled regex, or None."""
+        ret = self.find_indexed(fn)
+        if ret and os.path.isfile(ret):
+            return ret
+        # File found from index no longer exists, tree has changed.
+        if ret:
+            self.build()
+            return self.find_indexed(fn)
+        return None
+
+    def find_indexed(self, fn):
+        """Find first file matching given name or compiled regex from the index only, or None."""
+        if isinstance(fn, str):
+            candidates = self.__lookup.get(fn, [])
+        else:
+            candidates = []
+            for ii in self.__lookup:
+                if fn.match(ii):
+                    candidates += self.__lookup[ii]
+            candidates.sort()
+        for ii in candidates:
+            if not self.__files[ii]:
+                continue
+            # Directories with matching names are not searched.
+            if self.is_under_match(ii, fn):
+                continue
+            return self.get_full_path(self.__paths[ii])
+        return None
+
+    def get_full_path(self, op):
+        """Get path of an indexed entry including root."""
+        if not op:
+            return self.__root
+        return os.path.normpath(self.__root + "/" + op)
+
+    def is_under_match(self, op, fn):
+        """Tell if an entry is located under a directory with name matching given name or compiled regex."""
+        parent = self.__parents[op]
+        while 0 <= parent:
+            name = self.__names[parent]
+            if (isinstance(fn, str) and (name == fn)) or ((not isinstance(fn, str)) and fn.match(name)):
+                return True
+            parent = self.__parents[parent]
+        return False
+
+    def is_valid(self):
+        """Tell if no directory in the index has been modified since indexing."""
+        for (path, mtime) in self.__directories:
+            try:
+                if os.stat(self.get_full_path(path)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def load(self, op):
+        """Load index from a JSON-serializable value."""
+        self.clear()
+        self.__directories = [tuple(x) for x in op["directories"]]
+        for (name, path, is_file, parent) in op["entries"]:
+            self.add_entry(name, path, is_file, parent)
+
+    def save(self):
+        """Save index into a JSON-serializable value."""
+        entries = []
+        for ii in range(len(self.__names)):
+            entries += [(self.__names[ii], self.__paths[ii], self.__files[ii], self.__parents[ii])]
+        return {"directories": self.__directories, "entries": entries}
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_directory_indices = {}
+
+g_directory_index_cache = None
+
+########################################
+# Functions ############################
+########################################
+
+
+def get_directory_index(root, ignore_paths=()):
+    """Get index for given directory tree, building it only once per process."""
+    key = (root, tuple(ignore_paths))
+    if not os.path.isabs(root):
+        key = (os.getcwd(),) + key
+    if key in g_directory_indices:
+        return g_directory_indices[key]
+    ret = DirectoryIndex(root, ignore_paths)
+    cache = g_directory_index_cache
+    if cache:
+        # Persisted index is only valid if no directory within has been modified.
+        cache_key = cache.digest(["directory_index", list(key)])
+        value = cache.get_value(cache_key)
+        if value:
+            ret.load(value)
+        hit = bool(value) and ret.is_valid()
+        cache.record("directory_index", hit)
+        if not hit:
+            ret.build()
+            cache.set_value(cache_key, ret.save())
+    else:
+        ret.build()
+    g_directory_indices[key] = ret
+    return ret
+
+
+def set_directory_index_cache(op):
+    """Set build cache to persist directory indices in, None disables persisting."""
+    global g_directory_index_cache
+    g_directory_index_cache = op
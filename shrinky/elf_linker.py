@@ -0,0 +1,132 @@
+import struct
+
+from shrinky.common import is_verbose
+from shrinky.elf_reader import ElfReader
+from shrinky.elf_reader import EM_386
+from shrinky.elf_reader import EM_X86_64
+from shrinky.elf_reader import ET_REL
+from shrinky.elf_reader import SHF_ALLOC
+from shrinky.elf_reader import SHN_ABS
+from shrinky.elf_reader import SHT_NOBITS
+from shrinky.elf_reader import SHT_REL
+from shrinky.elf_reader import SHT_RELA
+from shrinky.elf_reader import SHT_SYMTAB
+
+########################################
+# Globals ##############################
+########################################
+
+# Supported relocation types per machine as (struct format of the field, whether relative to the field address).
+g_relocations = {
+    EM_386: {
+        1: ("<I", False),  # R_386_32
+        2: ("<i", True),  # R_386_PC32
+        20: ("<H", False),  # R_386_16
+        21: ("<h", True),  # R_386_PC16
+        22: ("<B", False),  # R_386_8
+        23: ("<b", True),  # R_386_PC8
+    },
+    EM_X86_64: {
+        1: ("<Q", False),  # R_X86_64_64
+        2: ("<i", True),  # R_X86_64_PC32
+        4: ("<i", True),  # R_X86_64_PLT32, no PLT when everything is local
+        10: ("<I", False),  # R_X86_64_32
+        11: ("<i", False),  # R_X86_64_32S
+        12: ("<H", False),  # R_X86_64_16
+        13: ("<h", True),  # R_X86_64_PC16
+        14: ("<B", False),  # R_X86_64_8
+        15: ("<b", True),  # R_X86_64_PC8
+        24: ("<q", True),  # R_X86_64_PC64
+    },
+}
+
+########################################
+# Functions ############################
+########################################
+
+
+def link_direct(src, dst, base):
+    """Link object with a single allocated section into a flat image at given address, False if unable to."""
+    reader = ElfReader(src)
+    try:
+        ret = link_image(reader, base)
+    finally:
+        reader.close()
+    if isinstance(ret, str):
+        if is_verbose():
+            print("Cannot link '%s' directly: %s" % (src, ret))
+        return False
+    fd = open(dst, "wb")
+    fd.write(ret)
+    fd.close()
+    if is_verbose():
+        print("Linked '%s' directly at 0x%x: %i bytes" % (src, base, len(ret)))
+    return True
+
+
+def link_image(reader, base):
+    """Lay out object at given address and resolve relocations, return image or reason for failure as a string."""
+    if ET_REL != reader.get_elf_type():
+        return "not a relocatable object"
+    relocation_types = g_relocations.get(reader.get_machine())
+    if not relocation_types:
+        return "unsupported machine %i" % (reader.get_machine())
+    headers = reader.get_section_headers()
+    # Output of objcopy would lay out multiple sections with alignment, only a single one is handled.
+    image_index = None
+    for ii in range(len(headers)):
+        header = headers[ii]
+        if (not (header["flags"] & SHF_ALLOC)) or (0 >= header["size"]):
+            continue
+        if SHT_NOBITS == header["type"]:
+            return "allocated section '%s' has no data" % (reader.get_section_name(header))
+        if not (image_index is None):
+            return "multiple allocated sections"
+        image_index = ii
+    if image_index is None:
+        return "no allocated sections"
+    image_header = headers[image_index]
+    data = reader.get_data()
+    ret = bytearray(data[image_header["offset"]:image_header["offset"] + image_header["size"]])
+    for header in headers:
+        if not (header["type"] in (SHT_REL, SHT_RELA)):
+            continue
+        if header["info"] >= len(headers):
+            return "invalid relocation target in section '%s'" % (reader.get_section_name(header))
+        # Relocations of non-allocated sections such as comments are not part of the image.
+        if not (headers[header["info"]]["flags"] & SHF_ALLOC):
+            continue
+        if header["info"] != image_index:
+            return "relocations for empty section '%s'" % (reader.get_section_name(headers[header["info"]]))
+        if (header["link"] >= len(headers)) or (SHT_SYMTAB != headers[header["link"]]["type"]):
+            return "invalid symbol table in section '%s'" % (reader.get_section_name(header))
+        symbols = reader.get_section_symbols(headers[header["link"]])
+        for relocation in reader.get_relocations(header):
+            relocation_type = relocation_types.get(relocation["type"])
+            if not relocation_type:
+                return "unsupported relocation type %i" % (relocation["type"])
+            (fmt, relative) = relocation_type
+            if relocation["symbol"] >= len(symbols):
+                return "invalid symbol index %i" % (relocation["symbol"])
+            symbol = symbols[relocation["symbol"]]
+            if symbol["shndx"] == image_index:
+                value = base + symbol["value"]
+            elif SHN_ABS == symbol["shndx"]:
+                value = symbol["value"]
+            else:
+                return "symbol '%s' is not defined in the image" % (symbol["name"])
+            offset = relocation["offset"]
+            if offset + struct.calcsize(fmt) > len(ret):
+                return "relocation out of bounds at offset %i" % (offset)
+            # Implicit addends are stored in the relocated field.
+            addend = relocation["addend"]
+            if addend is None:
+                addend = struct.unpack_from(fmt, ret, offset)[0]
+            value += addend
+            if relative:
+                value -= base + offset
+            try:
+                struct.pack_into(fmt, ret, offset, value)
+            except struct.error:
+                return "relocation of symbol '%s' does not fit at offset %i" % (symbol["name"], offset)
+    return ret
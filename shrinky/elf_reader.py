@@ -0,0 +1,272 @@
+import mmap
+import os
+import struct
+
+########################################
+# Globals ##############################
+########################################
+
+EI_CLASS = 4
+EI_DATA = 5
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+DT_NULL = 0
+DT_NEEDED = 1
+
+EM_386 = 3
+EM_X86_64 = 62
+
+ET_REL = 1
+
+PF_X = 0x1
+PF_W = 0x2
+PF_R = 0x4
+
+PT_LOAD = 1
+
+SHF_ALLOC = 0x2
+
+SHN_UNDEF = 0
+SHN_ABS = 0xfff1
+
+SHT_SYMTAB = 2
+SHT_RELA = 4
+SHT_DYNAMIC = 6
+SHT_NOBITS = 8
+SHT_REL = 9
+SHT_DYNSYM = 11
+
+STB_GLOBAL = 1
+
+STV_DEFAULT = 0
+
+g_elf_formats = {
+    ELFCLASS32: {"ehdr": "HHIIIIIHHHHHH", "phdr": "IIIIIIII", "shdr": "IIIIIIIIII", "sym": "IIIBBH", "dyn": "iI",
+                 "rel": "II", "rela": "IIi"},
+    ELFCLASS64: {"ehdr": "HHIQQQIHHHHHH", "phdr": "IIQQQQQQ", "shdr": "IIQQQQIIQQ", "sym": "IBBHQQ", "dyn": "qQ",
+                 "rel": "QQ", "rela": "QQq"},
+}
+
+########################################
+# ElfReader ############################
+########################################
+
+
+class ElfReader:
+    """Minimal in-process reader for ELF32 and ELF64 files."""
+
+    def __init__(self, op):
+        """Constructor."""
+        self.__name = op
+        self.__mmap = None
+        self.__view = None
+        fd = open(op, "rb")
+        try:
+            if 0 < os.fstat(fd.fileno()).st_size:
+                self.__mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            fd.close()
+        if not self.__mmap:
+            raise RuntimeError("could not read ELF file '%s': empty file" % (op))
+        self.__view = memoryview(self.__mmap)
+        try:
+            self.parse()
+        except (RuntimeError, struct.error):
+            self.close()
+            raise
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context."""
+        self.close()
+
+    def close(self):
+        """Release the mapping."""
+        if self.__view is not None:
+            self.__view.release()
+            self.__view = None
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def get_data(self):
+        """Accessor."""
+        return self.__view
+
+    def get_entry(self):
+        """Accessor."""
+        return self.__entry
+
+    def get_elf_type(self):
+        """Accessor."""
+        return self.__elf_type
+
+    def get_first_load(self, flags=0):
+        """Get first PT_LOAD program header with given flags set, or None."""
+        for ii in self.__program_headers:
+            if (PT_LOAD == ii["type"]) and (flags == (ii["flags"] & flags)):
+                return ii
+        return None
+
+    def get_load_info(self):
+        """Get base address, file size and entry point offset of first RWE PT_LOAD as a dictionary."""
+        load = self.get_first_load(PF_R | PF_W | PF_X)
+        if not load:
+            raise RuntimeError("could not read first PT_LOAD from executable '%s'" % (self.__name))
+        return {"base": load["vaddr"], "size": load["filesz"], "entry": self.__entry - load["vaddr"]}
+
+    def get_machine(self):
+        """Accessor."""
+        return self.__machine
+
+    def get_needed(self):
+        """Get names of libraries listed as DT_NEEDED in the dynamic section."""
+        ret = []
+        size = struct.calcsize(self.__formats["dyn"])
+        for ii in self.__section_headers:
+            if SHT_DYNAMIC != ii["type"]:
+                continue
+            if ii["link"] >= len(self.__section_headers):
+                raise RuntimeError("invalid string table link in ELF file '%s'" % (self.__name))
+            strtab = self.__section_headers[ii["link"]]
+            for jj in range(ii["offset"], ii["offset"] + ii["size"] - size + 1, size):
+                (tag, value) = self.unpack("dyn", jj)
+                if DT_NULL == tag:
+                    break
+                if DT_NEEDED == tag:
+                    ret += [self.read_string(strtab["offset"] + value)]
+        return ret
+
+    def get_program_headers(self):
+        """Accessor."""
+        return self.__program_headers
+
+    def get_relocations(self, section):
+        """Get relocations from given SHT_REL or SHT_RELA section header as a list of dictionaries."""
+        if SHT_RELA == section["type"]:
+            name = "rela"
+        elif SHT_REL == section["type"]:
+            name = "rel"
+        else:
+            raise RuntimeError("section is not a relocation section in ELF file '%s'" % (self.__name))
+        ret = []
+        size = struct.calcsize(self.__formats[name])
+        # Relocation info packs symbol index and type, split is at 8 bits in ELF32 and 32 bits in ELF64.
+        shift = 8
+        if 8 == self.__class_size:
+            shift = 32
+        for ii in range(section["offset"], section["offset"] + section["size"] - size + 1, size):
+            values = self.unpack(name, ii)
+            addend = None
+            if "rela" == name:
+                addend = values[2]
+            ret += [{"offset": values[0], "symbol": values[1] >> shift, "type": values[1] & ((1 << shift) - 1),
+                     "addend": addend}]
+        return ret
+
+    def get_section_headers(self):
+        """Accessor."""
+        return self.__section_headers
+
+    def get_section_name(self, section):
+        """Get name of given section header from section header string table."""
+        if self.__shstrndx >= len(self.__section_headers):
+            raise RuntimeError("invalid section header string table index in ELF file '%s'" % (self.__name))
+        return self.read_string(self.__section_headers[self.__shstrndx]["offset"] + section["name"])
+
+    def get_section_symbols(self, section):
+        """Get symbols from given symbol table section header in table order as a list of dictionaries."""
+        if section["link"] >= len(self.__section_headers):
+            raise RuntimeError("invalid string table link in ELF file '%s'" % (self.__name))
+        strtab = self.__section_headers[section["link"]]
+        ret = []
+        size = struct.calcsize(self.__formats["sym"])
+        for ii in range(section["offset"], section["offset"] + section["size"] - size + 1, size):
+            if 4 == self.__class_size:
+                (name, value, symbol_size, info, other, shndx) = self.unpack("sym", ii)
+            else:
+                (name, info, other, shndx, value, symbol_size) = self.unpack("sym", ii)
+            ret += [{"name": self.read_string(strtab["offset"] + name), "value": value, "size": symbol_size,
+                     "bind": info >> 4, "type": info & 0xf, "visibility": other & 0x3, "shndx": shndx}]
+        return ret
+
+    def get_symbols(self, section_types=(SHT_SYMTAB, SHT_DYNSYM)):
+        """Get all symbols from symbol tables of given types as a list of dictionaries."""
+        ret = []
+        for ii in self.__section_headers:
+            if ii["type"] in section_types:
+                ret += self.get_section_symbols(ii)
+        return ret
+
+    def get_und_symbols(self):
+        """Get names of global undefined symbols with default visibility."""
+        ret = []
+        for ii in self.get_symbols():
+            if ii["name"] and (SHN_UNDEF == ii["shndx"]) and (STB_GLOBAL == ii["bind"]) and \
+               (STV_DEFAULT == ii["visibility"]):
+                ret += [ii["name"]]
+        return ret
+
+    def parse(self):
+        """Parse ELF header, program headers and section headers."""
+        if bytes(self.__view[:4]) != b"\x7fELF":
+            raise RuntimeError("'%s' is not an ELF file" % (self.__name))
+        if len(self.__view) <= EI_DATA:
+            raise RuntimeError("ELF file '%s' is truncated" % (self.__name))
+        elf_class = self.__view[EI_CLASS]
+        elf_data = self.__view[EI_DATA]
+        if not elf_class in g_elf_formats:
+            raise RuntimeError("unknown ELF class %i in '%s'" % (elf_class, self.__name))
+        if ELFDATA2LSB == elf_data:
+            bom = "<"
+        elif ELFDATA2MSB == elf_data:
+            bom = ">"
+        else:
+            raise RuntimeError("unknown ELF data encoding %i in '%s'" % (elf_data, self.__name))
+        self.__class_size = 4 * elf_class
+        self.__formats = {}
+        for ii in g_elf_formats[elf_class]:
+            self.__formats[ii] = bom + g_elf_formats[elf_class][ii]
+        (self.__elf_type, self.__machine, e_version, self.__entry, e_phoff, e_shoff, e_flags, e_ehsize, e_phentsize,
+         e_phnum, e_shentsize, e_shnum, self.__shstrndx) = self.unpack("ehdr", 16)
+        self.__program_headers = []
+        for ii in range(e_phnum):
+            values = self.unpack("phdr", e_phoff + ii * e_phentsize)
+            if 4 == self.__class_size:
+                (p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align) = values
+            else:
+                (p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align) = values
+            self.__program_headers += [{"type": p_type, "offset": p_offset, "vaddr": p_vaddr, "paddr": p_paddr,
+                                        "filesz": p_filesz, "memsz": p_memsz, "flags": p_flags, "align": p_align}]
+        self.__section_headers = []
+        # Section headers are often missing or bogus in minimized binaries, ignore them if out of bounds.
+        if e_shoff and (e_shoff + e_shnum * e_shentsize <= len(self.__view)):
+            for ii in range(e_shnum):
+                (sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, sh_info, sh_addralign,
+                 sh_entsize) = self.unpack("shdr", e_shoff + ii * e_shentsize)
+                self.__section_headers += [{"name": sh_name, "type": sh_type, "flags": sh_flags, "addr": sh_addr,
+                                            "offset": sh_offset, "size": sh_size, "link": sh_link,
+                                            "info": sh_info, "addralign": sh_addralign, "entsize": sh_entsize}]
+
+    def read_string(self, offset):
+        """Read a zero-terminated string starting from given offset."""
+        end = self.__mmap.find(b"\0", offset)
+        if 0 > end:
+            raise RuntimeError("unterminated string in ELF file '%s'" % (self.__name))
+        # Names are not required to be valid UTF-8, pass invalid bytes through instead of failing.
+        return bytes(self.__view[offset:end]).decode(errors="surrogateescape")
+
+    def unpack(self, name, offset):
+        """Unpack a structure of given type from given offset."""
+        fmt = self.__formats[name]
+        if offset + struct.calcsize(fmt) > len(self.__view):
+            raise RuntimeError("ELF file '%s' is truncated" % (self.__name))
+        return struct.unpack_from(fmt, self.__view, offset)
@@ -1,7 +1,15 @@
+import os
+import struct
+
+from shrinky.common import is_verbose
+from shrinky.common import run_command
+from shrinky.elf_reader import ElfReader
+
 ########################################
 # Globals ##############################
 ########################################
 
+ELFLING_ARRAY_LINE = 32
 ELFLING_OUTPUT = "elfling_output"
 ELFLING_PADDING = 10
 ELFLING_WORK = "elfling_modelCounters"
@@ -43,24 +51,26 @@ class Elfling:
         """Constructor."""
         self.__command = op
         self.__contexts = [0]
-        self.__data = [0] * (10 + 4)
+        self.__data = bytes(10 + 4)
         self.__weights = [0]
         self.__uncompressed_size = 12345678
 
     def compress(self, src, dst):
         """Compress given file, starting from entry point and ending at file end."""
-        info = readelf_get_info(src)
-        starting_size = os.path.getsize(src)
-        if starting_size != info["size"]:
-            raise RuntimeError("size of file '%s' differs from header claim: %i != %i" %
-                               (src, starting_size, info["size"]))
-        rfd = open(src, "rb")
-        wfd = open(dst, "wb")
-        data = rfd.read(starting_size)
-        wfd.write(data[info["entry"]:])
-        rfd.close()
-        wfd.close()
-        self.__uncompressed_size = len(data) - info["entry"]
+        reader = ElfReader(src)
+        try:
+            info = reader.get_load_info()
+            starting_size = os.path.getsize(src)
+            if starting_size != info["size"]:
+                raise RuntimeError("size of file '%s' differs from header claim: %i != %i" %
+                                   (src, starting_size, info["size"]))
+            # Program block is written straight from the mapping of the source file.
+            wfd = open(dst, "wb")
+            wfd.write(reader.get_data()[info["entry"]:starting_size])
+            wfd.close()
+        finally:
+            reader.close()
+        self.__uncompressed_size = starting_size - info["entry"]
         if is_verbose():
             print("Wrote compressable program block '%s': %i bytes" % (dst, self.__uncompressed_size))
         self.__contexts = []
@@ -80,54 +90,32 @@ class Elfling:
             print("Compression weights: %s" % (str(self.__weights)))
             print("Compression contexts: %s" % (str(self.__contexts)))
         rfd = open(dst + ".pack", "rb")
-        compressed_contexts = []
-        compressed_weights = []
-        uncompressed_size = rfd.read(4)
-        uncompressed_size = (struct.unpack("I", uncompressed_size))[0]
+        read_data = rfd.read()
+        rfd.close()
+        # Header is uncompressed size and context count followed by weights and contexts, one byte each.
+        (uncompressed_size, context_count) = struct.unpack_from("<IB", read_data, 0)
         if uncompressed_size != self.__uncompressed_size:
             raise RuntimeError("size given to packer does not match size information in file: %i != %i" %
                                (self.__uncompressed_size, uncompressed_size))
-        context_count = rfd.read(1)
-        context_count = (struct.unpack("B", context_count))[0]
-        for ii in range(context_count):
-            compressed_weights += struct.unpack("B", rfd.read(1))
-        for ii in range(context_count):
-            compressed_contexts += struct.unpack("B", rfd.read(1))
+        header_size = struct.calcsize("<IB")
+        compressed_weights = list(read_data[header_size:header_size + context_count])
+        compressed_contexts = list(read_data[header_size + context_count:header_size + context_count * 2])
         if compressed_contexts != self.__contexts:
             raise RuntimeError("contexts reported by packer do not match context information in file: %s != %s" %
                                (str(self.__contexts), str(compressed_contexts)))
         if compressed_weights != self.__weights:
             raise RuntimeError("weights reported by packer do not match weight information in file: %s != %s" %
                                (str(self.__weights), str(compressed_weights)))
-        read_data = rfd.read()
-        rfd.close()
-        if len(read_data) != compressed_size:
+        self.__data = memoryview(read_data)[header_size + context_count * 2:]
+        if len(self.__data) != compressed_size:
             raise RuntimeError("size reported by packer does not match length of file: %i != %i" %
-                               (compressed_size, len(read_data)))
-        self.__data = []
-        for ii in read_data:
-            self.__data += struct.unpack("B", ii)
+                               (compressed_size, len(self.__data)))
 
     def generate_c_data_block(self):
         """Generate direct C code for data block."""
-        ret = "static const uint8_t elfling_weights[] =\n{\n  "
-        for ii in range(len(self.__weights)):
-            if 0 < ii:
-                ret += ", "
-            ret += "%i" % (self.__weights[ii])
-        ret += "\n};\n\nstatic const uint8_t elfling_contexts[] =\n{\n  "
-        for ii in range(len(self.__contexts)):
-            if 0 < ii:
-                ret += ", "
-            ret += "%i" % (self.__contexts[ii])
-        ret += "\n};\n\nstatic const uint8_t elfling_input[] =\n{\n  "
-        for ii in range(ELFLING_PADDING):
-            if 0 < ii:
-                ret += ", "
-            ret += "0"
-        for ii in self.__data:
-            ret += ", %i" % (ii)
-        return ret + "\n};"
+        ret = generate_c_array("elfling_weights", self.__weights) + "\n\n"
+        ret += generate_c_array("elfling_contexts", self.__contexts) + "\n\n"
+        return ret + generate_c_array("elfling_input", bytes(ELFLING_PADDING) + bytes(self.__data))
 
     def generate_c_source(self, definition):
         """Generate the C uncompressor source."""
@@ -168,3 +156,16 @@ class Elfling:
         wfd = open(dst, "wt")
         wfd.write(self.generate_c_source(definition))
         wfd.close()
+
+########################################
+# Functions ############################
+########################################
+
+
+def generate_c_array(name, data):
+    """Generate C code for a constant byte array with given name and contents."""
+    # Elements are joined a line at a time, payloads may be tens of kilobytes.
+    lines = []
+    for ii in range(0, len(data), ELFLING_ARRAY_LINE):
+        lines += [", ".join(map(str, data[ii:ii + ELFLING_ARRAY_LINE]))]
+    return "static const uint8_t %s[] =\n{\n  %s\n};" % (name, ",\n  ".join(lines))
@@ -14,6 +14,9 @@ from shrinky.glsl_block_source import glsl_read_source
 from shrinky.glsl_block_source import is_glsl_block_source
 from shrinky.glsl_block_uniform import is_glsl_block_uniform
 from shrinky.glsl_name import is_glsl_name
+from shrinky.glsl_name_table import GlslNameTable
+from shrinky.trace import trace_begin
+from shrinky.trace import trace_end
 
 ########################################
 # Glsl #################################
@@ -26,9 +29,18 @@ class Glsl:
     def __init__(self):
         """Constructor."""
         self.__sources = []
+        self.__name_table = None
+        self.__letter_counts = None
+
+    def addSources(self, op):
+        """Add source files that have already been read."""
+        self.__sources += op
 
     def count(self):
         """Count instances of alpha letters within the code."""
+        # During renaming counts are updated incrementally as names are locked.
+        if not (self.__letter_counts is None):
+            return dict(self.__letter_counts)
         source = "".join([x.format(False) for x in self.__sources])
         ret = {}
         for ii in source:
@@ -49,7 +61,7 @@ class Glsl:
         ret = sorted(lst, reverse=True)
         return list([x[2] for x in ret])
 
-    def crunch(self, mode="full", max_inlines=-1, max_renames=-1, max_simplifys=-1):
+    def crunch(self, mode="full", max_inlines=-1, max_renames=-1, max_simplifys=-1, batch_inlines=True):
         """Crunch the source code to smaller state."""
         combines = None
         inlines = None
@@ -57,24 +69,39 @@ class Glsl:
         simplifys = None
         # Expand unless crunching completely disabled.
         if "none" != mode:
+            trace_begin("expandRecursive", "glsl")
             for ii in self.__sources:
                 ii.expandRecursive()
+            trace_end()
             # Perform inlining passes.
+            trace_begin("inline", "glsl")
             inlines = 0
+            passes = 0
             while True:
-                inline_pass_rv = self.inlinePass((max_inlines < 0) or (inlines < max_inlines))
+                allowed_inlines = -1
+                if 0 <= max_inlines:
+                    allowed_inlines = max_inlines - inlines
+                trace_begin("inline pass", "glsl", {"pass": passes})
+                inline_pass_rv = self.inlinePass(allowed_inlines, batch_inlines)
+                passes += 1
                 # Last pass will return a listing of merged variable names.
                 if is_listing(inline_pass_rv):
+                    trace_end({"inlines": 0})
                     merged = inline_pass_rv
                     break
+                trace_end({"inlines": inline_pass_rv})
                 # Inlining was done, another round.
-                inlines += 1
+                inlines += inline_pass_rv
+            trace_end({"passes": passes, "inlines": inlines})
             # Perform simplification passes.
+            trace_begin("simplify", "glsl")
             simplifys = 0
             for ii in self.__sources:
                 if (0 <= max_simplifys) and (simplifys >= max_simplifys):
                     break
                 simplifys += simplify_pass(ii, max_simplifys - simplifys)
+            trace_end({"simplifys": simplifys})
+            trace_begin("rename", "glsl")
             # After all names have been collected, it's possible to select the best swizzle.
             swizzle = self.selectSwizzle()
             for ii in self.__sources:
@@ -88,7 +115,9 @@ class Glsl:
                         inout_merges += [block[0]]
                 if inout_merges:
                     print("GLSL inout connections found: %s" % (str(list(map(str, inout_merges)))))
-            # Run rename passes until done.
+            # Run rename passes until done. Block hierarchy no longer changes, names can be tracked in a table.
+            self.__name_table = GlslNameTable(self.__sources)
+            self.__letter_counts = self.count()
             renames = 0
             for ii in merged:
                 if (0 <= max_renames) and (renames >= max_renames):
@@ -107,9 +136,14 @@ class Glsl:
                 if (0 > max_renames) or (renames < max_renames):
                     self.renameBlock(ii[0])
                     renames += 1
+            self.__name_table = None
+            self.__letter_counts = None
+            trace_end({"renames": renames})
             # Perform recombine passes.
+            trace_begin("collapse", "glsl")
             for ii in self.__sources:
                 combines = ii.collapseRecursive(mode)
+            trace_end({"combines": combines})
         # Print summary of operations.
         if is_verbose():
             operations = []
@@ -162,9 +196,9 @@ class Glsl:
         if is_glsl_block_source(parent):
             for ii in self.__sources:
                 if (ii != parent) and ((not parent.getType()) or (not ii.getType())):
-                    if has_name_conflict(ii, block, name):
+                    if self.__name_table.hasNameConflict(ii, block, name):
                         return True
-        return has_name_conflict(parent, block, name)
+        return self.__name_table.hasNameConflict(parent, block, name)
 
     def inline(self, block, names):
         """Perform inlining of block into where it is used."""
@@ -178,8 +212,8 @@ class Glsl:
         block.removeFromParent()
         return ret
 
-    def inlinePass(self, allow_inline):
-        """Run inline pass. Return list of merged names if no inlining could be done."""
+    def inlinePass(self, max_inlines=-1, batch=True):
+        """Run inline pass. Return list of merged names if no inlining could be done, otherwise number of inlines."""
         # Collect identifiers. First pass - collect from generic sources and append from non-generic.
         collected = []
         for ii in self.__sources:
@@ -206,23 +240,36 @@ class Glsl:
             lst = collect_member_accesses(ii[0], ii[1:])
             block.setMemberAccesses(lst)
         # If inlining is not allowed, just return merged block.
-        if not allow_inline:
+        if 0 == max_inlines:
             return merged
-        # Perform inlining if possible.
-        for ii in range(len(merged)):
-            vv = merged[ii]
-            block = vv[0]
+        candidates = []
+        for ii in merged:
+            block = ii[0]
             if is_listing(block) or (not is_glsl_block_declaration(block)):
                 continue
-            names = vv[1:]
-            if not is_inline_name(names[0]):
-                continue
-            # If no inline conflict, perform inline and return nothing to signify another pass can be done.
-            if not self.hasInlineConflict(block, names):
-                self.inline(block, names)
-                return None
-        # Return merged list.
-        return merged
+            if is_inline_name(ii[1]):
+                candidates += [ii]
+        # Perform first possible inline, this is the only inline done when inlining one at a time.
+        selected = None
+        for ii in candidates:
+            if not self.hasInlineConflict(ii[0], ii[1:]):
+                selected = ii
+                break
+        # Return merged list if no inlining could be done.
+        if not selected:
+            return merged
+        self.inline(selected[0], selected[1:])
+        ret = 1
+        # Inlines not sharing names with any other candidate neither affect nor are affected by other inlines, they can
+        # be done in the same pass without changing the result. Limited inlining is done one at a time.
+        if batch and (0 > max_inlines):
+            for ii in find_isolated_inlines(candidates):
+                if ii is selected:
+                    continue
+                if not self.hasInlineConflict(ii[0], ii[1:]):
+                    self.inline(ii[0], ii[1:])
+                    ret += 1
+        return ret
 
     def inventName(self, block, counted):
         """Invent a new name when existing names have run out."""
@@ -238,6 +285,14 @@ class Glsl:
                     return name
             ii += 1
 
+    def lockName(self, name, op):
+        """Lock given name into given string, update letter counts."""
+        self.__name_table.lock(name, op)
+        # Unlocked names are not part of formatted output, locked name appears in place of the name.
+        for ii in op:
+            if ii.isalpha():
+                self.__letter_counts[ii] = self.__letter_counts.get(ii, 0) + 1
+
     def parse(self):
         """Parse all source files."""
         for ii in self.__sources:
@@ -267,7 +322,7 @@ class Glsl:
             return
         # Just select first name.
         counted = self.countSorted()
-        block.getTypeName().lock(target_name)
+        self.lockName(block.getTypeName(), target_name)
 
     def renameMembers(self, block, max_renames):
         """Rename all members in given block."""
@@ -281,7 +336,7 @@ class Glsl:
         # Iterate over name types, one at a time.
         for (name_list, letter) in zip(lst[:renames], counted[:renames]):
             for name in name_list:
-                name.lock(letter)
+                self.lockName(name, letter)
         return renames
 
     def renamePass(self, block, names):
@@ -290,12 +345,12 @@ class Glsl:
         for letter in counted:
             if not self.hasNameConflict(block, letter):
                 for ii in names:
-                    ii.lock(letter)
+                    self.lockName(ii, letter)
                 return
         # None of the letters was free, invent new one.
         target_name = self.inventName(block, counted)
         for ii in names:
-            ii.lock(target_name)
+            self.lockName(ii, target_name)
 
     def selectSwizzle(self):
         counted = self.count()
@@ -406,6 +461,32 @@ def collect_member_accesses(block, names):
     return sorted(lst, key=len, reverse=True)
 
 
+def find_isolated_inlines(candidates):
+    """Find inline candidates whose names do not appear in statements of other candidates and vice versa."""
+    owners = {}
+    isolated = [True] * len(candidates)
+    for ii in range(len(candidates)):
+        for jj in candidates[ii][1:]:
+            owner = owners.get(id(jj), ii)
+            if owner != ii:
+                isolated[owner] = False
+                isolated[ii] = False
+            owners[id(jj)] = ii
+    blocks = {}
+    for ii in range(len(candidates)):
+        block = candidates[ii][0]
+        if id(block) in blocks:
+            isolated[blocks[id(block)]] = False
+            isolated[ii] = False
+        blocks[id(block)] = ii
+        for jj in block.getStatement().getTokens():
+            owner = owners.get(id(jj), ii)
+            if owner != ii:
+                isolated[owner] = False
+                isolated[ii] = False
+    return [candidates[ii] for ii in range(len(candidates)) if isolated[ii]]
+
+
 def flatten(block):
     ret = []
     for ii in block.getChildren():
@@ -440,21 +521,6 @@ def has_inline_conflict(parent, block, names, comparison=None):
     return False
 
 
-def has_name_conflict(parent, block, name):
-    """Tell if given block contains a conflict for given name."""
-    found = False
-    for ii in flatten(parent):
-        # Declared names take the name out of the scope permanently.
-        if ii.hasLockedDeclaredName(name):
-            return True
-        # Other blocks reserve names from their inception onward.
-        if block == ii:
-            found = True
-        if found and ii.hasLockedUsedName(name):
-            return True
-    return False
-
-
 def inline_instances(parent, block, names):
     """Inline all instances of block in given parent scope."""
     ret = 0
@@ -109,7 +109,7 @@ class GlslAccess:
         """Set source name for access."""
         bracket_count = 0
         paren_count = 0
-        for ii in reversed(list(range(len(lst)))):
+        for ii in range(len(lst) - 1, -1, -1):
             vv = lst[ii]
             if is_glsl_paren(vv):
                 if vv.isCurlyBrace():
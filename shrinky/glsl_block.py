@@ -301,6 +301,19 @@ class GlslBlock:
             raise RuntimeError("GlslBlock::setParent() hierarchy inconsistency")
         self.__parent = op
 
+########################################
+# Globals ##############################
+########################################
+
+
+# Special characters that always form a token of their own.
+g_token_punctuation = r'\(\)\[\]\{\}\+\-\*\/%\|&!\.,;:<>\='
+
+# Preliminary tokens are punctuation characters or whitespace-separated runs of other characters. Runs are further
+# classified as numbers or names only if the whole run matches.
+g_token_re = re.compile(r'(?P<punctuation>[%s])|(?P<number>\d+f?(?![^\s%s]))|(?P<name>[A-Za-z][A-Za-z0-9_]*(?![^\s%s]))|(?P<other>[^\s%s]+)' %
+                        (g_token_punctuation, g_token_punctuation, g_token_punctuation, g_token_punctuation))
+
 ########################################
 # Functions ############################
 ########################################
@@ -322,25 +335,24 @@ def check_token(token, req):
     return (token.format(False) == req)
 
 
-def extract_scope(tokens, opener):
-    """Extract scope from token list. Needs scope opener to already be extracted."""
+def extract_scope(tokens, opener, position=0):
+    """Extract scope from token list starting at given position. Needs scope opener to already be extracted."""
+    # Return scope contents and position after the closing scope element.
     if not is_glsl_paren(opener):
         raise RuntimeError("no opener passed to scope extraction")
     paren_count = 1
-    ret = []
-    for ii in range(len(tokens)):
+    for ii in range(position, len(tokens)):
         elem = tokens[ii]
         if is_glsl_paren(elem):
             paren_count = opener.update(elem, paren_count)
             if 0 >= paren_count:
-                return (ret, tokens[ii + 1:])
-        ret += [elem]
+                return (tokens[position:ii], ii + 1)
     # Did not find closing scope element.
-    return (None, tokens)
+    return (None, position)
 
 
-def extract_tokens(tokens, required):
-    """Require tokens from token string, return selected elements and the rest of tokens."""
+def extract_tokens(tokens, required, position=0):
+    """Require tokens from token list starting at given position, return selected elements and position after them."""
     # If required is just a string, make it a listing of length one.
     if not is_listing(required):
         required = (required,)
@@ -349,28 +361,27 @@ def extract_tokens(tokens, required):
     for ii in required:
         if "?" == ii[:1]:
             failure_array += [None]
-    failure_array += [tokens]
+    failure_array += [position]
     # For straight-out incompatible request, get out immediately.
-    if len(required) > len(tokens):
+    if len(required) > len(tokens) - position:
         return failure_array
     # Iterate over requests.
-    content = tokens[:]
-    required = list(required)
     ret = []
-    success = True
-    while content and required:
-        curr = content.pop(0)
-        req = required.pop(0)
+    for req in required:
+        if position >= len(tokens):
+            break
+        curr = tokens[position]
+        position += 1
         # Token request.
         if "?" == req[:1]:
             desc = req[1:]
             # Extracting scope.
             if desc in ("{", "[", "("):
                 if curr.format(False) == desc:
-                    (scope, remaining) = extract_scope(content, curr)
+                    (scope, scope_end) = extract_scope(tokens, curr, position)
                     if not (scope is None):
                         ret += [scope]
-                        content = remaining
+                        position = scope_end
                         continue
                 # Scope not found.
                 return failure_array
@@ -383,8 +394,8 @@ def extract_tokens(tokens, required):
         # Not a request, compare verbatim. Names can be compared verbatim.
         elif not check_token(curr, req):
             return failure_array
-    # Successful, return the remaining elements.
-    return ret + [content]
+    # Successful, return the position after extracted elements.
+    return ret + [position]
 
 
 def is_glsl_block(op):
@@ -398,83 +409,98 @@ def tokenize(source):
 
 
 def tokenize_interpret(tokens):
-    """Interpret a list of preliminary tokens, assembling constructs from them."""
+    """Interpret a list of preliminary (kind, string) tokens, assembling constructs from them."""
     ret = []
     ii = 0
-    while len(tokens) > ii:
-        element = tokens[ii]
-        # Try paren.
-        paren = interpret_paren(element)
-        if paren:
-            ret += [paren]
-            ii += 1
-            continue
-        # Try 2-stage control.
-        if (ii + 1) < len(tokens):
-            control = interpret_control(element, tokens[ii + 1])
+    count = len(tokens)
+    while count > ii:
+        (kind, element) = tokens[ii]
+        following = None
+        if (ii + 1) < count:
+            following = tokens[ii + 1][1]
+        # Names may be controls, in/out directives or types, interpreted in this order.
+        if "name" == kind:
+            # Try 2-stage control.
+            if following:
+                control = interpret_control(element, following)
+                if control:
+                    ret += [control]
+                    ii += 2
+                    continue
+            # Try control.
+            control = interpret_control(element)
             if control:
                 ret += [control]
-                ii += 2
+                ii += 1
                 continue
-        # Try control.
-        control = interpret_control(element)
-        if control:
-            ret += [control]
-            ii += 1
-            continue
-        # Try in/out.
-        inout = interpret_inout(element)
-        if inout:
-            ret += [inout]
-            ii += 1
-            continue
-        # Try 2-stage type.
-        if (ii + 1) < len(tokens):
-            typeid = interpret_type(element, tokens[ii + 1])
+            # Try in/out.
+            inout = interpret_inout(element)
+            if inout:
+                ret += [inout]
+                ii += 1
+                continue
+            # Try 2-stage type.
+            if following:
+                typeid = interpret_type(element, following)
+                if typeid:
+                    ret += [typeid]
+                    ii += 2
+                    continue
+            # Try type.
+            typeid = interpret_type(element)
             if typeid:
                 ret += [typeid]
-                ii += 2
+                ii += 1
                 continue
-        # Try type.
-        typeid = interpret_type(element)
-        if typeid:
-            ret += [typeid]
+            # Name identifier last.
+            ret += [interpret_name(element)]
             ii += 1
             continue
-        # Period may signify truncated floating point or member/swizzle access.
-        if "." == tokens[ii] and (ii + 1) < len(tokens):
-            decimal = interpret_int(tokens[ii + 1])
-            if decimal:
-                ret += [interpret_float(0, decimal)]
-                ii += 2
-                continue
-            access = interpret_access(tokens[ii + 1])
-            if access:
-                access.setSource(ret)
-                ret += [access]
-                ii += 2
-                continue
         # Number may be just an integer or floating point.
-        number = interpret_int(element)
-        if number:
-            if (ii + 1) < len(tokens) and "." == tokens[ii + 1]:
-                if (ii + 2) < len(tokens):
-                    decimal = interpret_int(tokens[ii + 2])
-                    if decimal:
-                        ret += [interpret_float(number, decimal)]
-                        ii += 3
-                        continue
+        if "number" == kind:
+            number = interpret_int(element)
+            if "." == following:
+                if (ii + 2) < count and ("number" == tokens[ii + 2][0]):
+                    ret += [interpret_float(number, interpret_int(tokens[ii + 2][1]))]
+                    ii += 3
+                    continue
                 ret += [interpret_float(number, 0)]
                 ii += 2
                 continue
             ret += [number]
             ii += 1
             continue
+        if "punctuation" == kind:
+            # Try paren.
+            paren = interpret_paren(element)
+            if paren:
+                ret += [paren]
+                ii += 1
+                continue
+            # Period may signify truncated floating point or member/swizzle access.
+            if ("." == element) and following:
+                following_kind = tokens[ii + 1][0]
+                if "number" == following_kind:
+                    ret += [interpret_float(0, interpret_int(following))]
+                    ii += 2
+                    continue
+                if "name" == following_kind:
+                    access = interpret_access(following)
+                    access.setSource(ret)
+                    ret += [access]
+                    ii += 2
+                    continue
+            # Statement terminator.
+            terminator = interpret_terminator(element)
+            if terminator:
+                ret += [terminator]
+                ii += 1
+                continue
         # Special characters may be operators, up to two in a row.
         operator = interpret_operator(element)
         if operator:
-            if (ii + 1) < len(tokens):
-                extended_operator = interpret_operator(tokens[ii + 1])
+            if following:
+                extended_operator = interpret_operator(following)
                 if extended_operator and operator.incorporate(extended_operator):
                     ret += [operator]
                     ii += 2
@@ -482,18 +508,6 @@ def tokenize_interpret(tokens):
             ret += [operator]
             ii += 1
             continue
-        # Statement terminator.
-        terminator = interpret_terminator(element)
-        if terminator:
-            ret += [terminator]
-            ii += 1
-            continue
-        # Try name identifier last.
-        name = interpret_name(element)
-        if name:
-            ret += [name]
-            ii += 1
-            continue
         # Fallback is to add token as-is.
         print("WARNING: GLSL: unknown element '%s'" % element)
         ret += [element]
@@ -502,18 +516,8 @@ def tokenize_interpret(tokens):
 
 
 def tokenize_split(source):
-    if not source:
-        return []
-    ret = []
-    array = source.split()
-    if 1 < len(array):
-        for ii in array:
-            ret += tokenize_split(ii)
-        return ret
-    array = re.split(r'([\(\)\[\]\{\}\+\-\*\/%\|&!\.,;:<>\=])', source, 1)
-    if 3 > len(array):
-        return [source]
-    return list([x for x in array[:2] if x]) + tokenize_split(array[2])
+    """Split source into preliminary (kind, string) tokens in one pass."""
+    return [(x.lastgroup, x.group()) for x in g_token_re.finditer(source)]
 
 
 def validate_token(token, validation):
@@ -64,43 +64,43 @@ class GlslBlockAssignment(GlslBlock):
 ########################################
 
 
-def glsl_parse_assignment(source, explicit=True):
+def glsl_parse_assignment(source, position=0, explicit=True):
     """Parse assignment block."""
     # Must have name. Name must not be just 'return'.
-    (name, content) = extract_tokens(source, ("?n",))
+    (name, content) = extract_tokens(source, ("?n",), position)
     if (not name) or (name == "return"):
-        return (None, source)
+        return (None, position)
     # Completely empty assignment. Acceptable if not in explicit mode.
-    if (not content) and (not explicit):
+    if (content >= len(source)) and (not explicit):
         return (GlslBlockAssignment(name, None, None, None), content)
     # Empty assignment.
-    (terminator, intermediate) = extract_tokens(content, ("?,|;",))
+    (terminator, intermediate) = extract_tokens(source, ("?,|;",), content)
     if terminator:
-        (statement, remaining) = glsl_parse_statement([terminator] + intermediate)
+        (statement, remaining) = glsl_parse_statement(source, content)
         return (GlslBlockAssignment(name, None, None, statement), remaining)
     # Non-empty assignment. Gather index and swizzle.
     lst = []
     while True:
-        (index_scope, remaining) = extract_tokens(content, ("?[",))
+        (index_scope, remaining) = extract_tokens(source, ("?[",), content)
         if index_scope:
             lst += [GlslParen("[")] + index_scope + [GlslParen("]")]
             content = remaining
             continue
-        (access, remaining) = extract_tokens(content, ("?a",))
+        (access, remaining) = extract_tokens(source, ("?a",), content)
         if access:
             lst += [access]
             content = remaining
             continue
-        (operator, remaining) = extract_tokens(content, ("?=",))
+        (operator, remaining) = extract_tokens(source, ("?=",), content)
         if operator:
             content = remaining
             break
         # Can't be an assignment.
-        return (None, source)
+        return (None, position)
     # Gather statement.
-    (statement, remaining) = glsl_parse_statement(content, explicit)
+    (statement, remaining) = glsl_parse_statement(source, content, explicit)
     if not statement:
-        return (None, source)
+        return (None, position)
     return (GlslBlockAssignment(name, lst, operator, statement), remaining)
 
 
@@ -39,17 +39,17 @@ class GlslBlockCall(GlslBlock):
 ########################################
 
 
-def glsl_parse_call(source):
+def glsl_parse_call(source, position=0):
     """Parse call block."""
-    (name, scope, terminator, remaining) = extract_tokens(source, ("?n", "?(", "?;"))
+    (name, scope, terminator, remaining) = extract_tokens(source, ("?n", "?(", "?;"), position)
     if not name:
-        return (None, source)
+        return (None, position)
     if scope:
         (statements, scope_remaining) = glsl_parse_statements(scope)
         if not statements:
-            return (None, source)
-        if scope_remaining:
-            raise RuntimeError("call scope cannot have remaining elements: '%s'" % str(scope_remaining))
+            return (None, position)
+        if scope_remaining < len(scope):
+            raise RuntimeError("call scope cannot have remaining elements: '%s'" % str(scope[scope_remaining:]))
         return (GlslBlockCall(name, statements, terminator), remaining)
     return (GlslBlockCall(name, [], terminator), remaining)
 
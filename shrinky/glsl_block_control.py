@@ -64,30 +64,31 @@ class GlslBlockControl(GlslBlock):
 ########################################
 
 
-def glsl_parse_control(source):
+def glsl_parse_control(source, position=0):
     """Parse control block."""
-    (control, content) = extract_tokens(source, "?c")
+    (control, content) = extract_tokens(source, "?c", position)
     if not control:
-        return (None, source)
+        return (None, position)
     # 'else' is simpler.
     if control.format(False) == "else":
         return (GlslBlockControl(control, None, None), content)
     # Other control structures require scope.
-    (scope, remaining) = extract_tokens(content, "?(")
+    (scope, remaining) = extract_tokens(source, "?(", content)
     if not scope:
-        return (None, source)
+        return (None, position)
     # 'for' may require declaration at the beginning.
     declaration = None
+    scope_position = 0
     if control.format(False) == "for":
         (declaration, intermediate) = glsl_parse_declaration(scope)
         if declaration:
-            scope = intermediate
+            scope_position = intermediate
     # Parse the rest of the statements, regardless if declaration was found.
-    (statements, scope_remaining) = glsl_parse_statements(scope)
+    (statements, scope_remaining) = glsl_parse_statements(scope, scope_position)
     if not statements:
-        return (None, source)
-    if scope_remaining:
-        raise RuntimeError("control scope cannot have remaining elements: '%s'" % str(scope_remaining))
+        return (None, position)
+    if scope_remaining < len(scope):
+        raise RuntimeError("control scope cannot have remaining elements: '%s'" % str(scope[scope_remaining:]))
     return (GlslBlockControl(control, declaration, statements), remaining)
 
 
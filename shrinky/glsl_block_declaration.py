@@ -70,15 +70,15 @@ class GlslBlockDeclaration(GlslBlock):
 ########################################
 
 
-def glsl_parse_declaration(source):
+def glsl_parse_declaration(source, position=0):
     """Parse declaration block."""
-    (typeid, content) = extract_tokens(source, ("?t",))
+    (typeid, content) = extract_tokens(source, ("?t",), position)
     if not typeid:
-        return (None, source)
+        return (None, position)
     # Loop until nothing found.
     lst = []
     while True:
-        (assignment, remaining) = glsl_parse_assignment(content)
+        (assignment, remaining) = glsl_parse_assignment(source, content)
         if assignment:
             lst += [assignment]
             # Might have been last assignement.
@@ -88,7 +88,7 @@ def glsl_parse_declaration(source):
             content = remaining
             continue
         # Unknown element, not a valid declaration.
-        return (None, source)
+        return (None, position)
 
 
 def is_glsl_block_declaration(op):
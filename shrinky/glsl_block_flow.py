@@ -27,15 +27,15 @@ class GlslBlockFlow(GlslBlock):
 ########################################
 
 
-def glsl_parse_flow(source):
+def glsl_parse_flow(source, position=0):
     """Parse flow block."""
-    (name, terminator, remaining) = extract_tokens(source, ("?n", "?;"))
+    (name, terminator, remaining) = extract_tokens(source, ("?n", "?;"), position)
     if name in ("break", "continue"):
-        (statement, discarded) = glsl_parse_statement([name, terminator])
-        if discarded:
+        (statement, statement_end) = glsl_parse_statement(source, position)
+        if statement_end != remaining:
             raise RuntimeError("discarded elements after flow control statement")
         return (GlslBlockFlow(statement), remaining)
-    return (None, source)
+    return (None, position)
 
 
 def is_glsl_block_flow(op):
@@ -52,17 +52,17 @@ class GlslBlockFunction(GlslBlock):
 ########################################
 
 
-def glsl_parse_function(source):
+def glsl_parse_function(source, position=0):
     """Parse function block."""
-    (typeid, name, param_scope, content) = extract_tokens(source, ("?t", "?n", "?("))
+    (typeid, name, param_scope, content) = extract_tokens(source, ("?t", "?n", "?("), position)
     if (not typeid) or (not name) or (param_scope is None):
-        return (None, source)
+        return (None, position)
     parameters = glsl_parse_parameter_list(param_scope)
     if parameters is None:
-        return (None, source)
-    (scope, remaining) = glsl_parse_scope(content)
+        return (None, position)
+    (scope, remaining) = glsl_parse_scope(source, content)
     if not scope:
-        return (None, source)
+        return (None, position)
     return (GlslBlockFunction(typeid, name, parameters, scope), remaining)
 
 
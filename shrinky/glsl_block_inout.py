@@ -145,17 +145,17 @@ class GlslBlockInOutTyped(GlslBlockInOut):
 ########################################
 
 
-def glsl_parse_inout(source):
+def glsl_parse_inout(source, position=0):
     """Parse inout block."""
-    (layout, content) = glsl_parse_layout(source)
+    (layout, content) = glsl_parse_layout(source, position)
     if not layout:
-        content = source
+        content = position
     # It is possible to have an inout block without anything.
-    (inout, remaining) = extract_tokens(content, ("?o", ";"))
+    (inout, remaining) = extract_tokens(source, ("?o", ";"), content)
     if inout:
         return (GlslBlockInOut(layout, inout), remaining)
     # Scoped version first.
-    (inout, type_name, scope, name, intermediate) = extract_tokens(content, ("?o", "?n", "?{", "?n"))
+    (inout, type_name, scope, name, intermediate) = extract_tokens(source, ("?o", "?n", "?{", "?n"), content)
     if inout and type_name and scope and name:
         members = glsl_parse_member_list(scope)
         if not members[0]:
@@ -163,17 +163,17 @@ def glsl_parse_inout(source):
         if not members:
             raise RuntimeError("empty member list for inout struct")
         # May have an array.
-        (size, remaining) = extract_tokens(intermediate, ("[", "?u", "]", ";"))
+        (size, remaining) = extract_tokens(source, ("[", "?u", "]", ";"), intermediate)
         if size:
             return (GlslBlockInOutStruct(layout, inout, type_name, members, name, size), remaining)
         # Did not have an array.
-        (terminator, remaining) = extract_tokens(intermediate, "?|;")
+        (terminator, remaining) = extract_tokens(source, "?|;", intermediate)
         if terminator:
             return (GlslBlockInOutStruct(layout, inout, type_name, members, name), remaining)
     # Regular inout.
-    (inout, typeid, name, remaining) = extract_tokens(content, ("?o", "?t", "?n", ";"))
+    (inout, typeid, name, remaining) = extract_tokens(source, ("?o", "?t", "?n", ";"), content)
     if not inout or not typeid or not name:
-        return (None, source)
+        return (None, position)
     return (GlslBlockInOutTyped(layout, inout, typeid, name), remaining)
 
 
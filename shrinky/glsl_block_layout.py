@@ -31,32 +31,35 @@ class GlslBlockLayout(GlslBlock):
 ########################################
 
 
-def glsl_parse_layout(source):
+def glsl_parse_layout(source, position=0):
     """Parse layout block."""
-    (scope, remaining) = extract_tokens(source, ("layout", "?("))
+    (scope, remaining) = extract_tokens(source, ("layout", "?("), position)
     if not scope:
-        return (None, source)
+        return (None, position)
     lst = []
-    while scope:
-        (location, assignment, index, intermediate) = extract_tokens(scope, ("?|location", "?=", "?u"))
+    scope_position = 0
+    while scope_position < len(scope):
+        (location, assignment, index, intermediate) = extract_tokens(scope, ("?|location", "?=", "?u"),
+                                                                     scope_position)
         if location and assignment and index:
             lst += [[location, assignment, index]]
-            scope = intermediate
+            scope_position = intermediate
             continue
         primitive_selector = "?" + "|".join(get_list_primitives())
-        (primitive, intermediate) = extract_tokens(scope, (primitive_selector,))
+        (primitive, intermediate) = extract_tokens(scope, (primitive_selector,), scope_position)
         if primitive:
             lst += [[primitive]]
-            scope = intermediate
+            scope_position = intermediate
             continue
-        (max_vertices, assignment, amount, intermediate) = extract_tokens(scope, ("?|max_vertices", "?=", "?u"))
+        (max_vertices, assignment, amount, intermediate) = extract_tokens(scope, ("?|max_vertices", "?=", "?u"),
+                                                                          scope_position)
         if max_vertices and assignment and amount:
             lst += [[max_vertices, assignment, amount]]
-            scope = intermediate
+            scope_position = intermediate
             continue
-        (comma, intermediate) = extract_tokens(scope, "?|,")
+        (comma, intermediate) = extract_tokens(scope, "?|,", scope_position)
         if comma:
-            scope = intermediate
+            scope_position = intermediate
             continue
-        raise RuntimeError("unknown layout directive %s" % (str(list(map(str, scope)))))
+        raise RuntimeError("unknown layout directive %s" % (str(list(map(str, scope[scope_position:])))))
     return (GlslBlockLayout(lst), remaining)
@@ -48,11 +48,11 @@ class GlslBlockMember(GlslBlock):
 ########################################
 
 
-def glsl_parse_member(source):
+def glsl_parse_member(source, position=0):
     """Parse member block."""
-    (typeid, name, remaining) = extract_tokens(source, ("?t", "?n", ";"))
+    (typeid, name, remaining) = extract_tokens(source, ("?t", "?n", ";"), position)
     if not typeid:
-        return (None, source)
+        return (None, position)
     return (GlslBlockMember(typeid, name), remaining)
 
 
@@ -61,14 +61,14 @@ def glsl_parse_member_list(source):
     # Empty member list is ok.
     if is_listing(source) and (0 >= len(source)):
         return []
-    (member, content) = glsl_parse_member(source)
+    (member, position) = glsl_parse_member(source)
     if not member:
         raise RuntimeError("error parsing members: %s" % (str(list(map(str, source)))))
     ret = [member]
-    while content:
-        (member, remaining) = glsl_parse_member(content)
+    while position < len(source):
+        (member, remaining) = glsl_parse_member(source, position)
         if not member:
-            raise RuntimeError("error parsing members: %s" % (str(list(map(str, content)))))
+            raise RuntimeError("error parsing members: %s" % (str(list(map(str, source[position:])))))
         ret += [member]
-        content = remaining
+        position = remaining
     return ret
@@ -42,16 +42,16 @@ class GlslBlockParameter(GlslBlock):
 ########################################
 
 
-def glsl_parse_parameter(source):
+def glsl_parse_parameter(source, position=0):
     """Parse parameter block."""
-    (inout, typeid, content) = extract_tokens(source, ("?o", "?t"))
+    (inout, typeid, content) = extract_tokens(source, ("?o", "?t"), position)
     if not inout:
-        (typeid, content) = extract_tokens(source, ("?t"))
+        (typeid, content) = extract_tokens(source, ("?t"), position)
         if not typeid:
-            return (None, source)
-    (assignment, remaining) = glsl_parse_assignment(content, False)
+            return (None, position)
+    (assignment, remaining) = glsl_parse_assignment(source, content, False)
     if not assignment:
-        raise RuntimeError("could not parse assignment from '%s'" % (str(list(map(str, content)))))
+        raise RuntimeError("could not parse assignment from '%s'" % (str(list(map(str, source[content:])))))
     if inout and (not inout.format(False) in ("in", "inout", "out")):
         raise RuntimeError("invalid inout directive for parameter: '%s'" % (inout.format(False)))
     return (GlslBlockParameter(inout, typeid, assignment), remaining)
@@ -92,7 +92,7 @@ def glsl_parse_parameter_list(source):
         (parameter, remaining) = glsl_parse_parameter(ii)
         if not parameter:
             raise RuntimeError("could not parse parameter from '%s'" % (str(list(map(str, ii)))))
-        if remaining:
-            raise RuntimeError("extra content after parameter: '%s'" % (str(list(map(str, remaining)))))
+        if remaining < len(ii):
+            raise RuntimeError("extra content after parameter: '%s'" % (str(list(map(str, ii[remaining:])))))
         ret += [parameter]
     return ret
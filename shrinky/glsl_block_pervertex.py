@@ -29,17 +29,18 @@ class GlslBlockPerVertex(GlslBlock):
 ########################################
 
 
-def glsl_parse_pervertex(source):
+def glsl_parse_pervertex(source, position=0):
     """Parse inout block."""
-    (inout, scope, remaining) = extract_tokens(source, ("?o", "gl_PerVertex", "?{", ";"))
+    (inout, scope, remaining) = extract_tokens(source, ("?o", "gl_PerVertex", "?{", ";"), position)
     if (not inout) or (not scope):
-        return (None, source)
+        return (None, position)
     # Split scope into elements.
     lst = []
-    while scope:
-        (typeid, name, content) = extract_tokens(scope, ("?t", "?n", ";"))
+    scope_position = 0
+    while scope_position < len(scope):
+        (typeid, name, content) = extract_tokens(scope, ("?t", "?n", ";"), scope_position)
         if not typeid or not name:
-            return (None, source)
+            return (None, position)
         lst += [(typeid, name)]
-        scope = content
+        scope_position = content
     return (GlslBlockPerVertex(inout, lst), remaining)
@@ -38,14 +38,14 @@ class GlslBlockReturn(GlslBlock):
 ########################################
 
 
-def glsl_parse_return(source):
+def glsl_parse_return(source, position=0):
     """Parse return block."""
-    (ret, content) = extract_tokens(source, "?|return")
+    (ret, content) = extract_tokens(source, "?|return", position)
     if not ret:
-        return (None, source)
-    (statements, remaining) = glsl_parse_statements(content, ";")
+        return (None, position)
+    (statements, remaining) = glsl_parse_statements(source, content, ";")
     if not statements:
-        return (None, source)
+        return (None, position)
     return (GlslBlockReturn(statements), remaining)
 
 
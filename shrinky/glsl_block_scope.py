@@ -121,34 +121,35 @@ def glsl_parse_content(source):
         return glsl_parse_content(source[1:-1])
     # Loop over content.
     ret = []
-    while source:
+    position = 0
+    while position < len(source):
         # Parse scope, allow one-statement scope (will be merged with a control or destroyed later).
-        (block, remaining) = glsl_parse_scope(source, False)
+        (block, remaining) = glsl_parse_scope(source, position, False)
         if block:
             ret += [block]
-            source = remaining
+            position = remaining
             continue
-        (block, remaining) = glsl_parse_control(source)
+        (block, remaining) = glsl_parse_control(source, position)
         if block:
             ret += [block]
-            source = remaining
+            position = remaining
             continue
-        (block, remaining) = glsl_parse_declaration(source)
+        (block, remaining) = glsl_parse_declaration(source, position)
         if block:
             ret += [block]
-            source = remaining
+            position = remaining
             continue
-        (block, remaining) = glsl_parse_call(source)
+        (block, remaining) = glsl_parse_call(source, position)
         if block:
             ret += [block]
-            source = remaining
+            position = remaining
             continue
-        (block, remaining) = glsl_parse_return(source)
+        (block, remaining) = glsl_parse_return(source, position)
         if block:
             ret += [block]
-            source = remaining
+            position = remaining
             continue
-        raise RuntimeError("cannot parse content: %s" % (str(list(map(str, source)))))
+        raise RuntimeError("cannot parse content: %s" % (str(list(map(str, source[position:])))))
     # Merge control blocks with following blocks.
     while True:
         if not merge_control_pass(ret):
@@ -160,24 +161,24 @@ def glsl_parse_content(source):
     return ret
 
 
-def glsl_parse_scope(source, explicit=True):
+def glsl_parse_scope(source, position=0, explicit=True):
     """Parse scope block."""
-    (content, remaining) = extract_tokens(source, ("?{",))
+    (content, remaining) = extract_tokens(source, ("?{",), position)
     if not (content is None):
         return (GlslBlockScope(glsl_parse_content(content), explicit), remaining)
     # If explicit scope is not expected, try legal one-statement scopes.
     elif not explicit:
-        (block, remaining) = glsl_parse_flow(source)
+        (block, remaining) = glsl_parse_flow(source, position)
         if block:
             return (GlslBlockScope([block], explicit), remaining)
-        (block, remaining) = glsl_parse_unary(source)
+        (block, remaining) = glsl_parse_unary(source, position)
         if block:
             return (GlslBlockScope([block], explicit), remaining)
-        (block, remaining) = glsl_parse_assignment(source)
+        (block, remaining) = glsl_parse_assignment(source, position)
         if block:
             return (GlslBlockScope([block], explicit), remaining)
     # No scope found.
-    return (None, source)
+    return (None, position)
 
 
 def is_glsl_block_scope(op):
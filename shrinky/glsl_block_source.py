@@ -1,11 +1,18 @@
+import concurrent.futures
 import re
 import os
 
 from shrinky.common import is_verbose
 from shrinky.glsl_block import GlslBlock
+from shrinky.glsl_block import tokenize
 from shrinky.glsl_block_preprocessor import glsl_parse_preprocessor
-from shrinky.glsl_parse import glsl_parse
+from shrinky.glsl_parse import glsl_parse_tokenized
 from shrinky.template import Template
+from shrinky.trace import get_trace
+from shrinky.trace import set_trace
+from shrinky.trace import Trace
+from shrinky.trace import trace_begin
+from shrinky.trace import trace_end
 
 ########################################
 # Globals ##############################
@@ -28,6 +35,10 @@ static const char *[[VARIABLE_NAME]] = \"\"
 #endif
 """)
 
+g_read_definition_ld = None
+
+g_read_preprocessor = None
+
 ########################################
 # GlslBlockSource ######################
 ########################################
@@ -44,6 +55,7 @@ class GlslBlockSource(GlslBlock):
         self.__variable_name = varname
         self.__output_name = output_name
         self.__content = ""
+        self.__preprocessed = None
         self.detectType()
 
     def detectType(self):
@@ -86,6 +98,10 @@ class GlslBlockSource(GlslBlock):
         """Accessor."""
         return self.__filename
 
+    def getPreprocessed(self):
+        """Get full preprocessor output the source was read from."""
+        return self.__preprocessed
+
     def getType(self):
         """Access type of this shader file. May be empty."""
         return self.__type
@@ -95,9 +111,18 @@ class GlslBlockSource(GlslBlock):
 
     def parse(self):
         """Parse code into blocks and statements."""
-        array = glsl_parse(self.__content)
+        # Content is consumed by parsing, sources read in parallel have already been parsed.
+        if self.__content is None:
+            return
+        trace_begin("tokenize", "glsl", {"file": self.__filename})
+        tokens = tokenize(self.__content)
+        trace_end()
+        trace_begin("parse", "glsl", {"file": self.__filename})
+        array = glsl_parse_tokenized(tokens)
+        trace_end()
         # Hierarchy.
         self.addChildren(array)
+        self.__content = None
 
     def preprocess(self, preprocessor, source):
         """Preprocess GLSL source, store preprocessor directives into parse tree and content."""
@@ -108,13 +133,18 @@ class GlslBlockSource(GlslBlock):
                 self.addChildren(block)
             else:
                 content += [ii]
-        # Removed known preprocessor directives, write result into intermediate file.
-        fname = self.__filename + ".preprocessed"
-        fd = open(fname, "w")
-        fd.write(("\n".join(content)).strip())
-        fd.close()
-        # Preprocess and reassemble content.
-        intermediate = preprocessor.preprocess(fname)
+        # Removed known preprocessor directives, try preprocessing in-process first.
+        content = ("\n".join(content)).strip()
+        intermediate = preprocessor.preprocess_builtin(content, self.__filename)
+        # Otherwise write result into intermediate file for external preprocessor.
+        if intermediate is None:
+            fname = self.__filename + ".preprocessed"
+            fd = open(fname, "w")
+            fd.write(content)
+            fd.close()
+            intermediate = preprocessor.preprocess(fname)
+        self.__preprocessed = intermediate
+        # Reassemble content.
         content = []
         for ii in intermediate.splitlines():
             if not ii.strip().startswith("#"):
@@ -131,10 +161,20 @@ class GlslBlockSource(GlslBlock):
 
     def write(self):
         """Write compressed output."""
+        output = self.generateHeaderOutput()
+        # Leave unchanged header alone so its modification time does not trigger rebuilds.
+        if os.path.isfile(self.__output_name):
+            fd = open(self.__output_name, "r")
+            existing = fd.read()
+            fd.close()
+            if existing == output:
+                if is_verbose():
+                    print("GLSL header unchanged: '%s' => '%s'" % (self.__variable_name, self.__output_name))
+                return
         fd = open(self.__output_name, "w")
         if not fd:
             raise RuntimeError("could not write GLSL header '%s'" % (self.__output_name))
-        fd.write(self.generateHeaderOutput())
+        fd.write(output)
         fd.close()
         if is_verbose():
             print("Wrote GLSL header: '%s' => '%s'" % (self.__variable_name, self.__output_name))
@@ -185,6 +225,84 @@ def glsl_read_source(preprocessor, definition_ld, filename, varname, output_name
     return ret
 
 
+def glsl_read_source_group(op):
+    """Read and parse a listing of (filename, varname, output name) tuples, return parsed sources."""
+    ret = []
+    for (filename, varname, output_name) in op:
+        source = glsl_read_source(g_read_preprocessor, g_read_definition_ld, filename, varname, output_name)
+        source.parse()
+        ret += [source]
+    return ret
+
+
+def glsl_read_source_initialize(preprocessor, definition_ld):
+    """Set preprocessor and definition used by subsequent source reads."""
+    global g_read_definition_ld
+    global g_read_preprocessor
+    g_read_definition_ld = definition_ld
+    g_read_preprocessor = preprocessor
+
+
+def glsl_read_source_worker(op):
+    """Read and parse a listing in a worker process, return parsed sources and trace events recorded meanwhile."""
+    trace = get_trace()
+    ret = glsl_read_source_group(op)
+    if trace:
+        return (ret, trace.take_events())
+    return (ret, [])
+
+
+def glsl_read_source_worker_initialize(preprocessor, definition_ld, tracing):
+    """Initialize a worker process for reading sources, with a trace of its own if parent is tracing."""
+    glsl_read_source_initialize(preprocessor, definition_ld)
+    # Forked workers inherit the trace of the parent along with its open spans, start from an empty one.
+    if tracing:
+        set_trace(Trace())
+    else:
+        set_trace(None)
+
+
+def glsl_read_sources(preprocessor, definition_ld, listings):
+    """Read and parse (filename, varname, output name) tuples into GLSL sources, in parallel if possible."""
+    # Intermediate preprocessed file is written next to the source, all reads of one file go to the same worker.
+    indices = {}
+    for ii in range(len(listings)):
+        filename = listings[ii][0]
+        if filename in indices:
+            indices[filename] += [ii]
+        else:
+            indices[filename] = [ii]
+    indices = list(indices.values())
+    groups = [[listings[jj] for jj in ii] for ii in indices]
+    executor = None
+    if 1 < len(groups):
+        try:
+            executor = concurrent.futures.ProcessPoolExecutor(initializer=glsl_read_source_worker_initialize,
+                                                              initargs=(preprocessor, definition_ld,
+                                                                        bool(get_trace())))
+        except (NotImplementedError, OSError):
+            # Process pools are not available on all platforms, fall back to reading serially.
+            executor = None
+    # Errors from workers, such as missing include files, are propagated as is.
+    if executor:
+        with executor:
+            results = []
+            # Events recorded in workers, such as preprocessor commands, are merged into trace of this process.
+            for (sources, events) in executor.map(glsl_read_source_worker, groups):
+                results += [sources]
+                if get_trace():
+                    get_trace().add_events(events)
+    else:
+        glsl_read_source_initialize(preprocessor, definition_ld)
+        results = [glsl_read_source_group(x) for x in groups]
+    # Return sources in the order they were listed.
+    ret = [None] * len(listings)
+    for (group_indices, sources) in zip(indices, results):
+        for (ii, source) in zip(group_indices, sources):
+            ret[ii] = source
+    return ret
+
+
 def is_glsl_block_source(op):
     """Tell if given object is a GLSL source block."""
     return isinstance(op, GlslBlockSource)
@@ -72,6 +72,13 @@ class GlslBlockStatement(GlslBlock):
                 return True
         return False
 
+    def flattenTree(self, tree):
+        """Replace content with flattened token tree."""
+        content = tree.flatten()
+        if not content:
+            raise RuntimeError("content '%s' simplified to '%s'" % (str(list(map(str, self.__content))), str(content)))
+        self.__content = content
+
     def setTerminator(self, op):
         """Set terminating character."""
         self.__terminator = op
@@ -79,21 +86,34 @@ class GlslBlockStatement(GlslBlock):
     def simplify(self, max_simplifys):
         """Run simplification pass on the statement."""
         ret = 0
-        while True:
+        tree = None
+        flattened = True
+        while self.__content:
             if (max_simplifys >= 0) and (max_simplifys <= ret):
                 break
-            content = simplify_pass(self.__content)
-            if not content and self.__content:
-                raise RuntimeError("content '%s' simplified to '%s'" %
-                                   (str(list(map(str, self.__content))), str(content)))
-            if content == self.__content:
+            # Tree only needs to be rebuilt from tokens when grouping of operators may have changed.
+            if not tree:
+                tree = token_tree_build(self.__content)
+                if not tree:
+                    raise RuntimeError("could not build tree from '%s'" % (str(list(map(str, self.__content)))))
+            simplified = token_tree_simplify(tree)
+            # Simplification that only changed numbers does not change tokens, stop there.
+            if (not simplified) or ("number" == simplified):
                 break
-            self.__content = content
+            flattened = False
+            if "parens" == simplified:
+                self.flattenTree(tree)
+                flattened = True
+                tree = None
+            ret += 1
+        if not flattened:
+            self.flattenTree(tree)
+        # Simplification does not need names or accesses, update them only once.
+        if ret:
             self.clearAccesses()
             self.clearNamesUsed()
             self.addAccesses(self.__content)
             self.addNamesUsed(self.__content)
-            ret += 1
         return ret
 
     def __str__(self):
@@ -105,12 +125,12 @@ class GlslBlockStatement(GlslBlock):
 ########################################
 
 
-def glsl_parse_statement(source, explicit=True):
+def glsl_parse_statement(source, position=0, explicit=True):
     """Parse statement block."""
     bracket_count = 0
     paren_count = 0
     lst = []
-    for ii in range(len(source)):
+    for ii in range(position, len(source)):
         elem = source[ii]
         # Count all scope-y things.
         if is_glsl_paren(elem):
@@ -124,40 +144,26 @@ def glsl_parse_statement(source, explicit=True):
                 raise RuntimeError("scope declaration within statement")
         # Statement end.
         elif (elem.format(False) in (",", ";")) and (paren_count == 0) and (bracket_count == 0):
-            return (GlslBlockStatement(lst, elem), source[ii + 1:])
+            return (GlslBlockStatement(lst, elem), ii + 1)
         # Element is going into the statement.
         lst += [elem]
     # Was ok to have a statement without a terminator.
     if not explicit:
-        return (GlslBlockStatement(lst), [])
+        return (GlslBlockStatement(lst), len(source))
     # Could not detect statement for a reason or another.
-    return (None, source)
+    return (None, position)
 
 
-def glsl_parse_statements(source, until=None):
+def glsl_parse_statements(source, position=0, until=None):
     """Parse multiple statements."""
     lst = []
-    while source:
-        (block, remaining) = glsl_parse_statement(source, False)
+    while position < len(source):
+        (block, remaining) = glsl_parse_statement(source, position, False)
         if not block:
             raise RuntimeError("error parsing statements")
         lst += [block]
+        position = remaining
         # Terminate statement extraction if necessary.
         if until and (block.getTerminator() == until):
-            return (lst, remaining)
-        source = remaining
-    # Everything was parsed.
-    return (lst, None)
-
-
-def simplify_pass(lst):
-    """Run simplification pass on tokens."""
-    # Build tree and run simplify pass from there.
-    if lst:
-        tree = token_tree_build(lst)
-        if not tree:
-            raise RuntimeError("could not build tree from '%s'" % (str(list(map(str, lst)))))
-        if token_tree_simplify(tree):
-            return tree.flatten()
-    # Nothign to simplify, just return original tree.
-    return lst
+            break
+    return (lst, position)
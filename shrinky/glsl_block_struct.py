@@ -62,21 +62,21 @@ class GlslBlockStruct(GlslBlock):
 ########################################
 
 
-def glsl_parse_struct(source):
+def glsl_parse_struct(source, position=0):
     """Parse struct block."""
-    (type_name, scope, content) = extract_tokens(source, ("struct", "?n", "?{"))
+    (type_name, scope, content) = extract_tokens(source, ("struct", "?n", "?{"), position)
     if not type_name:
-        return (None, source)
+        return (None, position)
     # Get potential name and size.
-    (name, size, remaining) = extract_tokens(content, ("?n", "[", "?i", "]", ";"))
+    (name, size, remaining) = extract_tokens(source, ("?n", "[", "?i", "]", ";"), content)
     if not name:
         size = None
-        (name, remaining) = extract_tokens(content, ("?n", ";"))
+        (name, remaining) = extract_tokens(source, ("?n", ";"), content)
         if not name:
             name = None
-            (terminator, remaining) = extract_tokens(content, ("?;",))
+            (terminator, remaining) = extract_tokens(source, ("?;",), content)
             if not terminator:
-                return (None, source)
+                return (None, position)
     # Parse members
     members = glsl_parse_member_list(scope)
     if not members:
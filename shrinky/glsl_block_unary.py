@@ -46,24 +46,24 @@ g_allowed_operators = (
 ########################################
 
 
-def glsl_parse_unary(source):
+def glsl_parse_unary(source, position=0):
     """Parse unary block."""
     # Try prefix unary.
-    (operator, name, terminator, remaining) = extract_tokens(source, ("?p", "?n", "?;"))
+    (operator, name, terminator, remaining) = extract_tokens(source, ("?p", "?n", "?;"), position)
     if operator in g_allowed_operators:
-        (statement, discarded) = glsl_parse_statement([operator, name, terminator])
-        if discarded:
+        (statement, statement_end) = glsl_parse_statement(source, position)
+        if statement_end != remaining:
             raise RuntimeError("discarded elements in prefix unary")
         return (GlslBlockUnary(statement), remaining)
     # Try postfix unary.
-    (name, operator, terminator, remaining) = extract_tokens(source, ("?n", "?p", "?;"))
+    (name, operator, terminator, remaining) = extract_tokens(source, ("?n", "?p", "?;"), position)
     if operator in g_allowed_operators:
-        (statement, discarded) = glsl_parse_statement([name, operator, terminator])
-        if discarded:
+        (statement, statement_end) = glsl_parse_statement(source, position)
+        if statement_end != remaining:
             raise RuntimeError("discarded elements in postfix unary")
         return (GlslBlockUnary(statement), remaining)
     # No match.
-    return (None, source)
+    return (None, position)
 
 
 def is_glsl_block_unary(op):
@@ -45,27 +45,27 @@ class GlslBlockUniform(GlslBlock):
 ########################################
 
 
-def glsl_parse_uniform(source):
+def glsl_parse_uniform(source, position=0):
     """Parse preprocessor block."""
-    (layout, content) = glsl_parse_layout(source)
+    (layout, content) = glsl_parse_layout(source, position)
     if not layout:
-        content = source
+        content = position
     # Extract actual uniform definition.
-    (typeid, content) = extract_tokens(content, ("uniform", "?t"))
+    (typeid, content) = extract_tokens(source, ("uniform", "?t"), content)
     if not typeid:
-        return (None, source)
+        return (None, position)
     # Try array types.
-    (name, size, content) = extract_tokens(content, ("?n", "[", "?u", "]", ";"))
+    (name, size, remaining) = extract_tokens(source, ("?n", "[", "?u", "]", ";"), content)
     if name and size:
-        return (GlslBlockUniform(layout, typeid, size, name), content)
-    (size, name, content) = extract_tokens(content, ("[", "?u", "]", "?n", ";"))
+        return (GlslBlockUniform(layout, typeid, size, name), remaining)
+    (size, name, remaining) = extract_tokens(source, ("[", "?u", "]", "?n", ";"), content)
     if size and name:
-        return (GlslBlockUniform(layout, typeid, size, name), content)
+        return (GlslBlockUniform(layout, typeid, size, name), remaining)
     # No array types, default to just name.
-    (name, content) = extract_tokens(content, ("?n", ";"))
+    (name, remaining) = extract_tokens(source, ("?n", ";"), content)
     if not name:
-        return (None, source)
-    return (GlslBlockUniform(layout, typeid, size, name), content)
+        return (None, position)
+    return (GlslBlockUniform(layout, typeid, size, name), remaining)
 
 
 def is_glsl_block_uniform(op):
@@ -0,0 +1,82 @@
+import bisect
+
+########################################
+# GlslNameTable ########################
+########################################
+
+
+class GlslNameTable:
+    """Table of locked names in block trees for answering rename conflict queries."""
+
+    def __init__(self, sources):
+        """Constructor."""
+        # Blocks are numbered in depth-first order, subtree of a block is the range from its index to its last
+        # descendant. Locked names are stored as sorted listings of block indices per source and name.
+        self.__roots = {}
+        self.__first = {}
+        self.__last = {}
+        self.__holders = {}
+        self.__declared = {}
+        self.__used = {}
+        for ii in range(len(sources)):
+            self.addBlock(sources[ii], ii, 0)
+
+    def addBlock(self, block, root, index):
+        """Number a block and its descendants, starting from given index. Return last index used."""
+        key = id(block)
+        self.__roots[key] = root
+        self.__first[key] = index
+        for ii in block.getDeclaredNames():
+            self.addHolder(ii, block, self.__declared)
+        for ii in block.getUsedNames():
+            self.addHolder(ii, block, self.__used)
+        for ii in block.getChildren():
+            index = self.addBlock(ii, root, index + 1)
+        self.__last[key] = index
+        return index
+
+    def addHolder(self, name, block, table):
+        """Register a block as declaring or using given name."""
+        key = id(name)
+        if key in self.__holders:
+            self.__holders[key] += [(block, table)]
+        else:
+            self.__holders[key] = [(block, table)]
+        if name.isLocked():
+            self.addLocked(name.resolveName(), block, table)
+
+    def addLocked(self, name, block, table):
+        """Add a locked name at the location of given block."""
+        key = (self.__roots[id(block)], name)
+        if key in table:
+            bisect.insort(table[key], self.__first[id(block)])
+        else:
+            table[key] = [self.__first[id(block)]]
+
+    def hasLocked(self, table, root, name, first, last):
+        """Tell if given table has given name locked in index range [first, last]."""
+        lst = table.get((root, name))
+        if not lst:
+            return False
+        ii = bisect.bisect_left(lst, first)
+        return (ii < len(lst)) and (lst[ii] <= last)
+
+    def hasNameConflict(self, parent, block, name):
+        """Tell if given block would have a conflict within descendants of given parent if renamed to given name."""
+        root = self.__roots[id(parent)]
+        first = self.__first[id(parent)] + 1
+        last = self.__last[id(parent)]
+        # Declared names take the name out of the scope permanently.
+        if self.hasLocked(self.__declared, root, name, first, last):
+            return True
+        # Other blocks reserve names from their inception onward.
+        key = id(block)
+        if (self.__roots[key] != root) or (self.__first[key] < first) or (self.__first[key] > last):
+            return False
+        return self.hasLocked(self.__used, root, name, self.__first[key], last)
+
+    def lock(self, name, op):
+        """Lock given name into given string and record it in the table."""
+        name.lock(op)
+        for (block, table) in self.__holders.get(id(name), []):
+            self.addLocked(op, block, table)
@@ -21,31 +21,18 @@ def glsl_parse(source):
 
 def glsl_parse_tokenized(source):
     """Parse tokenized source."""
-    # End of input.
-    if not source:
-        return []
-    # Try default parses for global scope.
-    (block, remaining) = glsl_parse_inout(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    (block, remaining) = glsl_parse_struct(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    (block, remaining) = glsl_parse_pervertex(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    (block, remaining) = glsl_parse_uniform(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    (block, remaining) = glsl_parse_function(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    # Try parses normally for local scope.
-    (block, remaining) = glsl_parse_declaration(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    (block, remaining) = glsl_parse_assignment(source)
-    if block:
-        return [block] + glsl_parse_tokenized(remaining)
-    # Fallback, should never happen.
-    return glsl_parse_default(source)
+    ret = []
+    position = 0
+    while position < len(source):
+        # Try default parses for global scope, then parses normally for local scope.
+        for ii in (glsl_parse_inout, glsl_parse_struct, glsl_parse_pervertex, glsl_parse_uniform,
+                   glsl_parse_function, glsl_parse_declaration, glsl_parse_assignment):
+            (block, remaining) = ii(source, position)
+            if block:
+                break
+        if not block:
+            # Fallback, should never happen.
+            return ret + glsl_parse_default(source[position:])
+        ret += [block]
+        position = remaining
+    return ret
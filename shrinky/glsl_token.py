@@ -122,6 +122,12 @@ class GlslToken:
                 # Retry.
                 self.collapse()
                 return
+        # Scopes contain their content directly, the same way as when building the tree.
+        if (self.__left or self.__right) and (len(self.__middle) == 1) and is_glsl_token(self.__middle[0]):
+            middle = self.__middle[0]
+            if (not middle.__left) and (not middle.__right):
+                self.__middle = []
+                self.addMiddle(token_descend(middle))
         # Descend left.
         for ii in self.__left:
             ii.collapse()
@@ -280,13 +286,23 @@ class GlslToken:
             return mid
         return self.__parent.findSiblingOperatorRight()
 
-    def findRightSiblingElementFromParentTree(self, elem):
-        """Find element next to given element from parent tree of this."""
-        lst = self.flattenParentTree()
-        for ii in range(len(lst)):
-            if lst[ii] is elem:
-                if ii < (len(lst) - 1):
-                    return lst[ii + 1]
+    def findRightSiblingElement(self):
+        """Find element next to the elements of this from the complete parent tree this is contained in."""
+        token = self
+        parent = self.__parent
+        while parent:
+            found = False
+            for ii in parent.__left + parent.__middle + parent.__right:
+                if found:
+                    if not is_glsl_token(ii):
+                        return ii
+                    ret = ii.getFirstElement()
+                    if not (ret is None):
+                        return ret
+                elif ii is token:
+                    found = True
+            token = parent
+            parent = parent.__parent
         return None
 
     def flatten(self):
@@ -315,13 +331,6 @@ class GlslToken:
                 raise RuntimeError("empty element found during flatten")
         return ret
 
-    def flattenParentTree(self):
-        """Flatten complete parent tree this node is contained in."""
-        parent = self
-        while parent.__parent:
-            parent = parent.__parent
-        return parent.flatten()
-
     def flattenString(self):
         """Flatten this token into a string."""
         ret = ""
@@ -330,6 +339,16 @@ class GlslToken:
             ret += ii.format(False)
         return ret
 
+    def getFirstElement(self):
+        """Get first element of this token when flattened, None if there are no elements."""
+        for ii in self.__left + self.__middle + self.__right:
+            if not is_glsl_token(ii):
+                return ii
+            ret = ii.getFirstElement()
+            if not (ret is None):
+                return ret
+        return None
+
     def getPrecedenceIfOperator(self):
         """Return precedence if middle element is a single child that is an operator."""
         mid = self.getSingleChildMiddleNonToken()
@@ -461,7 +480,9 @@ class GlslToken:
         self.__parent = op
 
     def simplify(self):
-        """Perform any simple simplification and stop."""
+        """Perform any simple simplification and stop. Return what kind of simplification was done, if any."""
+        # Removing parens changes how operators should be grouped, "parens" is returned. Changes to numbers do not
+        # change the tokens, "number" is returned. Other simplifications keep the tree consistent.
         # Remove parens.
         if self.isSurroundedByParens():
             middle_lst = self.flattenMiddle()
@@ -471,14 +492,14 @@ class GlslToken:
             # Single expression.
             if len(middle_lst) == 1:
                 if self.removeParens():
-                    return True
+                    return "parens"
             # Number or name with access.
             elif len(middle_lst) == 2:
                 mid_lt = middle_lst[0]
                 mid_rt = middle_lst[1]
                 if (is_glsl_name(mid_lt) or is_glsl_number(mid_lt)) and is_glsl_access(mid_rt):
                     if self.removeParens():
-                        return True
+                        return "parens"
             # Single function call or indexing (with potential access).
             elif len(middle_lst) >= 3:
                 mid_name = middle_lst[0]
@@ -493,10 +514,9 @@ class GlslToken:
                 if (is_glsl_name(mid_name) or is_glsl_type(mid_name)) and is_glsl_paren(mid_opening) and mid_opening.matches(mid_ending):
                     if is_single_call_or_access_list(middle_lst[2:last_index], mid_opening):
                         if self.removeParens():
-                            return True
+                            return "parens"
             # Only contains lower-priority operators compared to outside.
-            paren_rt = self.__right[0].getSingleChild()
-            elem_rt = self.findRightSiblingElementFromParentTree(paren_rt)
+            elem_rt = self.findRightSiblingElement()
             prio = self.findHighestPrioOperatorMiddle()
             # Right element cannot be access or bracket.
             if (prio >= 0) and (not is_glsl_access(elem_rt)) and (elem_rt != "["):
@@ -507,28 +527,31 @@ class GlslToken:
                         if right:
                             if right.getPrecedence() >= prio:
                                 if self.removeParens():
-                                    return True
+                                    return "parens"
                         else:
                             if self.removeParens():
-                                return True
+                                return "parens"
                 elif right:
                     if right.getPrecedence() >= prio:
                         if self.removeParens():
-                            return True
+                            return "parens"
                 else:
                     if self.removeParens():
-                        return True
+                        return "parens"
         # Recurse down.
         for ii in self.__left:
-            if ii.simplify():
-                return True
+            ret = ii.simplify()
+            if ret:
+                return ret
         for ii in self.__right:
-            if ii.simplify():
-                return True
+            ret = ii.simplify()
+            if ret:
+                return ret
         for ii in self.__middle:
             if is_glsl_token(ii):
-                if ii.simplify():
-                    return True
+                ret = ii.simplify()
+                if ret:
+                    return ret
         # Perform operations only after removing any possible parens.
         if (len(self.__middle) == 1):
             oper = self.__middle[0]
@@ -593,17 +616,17 @@ class GlslToken:
             right = self.findSiblingOperatorRight()
             if not left and not right:
                 mid.setAllowIntegrify(True)
-                return True
+                return "number"
             # Alone in vecN() directive.
             left = self.getSingleChildLeft()
             right = self.getSingleChildRight()
             if left and left.isTypeOpen() and right and (right.getSingleChildMiddleNonToken() == ")"):
                 mid.setAllowIntegrify(True)
-                return True
+                return "number"
             # If could not be integrified, at least ensure that float precision is not exceeded.
             if mid.getPrecision() > 6:
                 mid.truncatePrecision(6)
-                return True
+                return "number"
         return False
 
     def __str__(self):
@@ -688,90 +711,157 @@ def token_tree_build(lst):
     # Might be that everything is lost at this point.
     if not lst:
         return None
-    # Start iteration over tokenized list.
+    # Scopes are split first, then operators are split in order of precedence.
+    lst = token_tree_build_parens(lst)
+    singles = [x.getSingleChild() for x in lst]
+    for ii in singles:
+        if is_glsl_paren(ii):
+            return token_tree_build_unbalanced(lst)
+    # Operators on the left are split first on equal precedence. Operators only get removed, either split or taken
+    # as a side of another operator, so splitting order can be decided beforehand.
+    operators = []
+    for ii in range(len(singles)):
+        if is_glsl_operator(singles[ii]):
+            operators += [(singles[ii].getPrecedence(), ii)]
+    operators.sort()
+    previous = list(range(-1, len(lst) - 1))
+    following = list(range(1, len(lst) + 1))
+    removed = [False] * len(lst)
+    for (precedence, ii) in operators:
+        if removed[ii]:
+            continue
+        oper = singles[ii]
+        ret = GlslToken(oper)
+        left_index = previous[ii]
+        right_index = following[ii]
+        # Check for left existing.
+        if 0 <= left_index:
+            ret.addLeft(lst[left_index])
+            removed[left_index] = True
+            left_index = previous[left_index]
+            previous[ii] = left_index
+            if 0 <= left_index:
+                following[left_index] = ii
+        elif not (oper in ("-", "++", "--", "!")):
+            raise RuntimeError("left component nonexistent for operator '%s'" % (str(oper)))
+        # Check for right existing.
+        if right_index < len(lst):
+            ret.addRight(lst[right_index])
+            removed[right_index] = True
+            right_index = following[right_index]
+            following[ii] = right_index
+            if right_index < len(lst):
+                previous[right_index] = ii
+        elif not (oper in ("++", "--")):
+            raise RuntimeError("right component nonexistent for operator '%s'" % (str(oper)))
+        lst[ii] = ret
+    # Only option at this point is that the list has no operators and no parens - return as itself.
+    return GlslToken([lst[ii] for ii in range(len(lst)) if not removed[ii]])
+
+
+def token_tree_build_parens(lst):
+    """Split all scopes in given token list into subtrees."""
     bracket_count = 0
     paren_count = 0
     first_bracket_index = -1
     first_paren_index = -1
+    # Counts before each element are stored so iteration can continue from split point, as split scope and elements
+    # taken into it contain no parens.
+    counts = []
+    ii = 0
+    while ii < len(lst):
+        counts += [(bracket_count, paren_count, first_bracket_index, first_paren_index)]
+        vv = lst[ii].getSingleChild()
+        ii += 1
+        # Count parens.
+        if not is_glsl_paren(vv):
+            continue
+        # Bracket case.
+        if vv.isBracket():
+            new_bracket_count = vv.updateBracket(bracket_count)
+            if new_bracket_count == bracket_count:
+                raise RuntimeError("wut?")
+            bracket_count = new_bracket_count
+            # Split on brackets reaching 0.
+            if 0 >= bracket_count:
+                if 0 > first_bracket_index:
+                    raise RuntimeError("bracket inconsistency")
+                (lst, ii) = token_tree_split_paren(lst, first_bracket_index, ii - 1)
+            elif (1 == bracket_count) and (0 > first_bracket_index):
+                first_bracket_index = ii - 1
+        # Paren case.
+        elif vv.isParen():
+            new_paren_count = vv.updateParen(paren_count)
+            if new_paren_count == paren_count:
+                raise RuntimeError("wut?")
+            paren_count = new_paren_count
+            # Split on parens reaching 0.
+            if 0 >= paren_count:
+                if 0 > first_paren_index:
+                    raise RuntimeError("paren inconsistency")
+                (lst, ii) = token_tree_split_paren(lst, first_paren_index, ii - 1)
+            elif (1 == paren_count) and (0 > first_paren_index):
+                first_paren_index = ii - 1
+        # Curly braces impossible.
+        else:
+            raise RuntimeError("unknown paren object '%s'" % (str(vv)))
+        # Continue from the split scope with counts from before it.
+        if len(counts) > ii:
+            (bracket_count, paren_count, first_bracket_index, first_paren_index) = counts[ii]
+            counts = counts[:ii]
+    return lst
+
+
+def token_tree_build_unbalanced(lst):
+    """Split one operator in a token list with unclosed scopes, then continue building the tree."""
+    bracket_count = 0
+    paren_count = 0
     lowest_operator = None
     lowest_operator_index = -1
     for ii in range(len(lst)):
         vv = lst[ii].getSingleChild()
-        # Count parens.
         if is_glsl_paren(vv):
-            # Bracket case.
             if vv.isBracket():
-                new_bracket_count = vv.updateBracket(bracket_count)
-                if new_bracket_count == bracket_count:
-                    raise RuntimeError("wut?")
-                bracket_count = new_bracket_count
-                # Split on brackets reaching 0.
-                if 0 >= bracket_count:
-                    if 0 > first_bracket_index:
-                        raise RuntimeError("bracket inconsistency")
-                    return token_tree_split_paren(lst, first_bracket_index, ii)
-                elif (1 == bracket_count) and (0 > first_bracket_index):
-                    first_bracket_index = ii
-            # Paren case.
-            elif vv.isParen():
-                new_paren_count = vv.updateParen(paren_count)
-                if new_paren_count == paren_count:
-                    raise RuntimeError("wut?")
-                paren_count = new_paren_count
-                # Split on parens reaching 0.
-                if 0 >= paren_count:
-                    if 0 > first_paren_index:
-                        raise RuntimeError("paren inconsistency")
-                    return token_tree_split_paren(lst, first_paren_index, ii)
-                elif (1 == paren_count) and (0 > first_paren_index):
-                    first_paren_index = ii
-            # Curly braces impossible.
+                bracket_count = vv.updateBracket(bracket_count)
             else:
-                raise RuntimeError("unknown paren object '%s'" % (str(vv)))
+                paren_count = vv.updateParen(paren_count)
         # If we're not within parens, consider operators.
         if is_glsl_operator(vv) and (0 >= bracket_count) and (0 >= paren_count):
             if (not lowest_operator) or (vv < lowest_operator):
                 lowest_operator = vv
                 lowest_operator_index = ii
-    # Iteration done. Make a tiny subtree on the lowest operator position and continue.
-    if lowest_operator:
-        ret = GlslToken(lowest_operator)
-        left_block = []
-        right_block = []
-        left = None
-        right = None
-        # Get extending list left and right.
-        if lowest_operator_index >= 2:
-            left_block = lst[:(lowest_operator_index - 1)]
-        if lowest_operator_index <= len(lst) - 3:
-            right_block = lst[(lowest_operator_index + 2):]
-        # Check for left existing.
-        if lowest_operator_index >= 1:
-            left = lst[lowest_operator_index - 1]
-            ret.addLeft(left)
-        elif not (lowest_operator in ("-", "++", "--", "!")):
-            raise RuntimeError("left component nonexistent for operator '%s'" % (str(lowest_operator)))
-        # Check for right existing.
-        if lowest_operator_index <= len(lst) - 2:
-            right = lst[lowest_operator_index + 1]
-            ret.addRight(right)
-        elif not (lowest_operator in ("++", "--")):
-            raise RuntimeError("right component nonexistent for operator '%s'" % (str(lowest_operator)))
-        return token_tree_build(left_block + [ret] + right_block)
-    # Only option at this point is that the list has no operators and no parens - return as itself.
-    return GlslToken(lst)
+    if not lowest_operator:
+        return GlslToken(lst)
+    # Make a tiny subtree on the lowest operator position and continue.
+    ret = GlslToken(lowest_operator)
+    left_block = []
+    right_block = []
+    # Get extending list left and right.
+    if lowest_operator_index >= 2:
+        left_block = lst[:(lowest_operator_index - 1)]
+    if lowest_operator_index <= len(lst) - 3:
+        right_block = lst[(lowest_operator_index + 2):]
+    # Check for left existing.
+    if lowest_operator_index >= 1:
+        ret.addLeft(lst[lowest_operator_index - 1])
+    elif not (lowest_operator in ("-", "++", "--", "!")):
+        raise RuntimeError("left component nonexistent for operator '%s'" % (str(lowest_operator)))
+    # Check for right existing.
+    if lowest_operator_index <= len(lst) - 2:
+        ret.addRight(lst[lowest_operator_index + 1])
+    elif not (lowest_operator in ("++", "--")):
+        raise RuntimeError("right component nonexistent for operator '%s'" % (str(lowest_operator)))
+    return token_tree_build(left_block + [ret] + right_block)
 
 
 def token_tree_simplify(op):
-    """Perform first found simplify operation for given tree."""
+    """Perform first found simplify operation for given tree. Return what kind of simplification was done, if any."""
     op.collapse()
-    if op.simplify():
-        return True
-    return False
+    return op.simplify()
 
 
 def token_tree_split_paren(lst, first, last):
-    """Split token tree for parens."""
+    """Split token tree for parens. Return new token list and index of the split element."""
     # Read types, names or accesses left.
     left = [lst[first]]
     iter_left = first - 1
@@ -794,4 +884,4 @@ def token_tree_split_paren(lst, first, last):
     ret = GlslToken(middle)
     ret.addLeft(left)
     ret.addRight(right)
-    return token_tree_build(lst[:iter_left + 1] + [ret] + lst[last + 1:])
+    return (lst[:iter_left + 1] + [ret] + lst[last + 1:], iter_left + 1)
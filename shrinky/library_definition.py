@@ -13,11 +13,15 @@ class LibraryDefinition:
         """Constructor."""
         self.__name = name
         self.__symbols = []
+        self.__symbol_names = {}
         self.add_symbols(symbols)
 
     def add_symbol(self, sym):
         """Add single symbol."""
         self.__symbols += [sym]
+        # First definition of a name is the one found.
+        if not sym.get_name() in self.__symbol_names:
+            self.__symbol_names[sym.get_name()] = sym
 
     def add_symbols(self, lst):
         """Add a symbol listing."""
@@ -26,15 +30,16 @@ class LibraryDefinition:
 
     def find_symbol(self, op):
         """Find a symbol by name."""
-        for ii in self.__symbols:
-            if ii.get_name() == op:
-                return ii
-        return None
+        return self.__symbol_names.get(op)
 
     def get_name(self):
         """Accessor."""
         return str(self.__name)
 
+    def get_symbols(self):
+        """Accessor."""
+        return self.__symbols
+
 ########################################
 # Globals ##############################
 ########################################
@@ -1,6 +1,10 @@
 import os
 import re
 
+from shrinky.build_cache import get_build_cache
+from shrinky.build_cache import get_source_digest
+from shrinky.build_cache import get_tool_version
+from shrinky.build_cache import run_command_cached
 from shrinky.common import file_is_ascii_text
 from shrinky.common import is_listing
 from shrinky.common import is_verbose
@@ -21,6 +25,7 @@ class Linker:
         """Constructor."""
         self.__command = op
         self.__command_basename = os.path.basename(self.__command)
+        self.__direct = False
         self.__library_directories = []
         self.__libraries = []
         self.__linker_flags = []
@@ -58,6 +63,16 @@ class Linker:
         else:
             raise RuntimeError("compilation not supported with compiler '%s'" % (op))
 
+    def generate_linker_script(self, dst, modify_start=False):
+        """Get linker script from linker, improve it, write improved linker script to given file."""
+        ld_script = self.get_linker_script(modify_start)
+        fd = open(dst, "w")
+        fd.write(ld_script)
+        fd.close()
+        if is_verbose():
+            print("Wrote linker script '%s'." % (dst))
+        return ld_script
+
     def get_command(self):
         """Accessor."""
         return self.__command
@@ -115,12 +130,35 @@ class Linker:
             break
         return libname
 
+    def get_library_path(self, op):
+        """Get full path of a shared library file, or None if not found."""
+        libname = self.get_library_name(op)
+        if libname.startswith("/"):
+            if os.path.isfile(libname):
+                return libname
+            return None
+        return locate(self.__library_directories, libname)
+
     def get_linker_flags(self):
         """Accessor."""
         return self.__linker_flags
 
-    def generate_linker_script(self, dst, modify_start=False):
-        """Get linker script from linker, improve it, write improved linker script to given file."""
+    def get_linker_script(self, modify_start=False):
+        """Get improved linker script, only executing linker once per process for given settings."""
+        # Script only depends on linker binary, extra flags and entry address, it's persisted in the build cache.
+        entry = str(PlatformVar("entry"))
+        identity = (self.__command, tuple(self.__linker_flags_extra), entry, modify_start)
+        if identity in g_linker_scripts:
+            return g_linker_scripts[identity]
+        cache = get_build_cache()
+        if cache:
+            key = cache.digest(["linker_script", get_source_digest(), self.__command, get_tool_version(self.__command),
+                                self.__linker_flags_extra, entry, modify_start])
+            value = cache.get_value(key)
+            cache.record("linker_script", isinstance(value, dict))
+            if isinstance(value, dict):
+                g_linker_scripts[identity] = value.get("script")
+                return g_linker_scripts[identity]
         (so, se) = run_command([self.__command, "--verbose"] + self.__linker_flags_extra)
         if 0 < len(se) and is_verbose():
             print(se)
@@ -133,17 +171,19 @@ class Linker:
         unwanted_symbols = ["__bss_end__", "__bss_start__", "__end__", "__bss_start", "_bss_end__", "_edata", "_end"]
         for ii in unwanted_symbols:
             ld_script = re.sub(r'\n([ \f\r\t\v]+)(%s)(\s*=[^\n]+)\n' % (ii), r'\n\1/*\2\3*/\n', ld_script, re.MULTILINE)
-        ld_script = re.sub(r'SEGMENT_START\s*\(\s*(\S+)\s*,\s*\d*x?\d+\s*\)', r'SEGMENT_START(\1, %s)' %
-                           (str(PlatformVar("entry"))), ld_script, re.MULTILINE)
+        ld_script = re.sub(r'SEGMENT_START\s*\(\s*(\S+)\s*,\s*\d*x?\d+\s*\)', r'SEGMENT_START(\1, %s)' % (entry),
+                           ld_script, re.MULTILINE)
         if modify_start:
             ld_script = re.sub(r'(SEGMENT_START.*\S)\s*\+\s*SIZEOF_HEADERS\s*;', r'\1;', ld_script, re.MULTILINE)
-        fd = open(dst, "w")
-        fd.write(ld_script)
-        fd.close()
-        if is_verbose():
-            print("Wrote linker script '%s'." % (dst))
+        g_linker_scripts[identity] = ld_script
+        if cache:
+            cache.set_value(key, {"script": ld_script})
         return ld_script
 
+    def is_direct(self):
+        """Tell if final binaries should be linked in-process when possible."""
+        return self.__direct
+
     def link(self, src, dst, extra_args=[]):
         """Link a file."""
         cmd = [self.__command, src, "-o", dst] + self.__linker_flags + self.get_library_directory_list() + \
@@ -157,11 +197,15 @@ class Linker:
         """Link a binary file with no bells and whistles."""
         cmd = [self.__command, "--entry=" + str(PlatformVar("entry"))] + listify(src) + \
             ["-o", dst] + self.__linker_script + self.__linker_flags_extra
-        (so, se) = run_command(cmd)
+        (so, se) = run_command_cached("link", cmd, listify(src) + self.__linker_script[1:], dst)
         if 0 < len(se) and is_verbose():
             print(se)
         return so
 
+    def set_direct(self, op):
+        """Set whether final binaries are linked in-process when possible."""
+        self.__direct = op
+
     def set_libraries(self, lst):
         """Set libraries to link."""
         self.__libraries = lst
@@ -181,3 +225,10 @@ class Linker:
         self.__rpath_directories = []
         for ii in lst:
             self.__rpath_directories += [ii]
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_linker_scripts = {}
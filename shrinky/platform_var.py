@@ -102,6 +102,14 @@ def get_platform_combinations():
     return sorted(ret, reverse=True) + ["default"]
 
 
+def get_platform_state():
+    """Get a representation of current platform state, including all platform variable replacements."""
+    ret = [g_osname, g_osarch]
+    for ii in sorted(g_platform_variables.keys()):
+        ret += ["%s=%s" % (ii, repr(sorted(g_platform_variables[ii].items())))]
+    return "\n".join(ret)
+
+
 def osarch_is_32_bit():
     """Check if the architecture is 32-bit."""
     return osarch_match("32-bit")
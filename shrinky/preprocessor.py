@@ -1,6 +1,7 @@
 from shrinky.common import is_verbose
 from shrinky.common import run_command
 from shrinky.compiler import Compiler
+from shrinky.preprocessor_builtin import PreprocessorBuiltin
 
 ########################################
 # Preprocessor #########################
@@ -13,13 +14,47 @@ class Preprocessor(Compiler):
     def __init__(self, op):
         """Constructor."""
         Compiler.__init__(self, op)
+        self.__builtin = False
+
+    def get_builtin(self):
+        """Get built-in preprocessor matching flags of this preprocessor, or None if flags are not supported."""
+        definitions = []
+        include_directories = []
+        for ii in self.get_preprocess_flags():
+            if ii[:2] in ("-D", "/D"):
+                definitions += [ii[2:]]
+            elif ii[:2] in ("-I", "/I"):
+                include_directories += [ii[2:]]
+            else:
+                return None
+        return PreprocessorBuiltin(definitions, include_directories)
+
+    def get_preprocess_flags(self):
+        """Get flags passed to preprocessor in addition to the file name."""
+        return self._compiler_flags_extra + self._definitions + self._include_directories
+
+    def preprocess_builtin(self, source, fname):
+        """Preprocess source read from given file in-process. Return output or None if not enabled or supported."""
+        if not self.__builtin:
+            return None
+        builtin = self.get_builtin()
+        ret = None
+        if builtin:
+            ret = builtin.preprocess(source, fname)
+        if (ret is None) and is_verbose():
+            print("Built-in preprocessor can not handle '%s', using '%s'." % (fname, self.get_command()))
+        return ret
 
     def preprocess(self, op):
         """Preprocess a file, return output."""
-        args = [self.get_command(), op] + self._compiler_flags_extra + self._definitions + self._include_directories
+        args = [self.get_command(), op] + self.get_preprocess_flags()
         if self.command_basename_startswith("cl."):
             args += ["/E"]
         (so, se) = run_command(args)
         if 0 < len(se) and is_verbose():
             print(se)
         return so
+
+    def set_builtin(self, op):
+        """Set whether to try built-in preprocessor for sources before the external one."""
+        self.__builtin = op
@@ -0,0 +1,455 @@
+import os
+import re
+
+########################################
+# PreprocessorBuiltin ##################
+########################################
+
+
+class PreprocessorBuiltin:
+    """Built-in C preprocessor for simple sources, gives up on anything it does not support."""
+
+    def __init__(self, definitions=(), include_directories=()):
+        """Constructor."""
+        self.__definitions = {}
+        for ii in definitions:
+            (name, separator, value) = ii.partition("=")
+            if not separator:
+                value = "1"
+            self.__definitions[name] = (None, [x[0] for x in tokenize_preprocessor(value.strip())])
+        self.__include_directories = list(include_directories)
+
+    def define(self, op, macros):
+        """Parse a macro definition into given macros. Return False if not supported."""
+        match = re.match(r'^\s+([A-Za-z_]\w*)(\(([^\)]*)\))?(.*)$', op)
+        if (not match) or ("defined" == match.group(1)) or ("\"" in op):
+            return False
+        params = None
+        if match.group(2):
+            params = [x.strip() for x in match.group(3).split(",")]
+            if [""] == params:
+                params = []
+            for ii in params:
+                if (not re.match(r'^[A-Za-z_]\w*$', ii)) or (1 < params.count(ii)):
+                    return False
+        body = [x[0] for x in tokenize_preprocessor(match.group(4).strip())]
+        # Stringizing and token pasting are not supported.
+        if ("#" in body) or ("##" in body):
+            return False
+        macros[match.group(1)] = (params, body)
+        return True
+
+    def evaluate(self, op, macros):
+        """Evaluate a conditional directive expression. Return integer value or None if not supported."""
+        if "\"" in op:
+            return None
+        tokens = tokenize_preprocessor(op)
+        # Defined operators are resolved before macro expansion.
+        lst = []
+        ii = 0
+        while ii < len(tokens):
+            if "defined" != tokens[ii][0]:
+                lst += [tokens[ii]]
+                ii += 1
+                continue
+            operands = [x[0] for x in tokens[ii + 1:] if not x[0].isspace()]
+            if operands[:1] == ["("]:
+                if (3 > len(operands)) or (")" != operands[2]):
+                    return None
+                name = operands[1]
+                consumed = 3
+            elif operands:
+                name = operands[0]
+                consumed = 1
+            else:
+                return None
+            if not re.match(r'^[A-Za-z_]\w*$', name):
+                return None
+            lst += [(str(int(name in macros)), g_empty_hidden)]
+            # Skip over the operands, including whitespace between them.
+            ii += 1
+            while 0 < consumed:
+                if not tokens[ii][0].isspace():
+                    consumed -= 1
+                ii += 1
+        expanded = self.expand(lst, macros)
+        if expanded is None:
+            return None
+        return evaluate_expression([x[0] for x in expanded if not x[0].isspace()])
+
+    def expand(self, tokens, macros):
+        """Expand macros in a listing of (string, hidden names) tokens. Return expanded tokens or None."""
+        # Tokens carry the names of macros they were expanded from, those are not expanded again.
+        stack = list(reversed(tokens))
+        ret = []
+        while stack:
+            token = stack.pop()
+            (name, hidden) = token
+            # Names the external preprocessor may predefine are not known here.
+            if (name in g_preprocessor_predefined) or name.startswith("__"):
+                return None
+            if (not name in macros) or (name in hidden):
+                ret += [token]
+                continue
+            (params, body) = macros[name]
+            if params is None:
+                replacement = [(x, hidden | set([name])) for x in body]
+            else:
+                # Function-like macro without argument list is left as is.
+                skipped = []
+                while stack and stack[-1][0].isspace():
+                    skipped += [stack.pop()]
+                if not stack:
+                    return None
+                if "(" != stack[-1][0]:
+                    stack += list(reversed(skipped))
+                    ret += [token]
+                    continue
+                args = self.extract_arguments(stack)
+                if (args is None) or (len(args[0]) != max(len(params), 1)) or ((not params) and args[0][0]):
+                    return None
+                hidden = (hidden & args[1][1]) | set([name])
+                expanded_args = []
+                for ii in args[0]:
+                    expanded = self.expand(ii, macros)
+                    if expanded is None:
+                        return None
+                    expanded_args += [expanded]
+                replacement = []
+                for ii in body:
+                    if ii in params:
+                        replacement += [(x[0], x[1] | hidden) for x in expanded_args[params.index(ii)]]
+                    else:
+                        replacement += [(ii, hidden)]
+            # Whitespace around replacement prevents it from merging with surrounding tokens.
+            stack += list(reversed([(" ", g_empty_hidden)] + replacement + [(" ", g_empty_hidden)]))
+        return ret
+
+    def expand_text(self, op, macros):
+        """Expand macros in text. Return expanded text or None if not supported."""
+        # Text without any macro names is passed through without tokenizing.
+        names = set(g_name_re.findall(op))
+        if not names.intersection(macros):
+            for ii in names:
+                if (ii in g_preprocessor_predefined) or ii.startswith("__"):
+                    return None
+            return op
+        expanded = self.expand(tokenize_preprocessor(op), macros)
+        if expanded is None:
+            return None
+        return "".join([x[0] for x in expanded])
+
+    def extract_arguments(self, stack):
+        """Extract macro arguments from a reversed token stack. Return (arguments, closing token) or None."""
+        stack.pop()
+        ret = [[]]
+        depth = 0
+        while stack:
+            token = stack.pop()
+            if "(" == token[0]:
+                depth += 1
+            elif ")" == token[0]:
+                if 0 >= depth:
+                    return ([strip_whitespace(x) for x in ret], token)
+                depth -= 1
+            elif ("," == token[0]) and (0 >= depth):
+                ret += [[]]
+                continue
+            ret[-1] += [token]
+        return None
+
+    def find_include(self, op, directory):
+        """Find an included file. Return path or None."""
+        match = re.match(r'^\s*(\"([^\"]+)\"|<([^>]+)>)\s*$', op)
+        if not match:
+            return None
+        if match.group(2):
+            name = match.group(2)
+            directories = [directory] + self.__include_directories
+        else:
+            name = match.group(3)
+            directories = self.__include_directories
+        for ii in directories:
+            ret = os.path.join(ii, name)
+            if os.path.isfile(ret):
+                return ret
+        return None
+
+    def preprocess(self, source, fname):
+        """Preprocess source read from given file. Return output or None if not supported."""
+        output = []
+        if not self.preprocess_text(source, os.path.dirname(fname), dict(self.__definitions), output, 0):
+            return None
+        return "\n".join(output)
+
+    def preprocess_text(self, source, directory, macros, output, depth):
+        """Preprocess text into output listing. Return False if not supported."""
+        source = source.replace("\\\n", "")
+        if "'" in source:
+            return False
+        source = g_comment_re.sub(lambda x: (x.group().startswith("/*") and " ") or "", source)
+        if "/*" in source:
+            return False
+        # Conditionals are stored as [enclosing active, branch taken, else seen] listings.
+        conditionals = []
+        active = True
+        pending = []
+        for line in source.split("\n"):
+            match = re.match(r'^\s*#\s*(\w*)(.*)$', line)
+            if not match:
+                if "\"" in line:
+                    return False
+                if active:
+                    pending += [line]
+                continue
+            if pending:
+                expanded = self.expand_text("\n".join(pending), macros)
+                if expanded is None:
+                    return False
+                output += [expanded]
+                pending = []
+            (directive, rest) = match.groups()
+            if directive in ("if", "ifdef", "ifndef"):
+                condition = False
+                if active:
+                    condition = self.test_condition(directive, rest, macros)
+                    if condition is None:
+                        return False
+                conditionals += [[active, condition, False]]
+                active = active and condition
+                continue
+            if directive in ("elif", "else"):
+                if (not conditionals) or conditionals[-1][2]:
+                    return False
+                (enclosing, taken, else_seen) = conditionals[-1]
+                condition = False
+                if enclosing and (not taken):
+                    if "elif" == directive:
+                        condition = self.test_condition("if", rest, macros)
+                        if condition is None:
+                            return False
+                    else:
+                        condition = True
+                conditionals[-1] = [enclosing, taken or condition, "else" == directive]
+                active = enclosing and condition
+                continue
+            if "endif" == directive:
+                if not conditionals:
+                    return False
+                active = conditionals.pop()[0]
+                continue
+            # Other directives within skipped blocks are ignored.
+            if not active:
+                continue
+            if "define" == directive:
+                if not self.define(rest, macros):
+                    return False
+            elif "undef" == directive:
+                name = rest.strip()
+                if not re.match(r'^[A-Za-z_]\w*$', name):
+                    return False
+                macros.pop(name, None)
+            elif "include" == directive:
+                fname = self.find_include(rest, directory)
+                if (not fname) or (200 <= depth):
+                    return False
+                fd = open(fname, "r")
+                content = fd.read()
+                fd.close()
+                if not self.preprocess_text(content, os.path.dirname(fname), macros, output, depth + 1):
+                    return False
+            elif "pragma" == directive:
+                if "once" in rest.split():
+                    return False
+            elif directive or rest.strip():
+                return False
+        if pending:
+            expanded = self.expand_text("\n".join(pending), macros)
+            if expanded is None:
+                return False
+            output += [expanded]
+        return not conditionals
+
+    def test_condition(self, directive, op, macros):
+        """Test condition of a conditional directive. Return True, False or None if not supported."""
+        if "if" == directive:
+            value = self.evaluate(op, macros)
+            if value is None:
+                return None
+            return 0 != value
+        name = op.strip()
+        if not re.match(r'^[A-Za-z_]\w*$', name):
+            return None
+        return (name in macros) == ("ifdef" == directive)
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_comment_re = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+
+g_empty_hidden = frozenset()
+
+g_name_re = re.compile(r'[A-Za-z_]\w*')
+
+g_preprocessor_operators = {
+    "*": 10,
+    "/": 10,
+    "%": 10,
+    "+": 9,
+    "-": 9,
+    "<<": 8,
+    ">>": 8,
+    "<": 7,
+    ">": 7,
+    "<=": 7,
+    ">=": 7,
+    "==": 6,
+    "!=": 6,
+    "&": 5,
+    "^": 4,
+    "|": 3,
+    "&&": 2,
+    "||": 1,
+}
+
+g_preprocessor_predefined = ("i386", "linux", "unix")
+
+g_preprocessor_token_re = re.compile(r'\s+|[A-Za-z_]\w*|\.?\d(?:[eEpP][+-]|[\w.])*|<<|>>|<=|>=|==|!=|&&|\|\||##|.',
+                                     re.S)
+
+########################################
+# Functions ############################
+########################################
+
+
+def evaluate_binary(tokens, position, precedence):
+    """Evaluate binary operators of at least given precedence. Return (value, position)."""
+    (ret, position) = evaluate_unary(tokens, position)
+    while (not (ret is None)) and (position < len(tokens)):
+        op = tokens[position]
+        op_precedence = g_preprocessor_operators.get(op)
+        if (op_precedence is None) or (op_precedence < precedence):
+            break
+        (rhs, position) = evaluate_binary(tokens, position + 1, op_precedence + 1)
+        if rhs is None:
+            return (None, position)
+        ret = evaluate_operator(op, ret, rhs)
+    return (ret, position)
+
+
+def evaluate_conditional(tokens, position):
+    """Evaluate a conditional expression. Return (value, position)."""
+    (ret, position) = evaluate_binary(tokens, position, 1)
+    if (ret is None) or (position >= len(tokens)) or ("?" != tokens[position]):
+        return (ret, position)
+    (first, position) = evaluate_conditional(tokens, position + 1)
+    if (first is None) or (position >= len(tokens)) or (":" != tokens[position]):
+        return (None, position)
+    (second, position) = evaluate_conditional(tokens, position + 1)
+    if (second is None) or (not ret):
+        return (second, position)
+    return (first, position)
+
+
+def evaluate_expression(tokens):
+    """Evaluate integer preprocessor expression tokens. Return value or None if not supported."""
+    (ret, position) = evaluate_conditional(tokens, 0)
+    if position != len(tokens):
+        return None
+    return ret
+
+
+def evaluate_operator(op, lhs, rhs):
+    """Evaluate a binary operator. Return value or None if not supported."""
+    if op in ("/", "%"):
+        if 0 == rhs:
+            return None
+        # Division truncates towards zero.
+        quotient = abs(lhs) // abs(rhs)
+        if (0 > lhs) != (0 > rhs):
+            quotient = -quotient
+        if "/" == op:
+            return quotient
+        return lhs - quotient * rhs
+    if op in ("<<", ">>"):
+        if 0 > rhs:
+            return None
+        if "<<" == op:
+            return lhs << rhs
+        return lhs >> rhs
+    if "*" == op:
+        return lhs * rhs
+    if "+" == op:
+        return lhs + rhs
+    if "-" == op:
+        return lhs - rhs
+    if "&" == op:
+        return lhs & rhs
+    if "^" == op:
+        return lhs ^ rhs
+    if "|" == op:
+        return lhs | rhs
+    if "&&" == op:
+        return int(bool(lhs) and bool(rhs))
+    if "||" == op:
+        return int(bool(lhs) or bool(rhs))
+    return int({"<": lhs < rhs, ">": lhs > rhs, "<=": lhs <= rhs, ">=": lhs >= rhs, "==": lhs == rhs,
+                "!=": lhs != rhs}[op])
+
+
+def evaluate_unary(tokens, position):
+    """Evaluate an unary expression. Return (value, position)."""
+    if position >= len(tokens):
+        return (None, position)
+    op = tokens[position]
+    if op in ("+", "-", "~", "!"):
+        (ret, position) = evaluate_unary(tokens, position + 1)
+        if ret is None:
+            return (None, position)
+        if "-" == op:
+            return (-ret, position)
+        if "~" == op:
+            return (~ret, position)
+        if "!" == op:
+            return (int(not ret), position)
+        return (ret, position)
+    if "(" == op:
+        (ret, position) = evaluate_conditional(tokens, position + 1)
+        if (ret is None) or (position >= len(tokens)) or (")" != tokens[position]):
+            return (None, position)
+        return (ret, position + 1)
+    return (interpret_integer(op), position + 1)
+
+
+def interpret_integer(op):
+    """Interpret a token in a conditional expression as an integer. Return value or None if not supported."""
+    # Remaining names evaluate to zero, unsigned arithmetic is not supported.
+    if re.match(r'^[A-Za-z_]\w*$', op):
+        return 0
+    match = re.match(r'^(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9]\d*)[lL]*$', op)
+    if not match:
+        return None
+    value = match.group(1)
+    if value.lower().startswith("0x"):
+        return int(value, 16)
+    if value.startswith("0"):
+        return int(value, 8)
+    return int(value)
+
+
+def strip_whitespace(op):
+    """Strip leading and trailing whitespace tokens from a token listing."""
+    first = 0
+    last = len(op)
+    while (first < last) and op[first][0].isspace():
+        first += 1
+    while (last > first) and op[last - 1][0].isspace():
+        last -= 1
+    return op[first:last]
+
+
+def tokenize_preprocessor(op):
+    """Split source into (string, hidden names) tokens."""
+    return [(x, g_empty_hidden) for x in g_preprocessor_token_re.findall(op)]
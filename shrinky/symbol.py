@@ -18,7 +18,6 @@ class Symbol:
         else:
             self.__name = lst[1]
             self.__rename = lst[1]
-        self.__hash = sdbm_hash(self.__name)
         self.__parameters = None
         if 2 < len(lst):
             self.__parameters = lst[2:]
@@ -68,8 +67,8 @@ class Symbol:
         return "#define %s%s %s" % (prefix, self.__name, self.__name)
 
     def get_hash(self):
-        """Get the hash of symbol name."""
-        return self.__hash
+        """Get the hash of symbol name using the hash function currently in use."""
+        return symbol_hash(self.__name)
 
     def get_library(self):
         """Access library reference."""
@@ -134,24 +133,7 @@ static void shrinky(void)
 }""")
 
 g_template_loader_hash = Template("""#include <stdint.h>
-/** \\brief SDBM hash function.
- *
- * \\param op String to hash.
- * \\return Full hash.
- */
-static uint32_t sdbm_hash(const uint8_t *op)
-{
-  uint32_t ret = 0;
-  for(;;)
-  {
-    uint32_t cc = *op++;
-    if(!cc)
-    {
-      return ret;
-    }
-    ret = ret * 65599 + cc;
-  }
-}
+[[HASH_FUNCTION]]
 #if defined(__FreeBSD__)
 #include <sys/link_elf.h>
 #elif defined(__linux__)
@@ -356,7 +338,7 @@ static void* shrinky_find_symbol(uint32_t hash)
           continue;
         }
 #endif
-        if(sdbm_hash((const uint8_t*)name) == hash)
+        if([[HASH_NAME]]((const uint8_t*)name) == hash)
         {
           //if(!sym->st_value)
           //{
@@ -382,6 +364,25 @@ static void shrinky(void)
   }
 }""")
 
+g_template_hash_function = Template("""/** \\brief [[HASH_DESCRIPTION]] hash function.
+ *
+ * \\param op String to hash.
+ * \\return [[HASH_RETURN_DESCRIPTION]]
+ */
+static uint32_t [[HASH_NAME]](const uint8_t *op)
+{
+  uint32_t ret = [[HASH_INITIAL]];
+  for(;;)
+  {
+    uint32_t cc = *op++;
+    if(!cc)
+    {
+      return [[HASH_RETURN]];
+    }
+    ret = [[HASH_STEP]];
+  }
+}""")
+
 g_template_loader_vanilla = Template("""/** \cond */
 #define shrinky()
 /** \endcond */""")
@@ -396,6 +397,17 @@ static struct SymbolTableStruct
 [[SYMBOL_TABLE_DEFINITION]]
 } g_symbol_table[[SYMBOL_TABLE_INITIALIZATION]];""")
 
+# Hash functions as (description, initial value, multiplier, combination of character into hash).
+g_hash_functions = {
+    "sdbm": ("SDBM", 0, 65599, "add"),
+    "djb2": ("DJB2", 5381, 33, "add"),
+    "fnv1a": ("FNV-1a", 2166136261, 16777619, "xor"),
+}
+
+g_hash_bits = 32
+
+g_hash_function = "sdbm"
+
 ########################################
 # Functions ############################
 ########################################
@@ -423,9 +435,32 @@ def generate_loader_dlfcn(symbols, linker):
     return g_template_loader_dlfcn.format(subst)
 
 
+def generate_hash_function(function, bits):
+    """Generate C code for given hash function truncated to given width."""
+    (description, initial, multiplier, combine) = get_hash_function(function)
+    subst = {"HASH_DESCRIPTION": description, "HASH_NAME": "%s_hash" % (function)}
+    if 0x80000000 <= initial:
+        subst["HASH_INITIAL"] = "0x%xu" % (initial)
+    else:
+        subst["HASH_INITIAL"] = "%i" % (initial)
+    if "xor" == combine:
+        subst["HASH_STEP"] = "(ret ^ cc) * %iu" % (multiplier)
+    else:
+        subst["HASH_STEP"] = "ret * %i + cc" % (multiplier)
+    if 32 > bits:
+        subst["HASH_RETURN_DESCRIPTION"] = "Hash truncated to %i bits." % (bits)
+        subst["HASH_RETURN"] = "ret & 0x%xu" % ((1 << bits) - 1)
+    else:
+        subst["HASH_RETURN_DESCRIPTION"] = "Full hash."
+        subst["HASH_RETURN"] = "ret"
+    return g_template_hash_function.format(subst)
+
+
 def generate_loader_hash(symbols):
     """Generate import by hash loader code."""
-    subst = {"BASE_ADDRESS": str(PlatformVar("entry")), "SYMBOL_COUNT": str(len(symbols))}
+    subst = {"BASE_ADDRESS": str(PlatformVar("entry")), "SYMBOL_COUNT": str(len(symbols)),
+             "HASH_FUNCTION": generate_hash_function(g_hash_function, g_hash_bits),
+             "HASH_NAME": "%s_hash" % (g_hash_function)}
     return g_template_loader_hash.format(subst)
 
 
@@ -460,9 +495,45 @@ def generate_symbol_table(mode, symbols):
     return g_template_symbol_table.format(subst)
 
 
+def get_hash_function(op):
+    """Get definition of a hash function by name."""
+    if not op in g_hash_functions:
+        raise RuntimeError("unknown hash function '%s'" % (op))
+    return g_hash_functions[op]
+
+
+def get_symbol_hash():
+    """Get hash function name and width currently in use for symbols."""
+    return (g_hash_function, g_hash_bits)
+
+
+def hash_name(name, function, bits=32):
+    """Calculate given hash function over a string, truncated to given width."""
+    (description, ret, multiplier, combine) = get_hash_function(function)
+    for ii in name.encode():
+        if "xor" == combine:
+            ret = ((ret ^ ii) * multiplier) & 0xFFFFFFFF
+        else:
+            ret = (ret * multiplier + ii) & 0xFFFFFFFF
+    return ret & ((1 << bits) - 1)
+
+
 def sdbm_hash(name):
     """Calculate SDBM hash over a string."""
-    ret = 0
-    for ii in name:
-        ret = (ret * 65599 + ord(ii)) & 0xFFFFFFFF
-    return "0x%x" % (ret)
+    return "0x%x" % (hash_name(name, "sdbm"))
+
+
+def set_symbol_hash(function, bits=32):
+    """Set hash function and width to use for symbols."""
+    global g_hash_bits
+    global g_hash_function
+    get_hash_function(function)
+    if (1 > bits) or (32 < bits):
+        raise RuntimeError("invalid hash width: %i" % (bits))
+    g_hash_function = function
+    g_hash_bits = bits
+
+
+def symbol_hash(name):
+    """Calculate hash of a symbol name using the hash function currently in use."""
+    return "0x%x" % (hash_name(name, g_hash_function, g_hash_bits))
@@ -0,0 +1,179 @@
+import collections
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from shrinky.common import is_verbose
+from shrinky.elf_reader import ElfReader
+from shrinky.elf_reader import SHT_DYNSYM
+from shrinky.symbol import g_hash_functions
+from shrinky.symbol import get_hash_function
+from shrinky.symbol import hash_name
+
+########################################
+# Functions ############################
+########################################
+
+
+def analyze_symbol_hashes(wanted, names, functions=None):
+    """Analyze hash functions over given names. Return listing of (function, minimal width, collisions) tuples."""
+    # Collisions are listed at full width, minimal width is None if there are collisions even at full width.
+    if functions is None:
+        functions = list(g_hash_functions.keys())
+    names = sorted(set(names).union(set(wanted)))
+    ret = []
+    for ii in functions:
+        hashes = hash_names(names, ii)
+        ret += [(ii, find_minimal_hash_bits(wanted, names, hashes),
+                 find_hash_collisions(wanted, names, hashes, 32))]
+    return ret
+
+
+def find_hash_collisions(wanted, names, hashes, bits):
+    """Find names colliding with wanted names at given width. Return dictionary of wanted names to listings."""
+    mask = (1 << bits) - 1
+    colliding = get_colliding_hashes(hashes, mask)
+    ret = {}
+    for ii in wanted:
+        value = int(hashes[names.index(ii)]) & mask
+        if not value in colliding:
+            continue
+        ret[ii] = [names[jj] for jj in range(len(names)) if ((int(hashes[jj]) & mask) == value) and (names[jj] != ii)]
+    return ret
+
+
+def find_minimal_hash_bits(wanted, names, hashes):
+    """Find minimal hash width with no collisions for wanted names, or None if they collide at full width."""
+    # Truncated hashes nest, if there are no collisions at some width there are none at any larger width either.
+    indices = [names.index(x) for x in wanted]
+    if has_hash_collisions(hashes, indices, 32):
+        return None
+    lo = 1
+    hi = 32
+    while lo < hi:
+        bits = (lo + hi) // 2
+        if has_hash_collisions(hashes, indices, bits):
+            lo = bits + 1
+        else:
+            hi = bits
+    return hi
+
+
+def generate_symbol_hash_report(files, names, analysis):
+    """Generate a human-readable report of symbol hash analysis."""
+    ret = ["Symbol hash analysis over %i names from %i libraries:" % (len(names), len(files))]
+    for (ii, minimal_bits, collisions) in analysis:
+        if minimal_bits is None:
+            ret += ["  %s: collisions at full width" % (ii)]
+        else:
+            ret += ["  %s: minimal collision-free width %i bits" % (ii, minimal_bits)]
+        for jj in sorted(collisions.keys()):
+            ret += ["    '%s' collides with %s" % (jj, str(collisions[jj]))]
+    return "\n".join(ret)
+
+
+def get_colliding_hashes(hashes, mask):
+    """Get set of truncated hash values shared by more than one name."""
+    if numpy is not None:
+        (values, counts) = numpy.unique(numpy.asarray(hashes) & mask, return_counts=True)
+        return set(int(x) for x in values[counts > 1])
+    counts = collections.Counter([x & mask for x in hashes])
+    return set([x for x in counts if 1 < counts[x]])
+
+
+def has_hash_collisions(hashes, indices, bits):
+    """Tell if names at given indices collide with any other names at given width."""
+    mask = (1 << bits) - 1
+    colliding = get_colliding_hashes(hashes, mask)
+    for ii in indices:
+        if (int(hashes[ii]) & mask) in colliding:
+            return True
+    return False
+
+
+def hash_names(names, function):
+    """Calculate full-width hashes over a listing of names, vectorised if NumPy is available."""
+    if numpy is None:
+        return [hash_name(x, function) for x in names]
+    (description, initial, multiplier, combine) = get_hash_function(function)
+    encoded = [x.encode() for x in names]
+    width = max([len(x) for x in encoded] + [1])
+    # Names are padded with zeroes into a matrix and hashed one column at a time, padding leaves hashes unchanged.
+    data = numpy.frombuffer(b"".join([x.ljust(width, b"\0") for x in encoded]), dtype=numpy.uint8)
+    data = data.reshape((len(encoded), width)).astype(numpy.uint32)
+    ret = numpy.full(len(encoded), initial, dtype=numpy.uint32)
+    multiplier = numpy.uint32(multiplier)
+    for ii in range(width):
+        column = data[:, ii]
+        if "xor" == combine:
+            step = (ret ^ column) * multiplier
+        else:
+            step = ret * multiplier + column
+        ret = numpy.where(0 != column, step, ret)
+    return ret
+
+
+def read_library_symbol_names(linker, libraries):
+    """Read dynamic symbol names of given libraries and their dependencies. Return (files, names) tuple."""
+    # Dependencies are visited breadth-first, like the dynamic linker loads them.
+    files = []
+    names = set()
+    queue = [(x, None) for x in libraries]
+    visited = set()
+    while queue:
+        (current, parent_path) = queue.pop(0)
+        # Dependencies usually reside next to the library needing them, avoid searching all library directories.
+        if parent_path and os.path.isfile(os.path.join(parent_path, current)):
+            fname = os.path.join(parent_path, current)
+        else:
+            fname = linker.get_library_path(current)
+        if not fname:
+            if is_verbose():
+                print("WARNING: could not find library '%s' for symbol hash analysis" % (current))
+            continue
+        real_path = os.path.realpath(fname)
+        if real_path in visited:
+            continue
+        visited.add(real_path)
+        reader = ElfReader(fname)
+        try:
+            # Loader compares all names in the symbol table, including undefined symbols.
+            for ii in reader.get_symbols((SHT_DYNSYM,)):
+                if ii["name"]:
+                    names.add(ii["name"])
+            queue += [(x, os.path.dirname(fname)) for x in reader.get_needed()]
+        finally:
+            reader.close()
+        files += [fname]
+    return (files, names)
+
+
+def select_symbol_hash(analysis, function, bits):
+    """Select hash function and width from analysis results. Given function may be 'auto' and bits may be None."""
+    candidates = []
+    for (ii, minimal_bits, collisions) in analysis:
+        if ("auto" != function) and (ii != function):
+            continue
+        if minimal_bits is None:
+            if "auto" != function:
+                raise RuntimeError("symbol hash collisions with hash function '%s': %s" % (ii, str(collisions)))
+            continue
+        if bits is None:
+            candidates += [(minimal_bits, ii)]
+        elif minimal_bits > bits:
+            if "auto" != function:
+                raise RuntimeError("hash function '%s' requires at least %i bits, %i requested" %
+                                   (ii, minimal_bits, bits))
+        else:
+            candidates += [(bits, ii)]
+    if not candidates:
+        raise RuntimeError("no collision-free symbol hash found")
+    # Prefer smallest width, then order of definition.
+    best = candidates[0]
+    for ii in candidates[1:]:
+        if ii[0] < best[0]:
+            best = ii
+    return (best[1], best[0])
@@ -0,0 +1,157 @@
+import json
+
+from shrinky.common import is_verbose
+from shrinky.library_definition import g_library_definitions
+from shrinky.library_definition import LibraryDefinition
+from shrinky.symbol import sdbm_hash
+from shrinky.symbol import Symbol
+
+########################################
+# SymbolIndex ##########################
+########################################
+
+
+class SymbolIndex:
+    """Index of all known symbols by name and hash, across libraries."""
+
+    def __init__(self, libraries=None):
+        """Constructor."""
+        self.__libraries = []
+        self.__names = {}
+        self.__hashes = {}
+        if libraries:
+            for ii in libraries:
+                self.add_library(ii)
+
+    def add_library(self, lib):
+        """Add a library and all its symbols into the index."""
+        self.__libraries += [lib]
+        for ii in lib.get_symbols():
+            self.index_symbol(ii)
+
+    def add_symbol(self, sym):
+        """Add a symbol into its library and into the index."""
+        lib = sym.get_library()
+        if not lib in self.__libraries:
+            raise RuntimeError("library '%s' of symbol '%s' not indexed" % (lib.get_name(), sym.get_name()))
+        lib.add_symbol(sym)
+        self.index_symbol(sym)
+
+    def find_library(self, op):
+        """Find library definition by name."""
+        # Library names may change with platform variables, do not index them.
+        for ii in self.__libraries:
+            if ii.get_name() == op:
+                return ii
+        return None
+
+    def find_symbol(self, op, library=None):
+        """Find a symbol by name, optionally from given library only. Earlier libraries take precedence."""
+        for ii in self.__names.get(op, []):
+            if (library is None) or (ii.get_library().get_name() == library):
+                return ii
+        return None
+
+    def find_symbols(self, op):
+        """Find all candidate symbols with given name."""
+        return list(self.__names.get(op, []))
+
+    def find_symbols_by_hash(self, op):
+        """Find all symbols with given SDBM hash."""
+        return list(self.__hashes.get(op, []))
+
+    def get_libraries(self):
+        """Accessor."""
+        return self.__libraries
+
+    def index_symbol(self, sym):
+        """Add a symbol into the lookup tables."""
+        name = sym.get_name()
+        if name in self.__names:
+            self.__names[name] += [sym]
+        else:
+            self.__names[name] = [sym]
+        # Index by SDBM hash regardless of hash function in use, it may change after indexing.
+        symbol_hash = sdbm_hash(name)
+        if symbol_hash in self.__hashes:
+            self.__hashes[symbol_hash] += [sym]
+        else:
+            self.__hashes[symbol_hash] = [sym]
+
+    def load(self, fname):
+        """Load an external symbol table from a JSON or TSV file."""
+        if fname.lower().endswith(".json"):
+            definitions = read_symbol_table_json(fname)
+        else:
+            definitions = read_symbol_table_tsv(fname)
+        count = 0
+        for (library_name, lst) in definitions:
+            lib = self.find_library(library_name)
+            if not lib:
+                lib = LibraryDefinition(library_name)
+                self.add_library(lib)
+            for ii in lst:
+                sym = Symbol(ii, lib)
+                # Built-in definitions take precedence over loaded ones.
+                if lib.find_symbol(sym.get_name()):
+                    continue
+                self.add_symbol(sym)
+                count += 1
+        if is_verbose():
+            print("Loaded %i symbols from '%s'." % (count, fname))
+        return count
+
+########################################
+# Functions ############################
+########################################
+
+
+def read_symbol_table_json(fname):
+    """Read symbol table from a JSON file. Return listing of (library name, symbol listings) tuples."""
+    # Object maps library names to lists of symbols. Each symbol is a list of return type, name and parameter
+    # types. Name may also be a list of name and rename like in built-in definitions.
+    fd = open(fname, "r")
+    data = json.load(fd)
+    fd.close()
+    if not isinstance(data, dict):
+        raise RuntimeError("symbol table '%s' should contain an object mapping libraries to symbols" % (fname))
+    ret = []
+    for ii in sorted(data.keys()):
+        lst = []
+        for jj in data[ii]:
+            if (not isinstance(jj, list)) or (2 > len(jj)):
+                raise RuntimeError("invalid symbol definition in '%s': %s" % (fname, str(jj)))
+            lst += [jj]
+        ret += [(ii, lst)]
+    return ret
+
+
+def read_symbol_table_tsv(fname):
+    """Read symbol table from a tab-separated file. Return listing of (library name, symbol listings) tuples."""
+    # Each line contains library name, return type, name and parameter types. Empty parameter columns mean no
+    # parameters, same as omitting them in JSON.
+    ret = []
+    libraries = {}
+    fd = open(fname, "r")
+    for (ii, line) in enumerate(fd):
+        line = line.rstrip("\r\n")
+        if (not line.strip()) or line.lstrip().startswith("#"):
+            continue
+        terms = line.split("\t")
+        if 3 > len(terms):
+            fd.close()
+            raise RuntimeError("invalid symbol definition in '%s' line %i: '%s'" % (fname, ii + 1, line))
+        library_name = terms[0]
+        if not library_name in libraries:
+            libraries[library_name] = []
+            ret += [(library_name, libraries[library_name])]
+        libraries[library_name] += [terms[1:3] + [x for x in terms[3:] if x.strip()]]
+    fd.close()
+    return ret
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_symbol_index = SymbolIndex(g_library_definitions)
@@ -0,0 +1,161 @@
+import atexit
+import cProfile
+import json
+import os
+import time
+
+########################################
+# Trace ################################
+########################################
+
+
+class Trace:
+    """Recording of timed pipeline spans and external commands."""
+
+    def __init__(self):
+        """Constructor."""
+        self.__start = time.perf_counter()
+        self.__events = []
+        self.__open = []
+        self.__workers = set()
+
+    def add_events(self, lst):
+        """Add events recorded by a worker process, monotonic clock is shared between processes."""
+        for ii in lst:
+            self.__workers.add(ii[5])
+        self.__events += lst
+
+    def begin(self, name, category, args):
+        """Begin a span, spans nest and are ended in reverse order."""
+        self.__open += [(category, name, time.perf_counter(), args)]
+
+    def end(self, args):
+        """End latest span, adding given arguments to it."""
+        if not self.__open:
+            raise RuntimeError("no trace span to end")
+        (category, name, start, begin_args) = self.__open.pop()
+        merged = {}
+        if begin_args:
+            merged.update(begin_args)
+        if args:
+            merged.update(args)
+        self.__events += [(category, name, start, time.perf_counter(), merged, os.getpid())]
+
+    def generate_summary(self):
+        """Generate a summary table of time spent in spans and commands."""
+        rows = {}
+        for (category, name, start, end, args, pid) in self.__events:
+            key = (category, name)
+            if not key in rows:
+                rows[key] = [0, 0.0]
+            rows[key][0] += 1
+            rows[key][1] += end - start
+        # Spans include their nested spans and commands, only commands are summed up.
+        elapsed = time.perf_counter() - self.__start
+        commands = sum([rows[x][1] for x in rows if "command" == x[0]])
+        ret = ["%-10s %-24s %6s %10s" % ("category", "name", "count", "total")]
+        for (key, value) in sorted(rows.items(), key=lambda x: -x[1][1]):
+            ret += ["%-10s %-24s %6i %9.4fs" % (key[0], key[1], value[0], value[1])]
+        ret += ["External commands: %.4fs of %.4fs total." % (commands, elapsed)]
+        worker_commands = len([x for x in self.__events if ("command" == x[0]) and (x[5] in self.__workers)])
+        ret += ["Worker processes: %i, %i commands from workers included." % (len(self.__workers), worker_commands)]
+        return "\n".join(ret)
+
+    def get_totals(self, category=None):
+        """Get total time spent in spans by name, optionally only within given category."""
+        ret = {}
+        for (span_category, name, start, end, args, pid) in self.__events:
+            if category and (span_category != category):
+                continue
+            ret[name] = ret.get(name, 0.0) + (end - start)
+        return ret
+
+    def record_command(self, lst, start, returncode):
+        """Record an external command that was started at given time and just finished."""
+        self.__events += [("command", os.path.basename(lst[0]), start, time.perf_counter(),
+                           {"argv": list(lst), "returncode": returncode}, os.getpid())]
+
+    def take_events(self):
+        """Remove completed events and return them."""
+        ret = self.__events
+        self.__events = []
+        return ret
+
+    def write(self, fname):
+        """Write completed spans and commands into a file in Chrome trace event format."""
+        events = []
+        for (category, name, start, end, args, pid) in self.__events:
+            events += [{"name": name, "cat": category, "ph": "X", "pid": pid, "tid": 0,
+                        "ts": (start - self.__start) * 1000000.0, "dur": (end - start) * 1000000.0, "args": args}]
+        fd = open(fname, "w")
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fd)
+        fd.close()
+
+########################################
+# Globals ##############################
+########################################
+
+
+g_trace = None
+
+########################################
+# Functions ############################
+########################################
+
+
+def get_trace():
+    """Get the trace in use, or None if tracing is disabled."""
+    return g_trace
+
+
+def profile_finish(profile, fname):
+    """Stop profiling and write statistics into given file."""
+    profile.disable()
+    profile.dump_stats(fname)
+    print("Wrote profile: '%s'" % (fname))
+
+
+def profile_start(fname):
+    """Start profiling with cProfile, statistics are written into given file on exit."""
+    profile = cProfile.Profile()
+    atexit.register(profile_finish, profile, fname)
+    profile.enable()
+
+
+def set_trace(op):
+    """Set the trace to record into, None disables tracing."""
+    global g_trace
+    g_trace = op
+
+
+def trace_begin(name, category="phase", args=None):
+    """Begin a span if tracing."""
+    if g_trace:
+        g_trace.begin(name, category, args)
+
+
+def trace_command(lst, start, returncode):
+    """Record an external command if tracing."""
+    if g_trace:
+        g_trace.record_command(lst, start, returncode)
+
+
+def trace_end(args=None):
+    """End latest span if tracing."""
+    if g_trace:
+        g_trace.end(args)
+
+
+def trace_finish(fname):
+    """Write trace into given file and print its summary."""
+    if not g_trace:
+        return
+    g_trace.write(fname)
+    print(g_trace.generate_summary())
+    print("Wrote trace: '%s'" % (fname))
+
+
+def trace_start(fname):
+    """Start tracing, trace is written into given file on exit."""
+    set_trace(Trace())
+    atexit.register(trace_finish, fname)
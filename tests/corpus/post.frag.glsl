@@ -0,0 +1,23 @@
+#version 430
+
+layout(location=0) uniform vec4 post_params[2];
+
+in vec2 position;
+
+out vec4 output_color;
+
+float hash(vec2 pos)
+{
+  return fract(sin(dot(pos, vec2(12.9898, 78.233))) * 43758.5453);
+}
+
+void main()
+{
+  vec2 uv = position * 0.5 + 0.5;
+  vec2 centered = uv - vec2(0.5);
+  float i_vignette = 1.0 - dot(centered, centered) * post_params[0].x;
+  float i_grain = (hash(uv + post_params[0].yz) - 0.5) * post_params[0].w;
+  vec3 color = vec3(uv.x, uv.y, 0.5 + 0.5 * sin(post_params[1].x));
+  color = pow(color * i_vignette + vec3(i_grain), vec3(1.0 / 2.2));
+  output_color = vec4(color, 1.0);
+}
@@ -0,0 +1,16 @@
+#version 430
+
+in VertexData
+{
+  vec2 coord;
+  vec3 color;
+} vertex_in;
+
+out vec4 output_color;
+
+void main()
+{
+  float i_len = length(vertex_in.coord);
+  float ring = smoothstep(0.4, 0.5, i_len) - smoothstep(0.5, 0.6, i_len);
+  output_color = vec4(vertex_in.color * ring, 1.0);
+}
@@ -0,0 +1,20 @@
+#version 430
+
+in vec2 a_position;
+
+out VertexData
+{
+  vec2 coord;
+  vec3 color;
+} vertex_out;
+
+layout(location=0) uniform vec4 frame_info[2];
+
+void main()
+{
+  float i_angle = frame_info[0].x * 0.5;
+  vec2 rotated = vec2(a_position.x * cos(i_angle) - a_position.y * sin(i_angle), a_position.x * sin(i_angle) + a_position.y * cos(i_angle));
+  vertex_out.coord = rotated * (1.0 + 0.0);
+  vertex_out.color = vec3(frame_info[1].x, frame_info[1].y, frame_info[1].z);
+  gl_Position = vec4(rotated, 0.0, 1.0);
+}
@@ -0,0 +1,53 @@
+#version 430
+
+layout(location=0) uniform vec3 uniform_array[4];
+
+in vec2 position;
+
+out vec4 output_color;
+
+float sdf_sphere(vec3 pos, float radius)
+{
+  return length(pos) - radius;
+}
+
+float sdf_box(vec3 pos, vec3 size)
+{
+  vec3 d = abs(pos) - size;
+  return min(max(d.x, max(d.y, d.z)), 0.0) + length(max(d, 0.0));
+}
+
+float scene(vec3 pos)
+{
+  float i_sphere = sdf_sphere(pos - vec3(1.0, 0.0, 0.0), 0.5 * 2.0);
+  float i_box = sdf_box(pos + vec3(1.0, 0.0, 0.0) * 1.0, vec3(0.5 + 0.25));
+  return min(i_sphere, i_box);
+}
+
+vec3 calc_normal(vec3 pos)
+{
+  vec2 eps = vec2(0.001, 0.0);
+  return normalize(vec3(scene(pos + eps.xyy) - scene(pos - eps.xyy), scene(pos + eps.yxy) - scene(pos - eps.yxy), scene(pos + eps.yyx) - scene(pos - eps.yyx)));
+}
+
+void main()
+{
+  vec3 i_origin = uniform_array[0];
+  vec3 direction = normalize(vec3(position.x, position.y, 1.0 + 0.0));
+  float dist = 0.0;
+  int iter;
+  for(iter = 0; iter < 64; ++iter)
+  {
+    float step_length = scene(i_origin + direction * dist);
+    if(step_length < 0.001)
+    {
+      break;
+    }
+    dist += step_length;
+  }
+  vec3 hit = i_origin + direction * dist;
+  vec3 normal = calc_normal(hit);
+  float i_light = max(dot(normal, normalize(vec3(1.0, 1.0, -1.0))), 0.0);
+  float fog = exp(-dist * 0.1 * 1.0);
+  output_color = vec4(vec3(i_light * fog) * (2.0 / 4.0), 1.0);
+}
@@ -0,0 +1,183 @@
+#version 430
+
+layout(location=0) uniform vec4 terrain_params[4];
+
+in vec2 position;
+
+out vec4 output_color;
+
+float hash(vec2 pos)
+{
+  return fract(sin(dot(pos, vec2(127.1, 311.7))) * 43758.5453123);
+}
+
+float noise(vec2 pos)
+{
+  vec2 cell = floor(pos);
+  vec2 frac_part = fract(pos);
+  vec2 blend = frac_part * frac_part * (3.0 - 2.0 * frac_part);
+  float corner_a = hash(cell);
+  float corner_b = hash(cell + vec2(1.0, 0.0));
+  float corner_c = hash(cell + vec2(0.0, 1.0));
+  float corner_d = hash(cell + vec2(1.0, 1.0));
+  return mix(mix(corner_a, corner_b, blend.x), mix(corner_c, corner_d, blend.x), blend.y);
+}
+
+mat2 rotation(float angle)
+{
+  float i_cos = cos(angle);
+  float i_sin = sin(angle);
+  return mat2(i_cos, -i_sin, i_sin, i_cos);
+}
+
+float fbm(vec2 pos, int octaves)
+{
+  float result = 0.0;
+  float amplitude = 0.5;
+  mat2 i_rot = rotation(0.5);
+  int ii;
+  for(ii = 0; ii < octaves; ++ii)
+  {
+    result += amplitude * noise(pos);
+    pos = i_rot * pos * 2.03 + vec2(1.7, 9.2);
+    amplitude *= 0.5;
+  }
+  return result;
+}
+
+float terrain_height(vec2 pos)
+{
+  float i_base = fbm(pos * 0.05, 6) * 24.0;
+  float i_ridge = 1.0 - abs(noise(pos * 0.02) * 2.0 - 1.0);
+  return i_base + i_ridge * i_ridge * 12.0 - 8.0;
+}
+
+float water_height(vec2 pos, float time)
+{
+  float i_wave_a = sin(pos.x * 0.3 + time * 1.1) * 0.15;
+  float i_wave_b = sin(pos.y * 0.4 - time * 0.7) * 0.1;
+  return i_wave_a + i_wave_b - 2.0;
+}
+
+float scene(vec3 pos)
+{
+  float i_land = pos.y - terrain_height(pos.xz);
+  float i_water = pos.y - water_height(pos.xz, terrain_params[3].x);
+  return min(i_land, i_water);
+}
+
+bool is_water(vec3 pos)
+{
+  return terrain_height(pos.xz) < water_height(pos.xz, terrain_params[3].x);
+}
+
+vec3 calc_normal(vec3 pos, float dist)
+{
+  vec2 eps = vec2(0.002 * dist, 0.0);
+  return normalize(vec3(scene(pos + eps.xyy) - scene(pos - eps.xyy), scene(pos + eps.yxy) - scene(pos - eps.yxy), scene(pos + eps.yyx) - scene(pos - eps.yyx)));
+}
+
+float march(vec3 origin, vec3 direction)
+{
+  float dist = 0.1;
+  int iter;
+  for(iter = 0; iter < 200; ++iter)
+  {
+    float step_length = scene(origin + direction * dist);
+    if((step_length < 0.001 * dist) || (dist > 400.0))
+    {
+      break;
+    }
+    dist += step_length * 0.6;
+  }
+  return dist;
+}
+
+float soft_shadow(vec3 origin, vec3 direction)
+{
+  float result = 1.0;
+  float dist = 0.5;
+  int iter;
+  for(iter = 0; iter < 48; ++iter)
+  {
+    float step_length = scene(origin + direction * dist);
+    result = min(result, 8.0 * step_length / dist);
+    if(result < 0.001)
+    {
+      break;
+    }
+    dist += clamp(step_length, 0.2, 4.0);
+  }
+  return clamp(result, 0.0, 1.0);
+}
+
+vec3 sky_color(vec3 direction, vec3 sun)
+{
+  float i_sun_amount = max(dot(direction, sun), 0.0);
+  vec3 i_horizon = vec3(0.7, 0.75, 0.8);
+  vec3 i_zenith = vec3(0.2, 0.4, 0.75);
+  vec3 color = mix(i_horizon, i_zenith, pow(max(direction.y, 0.0), 0.5));
+  color += vec3(1.0, 0.8, 0.5) * pow(i_sun_amount, 64.0);
+  color += vec3(1.0, 0.6, 0.3) * pow(i_sun_amount, 4.0) * 0.2;
+  return color;
+}
+
+vec3 land_color(vec3 pos, vec3 normal)
+{
+  float i_slope = normal.y;
+  float i_altitude = pos.y;
+  vec3 i_grass = vec3(0.2, 0.35, 0.1);
+  vec3 i_rock = vec3(0.35, 0.3, 0.25);
+  vec3 i_snow = vec3(0.9, 0.92, 0.95);
+  vec3 color = mix(i_rock, i_grass, smoothstep(0.6, 0.8, i_slope));
+  color = mix(color, i_snow, smoothstep(10.0, 14.0, i_altitude + noise(pos.xz * 0.5) * 2.0) * smoothstep(0.5, 0.7, i_slope));
+  return color;
+}
+
+vec3 shade(vec3 origin, vec3 direction, float dist, vec3 sun)
+{
+  vec3 pos = origin + direction * dist;
+  vec3 normal = calc_normal(pos, dist);
+  vec3 albedo = land_color(pos, normal);
+  if(is_water(pos))
+  {
+    normal = normalize(normal + vec3(noise(pos.xz * 2.0) - 0.5, 0.0, noise(pos.zx * 2.0) - 0.5) * 0.1);
+    albedo = vec3(0.05, 0.15, 0.2);
+  }
+  float i_diffuse = max(dot(normal, sun), 0.0) * soft_shadow(pos + normal * 0.1, sun);
+  float i_ambient = 0.5 + 0.5 * normal.y;
+  vec3 color = albedo * (vec3(1.0, 0.9, 0.8) * i_diffuse * 1.5 + vec3(0.3, 0.4, 0.5) * i_ambient * 0.4);
+  float i_fog = 1.0 - exp(-dist * 0.004);
+  return mix(color, sky_color(direction, sun), i_fog);
+}
+
+vec3 camera_direction(vec2 uv, vec3 origin, vec3 target)
+{
+  vec3 forward = normalize(target - origin);
+  vec3 right = normalize(cross(forward, vec3(0.0, 1.0, 0.0)));
+  vec3 up = cross(right, forward);
+  return normalize(uv.x * right + uv.y * up + 1.5 * forward);
+}
+
+void main()
+{
+  vec2 uv = position * vec2(terrain_params[2].x, 1.0);
+  float i_time = terrain_params[3].x;
+  vec3 origin = terrain_params[0].xyz + vec3(i_time * 4.0, 0.0, i_time * 2.0);
+  origin.y = max(origin.y, terrain_height(origin.xz) + 4.0);
+  vec3 target = origin + terrain_params[1].xyz;
+  vec3 direction = camera_direction(uv, origin, target);
+  vec3 sun = normalize(vec3(0.8, 0.4, -0.6));
+  float dist = march(origin, direction);
+  vec3 color;
+  if(dist > 400.0)
+  {
+    color = sky_color(direction, sun);
+  }
+  else
+  {
+    color = shade(origin, direction, dist, sun);
+  }
+  color = pow(clamp(color, 0.0, 1.0), vec3(0.4545));
+  output_color = vec4(color * (1.0 - 0.3 * dot(position, position)), 1.0);
+}